@@ -0,0 +1,8 @@
+#!/bin/bash
+
+python -m tests.bench run -o bench_current.json
+if [ -f bench_baseline.json ]; then
+    python -m tests.bench compare bench_baseline.json bench_current.json
+else
+    mv bench_current.json bench_baseline.json
+fi
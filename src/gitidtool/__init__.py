@@ -1,62 +1,89 @@
-import click
+import importlib
+import os
 
-from gitidtool.click_echo_wrapper import ClickEchoWrapper
-from gitidtool.file_system import _read_config
-from gitidtool.check_cmd_result import CheckCmdResultData, CheckCmdResultReporter
+import click
 
 # Click functions (API)
 
 
-@click.group()
-def program():
-    # common functionality across grouped commands
-    pass
+class _LazyGroup(click.Group):
+    """
+    Click group which imports a subcommand's module only when that subcommand
+    is invoked, so that each command only pays the import cost of what it
+    uses. guard wraps every git commit and push, so its startup time matters.
+    """
 
+    def __init__(self, *args, lazy_subcommands: dict[str, str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # command name => "module:attribute"
+        self.lazy_subcommands = lazy_subcommands if lazy_subcommands else {}
 
-@click.command()
-@click.option(
-    "-g",
-    "--global",
-    "global_",
-    is_flag=True,
-    default=False,
-    show_default=True,
-    help="Whether to include global .gitconfig results",
-)
-@click.option(
-    "-r",
-    "--recursive",
-    is_flag=True,
-    default=False,
-    show_default=True,
-    help="Whether to recursively check nested repos",
-)
-def check(global_, recursive):
-    git_config, gpg_config, ssh_config = _read_config(global_, recursive, ".")
-    results = [CheckCmdResultData(entry, gpg_config, ssh_config) for entry in git_config]
-
-    click_echo_wrapper = ClickEchoWrapper()
-    reporter = CheckCmdResultReporter()
-    for result in results:
-        click_echo_wrapper.echo_all()  # blank line
-        reporter.report_on_result(result, click_echo_wrapper)
-        click_echo_wrapper.echo_all()
-        click_echo_wrapper.clear()
-
-
-@click.command()
-@click.option(
-    "-r",
-    "--recursive",
-    is_flag=True,
-    default=False,
-    show_default=True,
-    help="Whether to recursively check nested repos",
-)
-def guard(recursive):
-    git_config, gpg_config, ssh_config = _read_config(False, recursive, ".")
-    results = [CheckCmdResultData(entry, gpg_config, ssh_config) for entry in git_config]
+    def list_commands(self, ctx):
+        return sorted([*super().list_commands(ctx), *self.lazy_subcommands])
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.lazy_subcommands:
+            return super().get_command(ctx, cmd_name)
+        module_name, attribute = self.lazy_subcommands[cmd_name].split(":")
+        return getattr(importlib.import_module(module_name), attribute)
+
+    def invoke(self, ctx):
+        # Set to a file path to write a cProfile of the whole run to it, for
+        # use with pstats or snakeviz
+        profile_path = os.environ.get("GIT_ID_TOOL_PROFILE")
+        if not profile_path:
+            return super().invoke(ctx)
+        return _run_profiled(profile_path, super().invoke, ctx)
 
 
-program.add_command(check)
-program.add_command(guard)
+def _run_profiled(profile_path: str, function, *args):
+    """Runs the function under cProfile, writing the stats of every thread it
+    starts, merged with its own, to the given path."""
+    import cProfile
+    import pstats
+    import sys
+    import threading
+
+    profile = cProfile.Profile()
+    if sys.version_info >= (3, 12):
+        # Profiling is process-wide (through sys.monitoring), so one profile
+        # sees every thread
+        try:
+            return profile.runcall(function, *args)
+        finally:
+            profile.dump_stats(profile_path)
+    # Otherwise each thread is profiled separately: discovery, parsing and
+    # output all run on threads of their own
+    thread_profiles = list[cProfile.Profile]()
+
+    def profile_thread(*_):
+        thread_profile = cProfile.Profile()
+        thread_profiles.append(thread_profile)
+        # Replaces this hook for the rest of the thread
+        thread_profile.enable()
+
+    threading.setprofile(profile_thread)
+    try:
+        return profile.runcall(function, *args)
+    finally:
+        threading.setprofile(None)
+        stats = pstats.Stats(profile)
+        for thread_profile in list(thread_profiles):
+            thread_profile.create_stats()
+            # Stats cannot be made from threads which recorded no calls
+            if thread_profile.stats:
+                stats.add(thread_profile)
+        stats.dump_stats(profile_path)
+
+
+@click.group(
+    cls=_LazyGroup,
+    lazy_subcommands={
+        "check": "gitidtool.check_cmd:check",
+        "guard": "gitidtool.guard_cmd:guard",
+        "daemon": "gitidtool.daemon_cmd:daemon",
+    },
+)
+def program():
+    # common functionality across grouped commands
+    pass
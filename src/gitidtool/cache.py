@@ -0,0 +1,106 @@
+"""
+On-disk cache files which persist parsed data between runs, stored in the
+user's cache directory and versioned by schema.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+StatKey = list[int]
+
+
+def _get_cache_dir() -> Path:
+    override = os.environ.get("GIT_ID_TOOL_CACHE_DIR")
+    if override:
+        return Path(override)
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return Path(cache_home, "git-id-tool")
+
+
+def _is_cache_enabled():
+    return os.environ.get("GIT_ID_TOOL_NO_CACHE", "") in ("", "0")
+
+
+def _get_stat_key(path: str | Path) -> StatKey | None:
+    """Returns the (mtime, size, inode) of the file at the given path, which
+    changes whenever the file does, or None if the file cannot be accessed."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+
+@dataclass
+class CacheFile:
+    """
+    A JSON file of cache entries keyed by string. Entries written with a
+    different schema version are discarded on load.
+    """
+
+    name: str
+    schema_version: int
+    directory: Path = field(default_factory=_get_cache_dir)
+    entries: dict[str, object] = field(default_factory=dict)
+    is_modified: bool = False
+
+    @property
+    def path(self):
+        return self.directory.joinpath(self.name)
+
+    def load(self):
+        """Loads the entries from disk, if the file exists and is readable."""
+        self.entries = {}
+        self.is_modified = False
+        if not _is_cache_enabled():
+            return
+        try:
+            with open(self.path, "r") as file:
+                content = json.load(file)
+        except (OSError, ValueError):
+            return
+        if (
+            not isinstance(content, dict)
+            or content.get("schema_version") != self.schema_version
+        ):
+            return
+        self.entries = content.get("entries", {})
+
+    def save(self):
+        """Writes the entries to disk if any have changed since loading. The
+        file is replaced atomically, so concurrent runs never see a partially
+        written cache."""
+        if not self.is_modified or not _is_cache_enabled():
+            return
+        import tempfile  # only needed when writing, which warm runs skip
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.directory, prefix=f".{self.name}.", delete=False
+            ) as file:
+                json.dump(
+                    {"schema_version": self.schema_version, "entries": self.entries},
+                    file,
+                )
+            os.replace(file.name, self.path)
+        except OSError:
+            # The cache is an optimization only, so failing to write it is
+            # not an error
+            return
+        self.is_modified = False
+
+    def get(self, key: str):
+        return self.entries.get(key)
+
+    def set(self, key: str, value: object):
+        self.entries[key] = value
+        self.is_modified = True
+
+    def remove(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            self.is_modified = True
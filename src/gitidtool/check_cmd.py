@@ -0,0 +1,301 @@
+import json
+import os
+from pathlib import Path
+
+import click
+
+from gitidtool.cmd_options import (
+    recursive_options,
+    refresh_gpg_option,
+    timings_option,
+)
+from gitidtool.click_echo_wrapper import _echo_in_chunks, _is_stdout_styled
+from gitidtool.daemon_client import _echo_from_daemon
+from gitidtool.repo_discovery import RepoDiscovery
+from gitidtool.timings import TIMINGS
+
+
+@click.command()
+@click.option(
+    "-g",
+    "--global",
+    "global_",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Whether to include global .gitconfig results",
+)
+@click.option(
+    "--format",
+    "format_",
+    type=click.Choice(["text", "json", "ndjson"]),
+    default="text",
+    show_default=True,
+    help="The output format. json and ndjson emit one unstyled record per repo, "
+    "as soon as it is evaluated, and no status messages",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="The number of worker processes to parse and check repos with, when "
+    "no daemon is running. Output is the same as with a single process",
+)
+@click.option(
+    "--changed-only",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Whether to only re-check repos whose config, gpg key or ssh entries "
+    "changed since the last --changed-only run, reporting only the repos whose "
+    "status changed",
+)
+@click.option(
+    "--summary",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Whether to report a single summary of all repos instead of each "
+    "repo: counts by worst status, the most frequent mismatched emails and "
+    "signing keys, and ssh hosts with no matching Host block",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Whether to keep running after the check, watching the repos' config, "
+    "ssh and gpg files, and reporting the repos whose results change",
+)
+@recursive_options
+@refresh_gpg_option
+@timings_option
+def check(
+    global_,
+    format_,
+    jobs,
+    changed_only,
+    summary,
+    watch,
+    recursive,
+    max_depth,
+    prune,
+    refresh_gpg,
+):
+    if changed_only and jobs > 1:
+        raise click.UsageError("--changed-only cannot be combined with --jobs")
+    if changed_only and summary:
+        raise click.UsageError("--changed-only cannot be combined with --summary")
+    if watch and (jobs > 1 or changed_only or summary):
+        raise click.UsageError(
+            "--watch cannot be combined with --jobs, --changed-only or --summary"
+        )
+    if watch and format_ == "json":
+        raise click.UsageError(
+            "--watch cannot be combined with --format=json, which never ends; "
+            "use --format=ndjson"
+        )
+    repo_discovery = RepoDiscovery(prune, max_depth)
+    # The state of previous runs is kept in-process, so the daemon is not used
+    # for --changed-only or --watch, nor when timing this process
+    if (
+        not changed_only
+        and not watch
+        and not TIMINGS.is_enabled
+        and _echo_from_daemon(
+            {
+                "command": "check",
+                "cwd": os.getcwd(),
+                "global": global_,
+                "recursive": recursive,
+                "max_depth": max_depth,
+                "prune": sorted(repo_discovery.prune),
+                "refresh_gpg": refresh_gpg,
+                "format": format_,
+                "summary": summary,
+                "styled": _is_stdout_styled(),
+            }
+        )
+    ):
+        return
+    # Only needed when no daemon is running
+    from gitidtool.check_cmd_result import (
+        CheckCmdResultData,
+        CheckCmdResultJsonReporter,
+        CheckCmdResultReporter,
+    )
+    from gitidtool.click_echo_wrapper import ClickEchoWrapper
+    from gitidtool.file_system import _read_config
+    from gitidtool.identity_index import IdentityIndex
+
+    ssh_read_paths = list[Path]()
+    config = _read_config(
+        global_,
+        recursive,
+        ".",
+        suppress_status_output=format_ != "text",
+        repo_discovery=repo_discovery,
+        refresh_gpg=refresh_gpg,
+        parse_git_config=jobs == 1 and not changed_only and not watch,
+        ssh_read_paths=ssh_read_paths,
+    )
+    if config is None:
+        return
+    git_config, gpg_config, ssh_config = config
+    identity_index = IdentityIndex.build(gpg_config, ssh_config)
+
+    if changed_only:
+        _echo_status_transitions(git_config, identity_index, format_)
+        return
+    if watch:
+        _echo_watched_results(git_config, identity_index, ssh_read_paths, format_)
+        return
+    if jobs > 1:
+        from gitidtool.sharded_check import _iter_sharded_results
+
+        # git_config holds the config paths, which workers parse and render
+        rendered_results = _iter_sharded_results(
+            git_config,
+            identity_index,
+            "summary" if summary else format_,
+            jobs,
+            _is_stdout_styled(),
+        )
+        if summary:
+            from gitidtool.check_summary import CheckSummaryReporter
+
+            outputs = CheckSummaryReporter().report_on_rendered_results(
+                rendered_results, format_, _is_stdout_styled()
+            )
+        elif format_ == "text":
+            outputs = CheckCmdResultReporter().report_on_rendered_results(
+                rendered_results
+            )
+        else:
+            outputs = CheckCmdResultJsonReporter().report_on_rendered_results(
+                rendered_results, as_array=format_ == "json"
+            )
+    else:
+        # Evaluated lazily, so that each repo is reported as soon as it is
+        # parsed
+        results = (CheckCmdResultData(entry, identity_index) for entry in git_config)
+        if summary:
+            from gitidtool.check_summary import CheckSummaryReporter
+
+            outputs = CheckSummaryReporter().report_on_results(
+                results, format_, _is_stdout_styled()
+            )
+        elif format_ == "text":
+            outputs = CheckCmdResultReporter().report_on_results(
+                results, ClickEchoWrapper(_is_stdout_styled())
+            )
+        else:
+            outputs = CheckCmdResultJsonReporter().report_on_results(
+                results, as_array=format_ == "json"
+            )
+    _echo_in_chunks(outputs)
+
+
+def _echo_status_transitions(config_paths, identity_index, format_: str):
+    from gitidtool.check_cmd_result import (
+        CheckCmdResultJsonReporter,
+        CheckCmdResultReporter,
+    )
+    from gitidtool.check_state import CheckState, _iter_status_transitions
+    from gitidtool.click_echo_wrapper import ClickEchoWrapper
+    from gitidtool.git_data import GitConfigCache, GitDataEntryFactory, GitDataReader
+
+    reader = GitDataReader(GitDataEntryFactory(), GitConfigCache().load())
+    transitions = _iter_status_transitions(
+        config_paths, identity_index, CheckState().load(), reader
+    )
+    if format_ == "text":
+        reporter = CheckCmdResultReporter()
+        click_echo_wrapper = ClickEchoWrapper(_is_stdout_styled())
+        outputs = reporter.report_on_rendered_results(
+            f"Status changed: {previous_status or 'new'} => "
+            f"{result.worst_status.name.lower()}\n"
+            + reporter.render_result(result, click_echo_wrapper)
+            for result, previous_status in transitions
+        )
+    else:
+        outputs = CheckCmdResultJsonReporter().report_on_rendered_results(
+            (
+                json.dumps(
+                    result.to_record() | {"previous_worst_status": previous_status}
+                )
+                for result, previous_status in transitions
+            ),
+            as_array=format_ == "json",
+        )
+    has_output = False
+    for output in outputs:
+        has_output = True
+        click.echo(output)
+    if not has_output and format_ == "text":
+        click.echo("No repos changed status")
+
+
+def _echo_watched_results(
+    config_paths, identity_index, ssh_read_paths: list[Path], format_: str
+):
+    from gitidtool.check_cmd_result import (
+        CheckCmdResultJsonReporter,
+        CheckCmdResultReporter,
+    )
+    from gitidtool.click_echo_wrapper import ClickEchoWrapper
+    from gitidtool.file_system import _get_gpg_config, _get_ssh_config
+    from gitidtool.identity_index import IdentityIndex
+    from gitidtool.watch import CheckWatchSession
+
+    if format_ == "text":
+        reporter = CheckCmdResultReporter()
+        click_echo_wrapper = ClickEchoWrapper(_is_stdout_styled())
+
+        def render_result(result):
+            return reporter.render_result(result, click_echo_wrapper)
+
+    else:
+        reporter = CheckCmdResultJsonReporter()
+        render_result = reporter.render_result
+
+    def read_identity_index(read_paths: list[Path]):
+        ssh_warnings = list[str]()
+        identity_index = IdentityIndex.build(
+            _get_gpg_config(), _get_ssh_config(read_paths, ssh_warnings)
+        )
+        for warning in ssh_warnings:
+            click.echo(f"Warning: {warning}", err=True)
+        return identity_index
+
+    session = CheckWatchSession(render_result, read_identity_index)
+    try:
+        outputs = session.start(config_paths, identity_index, ssh_read_paths)
+        if format_ == "text":
+            outputs = reporter.report_on_rendered_results(outputs)
+        _echo_in_chunks(outputs)
+        while True:
+            for warning in session.warnings:
+                click.echo(f"Warning: {warning}", err=True)
+            session.warnings.clear()
+            if format_ == "text":
+                click.echo("\nWatching for changes... (press Ctrl+C to stop)")
+            has_output = False
+            while not has_output:
+                for path, rendered_result in session.wait_for_changes():
+                    has_output = True
+                    if format_ != "text":
+                        click.echo(
+                            rendered_result
+                            or json.dumps({"path": path, "removed": True})
+                        )
+                    elif rendered_result is None:
+                        click.echo(f"\nNo longer a repo: {path}")
+                    else:
+                        click.echo(f"\n{rendered_result}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.close()
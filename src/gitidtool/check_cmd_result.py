@@ -1,144 +1,361 @@
-from functools import cached_property
+import json
+import os
+from collections.abc import Iterable
 
 from gitidtool.click_echo_wrapper import ClickEchoWrapper, LineStatus
+from gitidtool.git_config_file import _get_global_config_path
 from gitidtool.git_data import GitDataEntry, GitRemoteDataEntry
-from gitidtool.gpg_data import GpgDataEntry
+from gitidtool.identity_index import IdentityIndex
 from gitidtool.ssh_data import SshDataEntry
+from gitidtool.timings import TIMINGS
+
+
+class _cached_property:
+    """
+    Like functools.cached_property, without the lock which it takes on every
+    first access before Python 3.12. Results are only evaluated by one thread,
+    and the summary of a large check reads most properties of every result.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.__doc__ = function.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # Stored in the instance's __dict__, which later lookups find first
+        value = instance.__dict__[self.name] = self.function(instance)
+        return value
 
 
 class CheckCmdResultData:
     def __init__(
         self,
         repo_config_entry: GitDataEntry,
-        gpg_config: list[GpgDataEntry],
-        ssh_config: list[SshDataEntry],
+        identity_index: IdentityIndex,
     ):
-        self.gpg_config_entry = repo_config_entry.get_gpg_entry_matching_signing_key(
-            gpg_config
-        )
-        self.ssh_map = dict[GitRemoteDataEntry, SshDataEntry]()
-        for remote in repo_config_entry.remotes:
-            self.ssh_map[remote] = remote.get_ssh_entry_matching_hostname(ssh_config)
+        with TIMINGS.phase("matching"):
+            self.gpg_config_entry = identity_index.get_gpg_entry_matching_signing_key(
+                repo_config_entry.signing_key
+            )
+            self.ssh_map = dict[GitRemoteDataEntry, SshDataEntry | None]()
+            for remote in repo_config_entry.remotes:
+                # Only remotes fetched over ssh use an ssh identity
+                self.ssh_map[remote] = (
+                    identity_index.get_ssh_entry_matching_hostname(remote.hostname)
+                    if remote.is_ssh
+                    else None
+                )
         self.remotes = repo_config_entry.remotes
         self.repo_config_entry = repo_config_entry
 
-    @cached_property
+    @_cached_property
     def git_repo_path(self):
         return self.repo_config_entry.path
 
-    @cached_property
+    @_cached_property
+    def git_repo_worktrees(self):
+        return self.repo_config_entry.worktrees
+
+    @_cached_property
     def git_repo_folder_name(self):
         return (
             "GLOBAL"
-            if str(self.repo_config_entry.path).endswith(".gitconfig")
+            if os.path.abspath(self.repo_config_entry.path) == _get_global_config_path()
             else self.repo_config_entry.repo_folder_name
         )
 
-    @cached_property
+    @_cached_property
     def git_user_name(self):
         return self.repo_config_entry.name
 
-    @cached_property
+    @_cached_property
     def git_user_email(self):
         return self.repo_config_entry.email
 
-    @cached_property
+    @_cached_property
     def git_user_signing_key(self):
         return self.repo_config_entry.signing_key
 
-    @cached_property
+    @_cached_property
+    def gpg_uid(self):
+        """The (name, email) of the signing key's uid with the git user.email,
+        or of its primary uid if none has it."""
+        if self.gpg_config_entry is None:
+            return "", ""
+        return self.gpg_config_entry.get_uid_matching_email(self.git_user_email)
+
+    @_cached_property
     def gpg_uid_name(self):
-        return self.gpg_config_entry.name
+        return self.gpg_uid[0]
 
-    @cached_property
+    @_cached_property
     def gpg_uid_email(self):
-        return self.gpg_config_entry.email
-    
-    @cached_property
+        return self.gpg_uid[1]
+
+    @_cached_property
+    def git_user_name_status(self):
+        return LineStatus.WARNING if self.git_user_name == "" else LineStatus.DEFAULT
+
+    @_cached_property
+    def git_user_email_status(self):
+        return LineStatus.WARNING if self.git_user_email == "" else LineStatus.DEFAULT
+
+    @_cached_property
+    def git_user_signing_key_status(self):
+        return (
+            LineStatus.WARNING
+            if self.git_user_signing_key == ""
+            else LineStatus.DEFAULT
+        )
+
+    @_cached_property
+    def gpg_uid_name_status(self):
+        if self.git_user_signing_key == "":
+            return LineStatus.DEFAULT
+        return _get_match_status(self.gpg_uid_name, self.git_user_name)
+
+    @_cached_property
+    def gpg_uid_email_status(self):
+        if self.git_user_signing_key == "":
+            return LineStatus.DEFAULT
+        return _get_match_status(self.gpg_uid_email, self.git_user_email)
+
+    @_cached_property
+    def remotes_status(self):
+        return (
+            LineStatus.WARNING
+            if len(self.remotes) == 0 and self.git_repo_folder_name != "GLOBAL"
+            else LineStatus.DEFAULT
+        )
+
+    @_cached_property
+    def worst_status(self):
+        return _get_worst_status(
+            [
+                LineStatus.GOOD,
+                self.git_user_name_status,
+                self.git_user_email_status,
+                self.git_user_signing_key_status,
+                self.gpg_uid_name_status,
+                self.gpg_uid_email_status,
+                self.remotes_status,
+                *[self.get_ssh_status_for_remote(remote) for remote in self.remotes],
+            ]
+        )
+
+    @_cached_property
     def is_consistent(self):
-        return False
+        return self.worst_status == LineStatus.GOOD
 
     def get_ssh_entry_for_remote(self, remote: GitRemoteDataEntry):
         return self.ssh_map[remote]
 
+    def get_ssh_status_for_remote(self, remote: GitRemoteDataEntry):
+        if not remote.is_ssh:
+            return LineStatus.DEFAULT
+        ssh_entry = self.get_ssh_entry_for_remote(remote)
+        if ssh_entry is None:
+            return LineStatus.WARNING
+        return _get_match_status(ssh_entry.email, self.git_user_email)
+
+    def to_record(self):
+        """Returns a JSON-serializable summary of the result, including the
+        status of each check."""
+        return {
+            "path": str(self.git_repo_path),
+            "folder_name": self.git_repo_folder_name,
+            "worktrees": self.git_repo_worktrees,
+            "worst_status": _get_status_name(self.worst_status),
+            "git": {
+                "user.name": self.git_user_name,
+                "user.email": self.git_user_email,
+                "user.signingkey": self.git_user_signing_key,
+            },
+            "gpg": (
+                None
+                if self.gpg_config_entry is None
+                else {
+                    "uid.name": self.gpg_uid_name,
+                    "uid.email": self.gpg_uid_email,
+                }
+            ),
+            "remotes": [
+                {
+                    "name": remote.remote_name,
+                    "url": remote.url,
+                    "effective_url": remote.effective_url,
+                    "scheme": remote_url.scheme,
+                    "host": remote_url.host,
+                    "port": remote_url.port,
+                    "ssh": (
+                        None
+                        if ssh_entry is None
+                        else {
+                            "host": ssh_entry.hostname,
+                            "identity_file": ssh_entry.identity_file_path,
+                            "email": ssh_entry.email,
+                        }
+                    ),
+                    "status": _get_status_name(self.get_ssh_status_for_remote(remote)),
+                }
+                for remote in self.remotes
+                for remote_url, ssh_entry in [
+                    (remote.remote_url, self.get_ssh_entry_for_remote(remote))
+                ]
+            ],
+            "checks": {
+                "git_user_name": _get_status_name(self.git_user_name_status),
+                "git_user_email": _get_status_name(self.git_user_email_status),
+                "git_user_signing_key": _get_status_name(
+                    self.git_user_signing_key_status
+                ),
+                "gpg_uid_name": _get_status_name(self.gpg_uid_name_status),
+                "gpg_uid_email": _get_status_name(self.gpg_uid_email_status),
+                "remotes": _get_status_name(self.remotes_status),
+            },
+        }
+
+
+def _get_match_status(value, value_checking_against):
+    return LineStatus.GOOD if value == value_checking_against else LineStatus.ERROR
+
+
+# Worst first. Membership tests compare by identity, which is much cheaper
+# than reading each member's value.
+_STATUSES_BY_SEVERITY = sorted(LineStatus, key=lambda status: status.value)[::-1]
+
+
+def _get_worst_status(statuses: Iterable[LineStatus]):
+    statuses = list(statuses)
+    for status in _STATUSES_BY_SEVERITY:
+        if status in statuses:
+            return status
+    raise ValueError("No statuses given")
+
+
+def _get_status_name(status: LineStatus):
+    return status.name.lower()
+
 
 class CheckCmdResultReporter:
-    def report_on_result(
+    def report_on_results(
+        self,
+        git_results: Iterable[CheckCmdResultData],
+        click_echo_wrapper: ClickEchoWrapper,
+    ):
+        """Yields the text to echo for each result in turn, each preceded by a
+        blank line."""
+        return self.report_on_rendered_results(
+            self.render_result(git_result, click_echo_wrapper)
+            for git_result in git_results
+        )
+
+    def report_on_rendered_results(self, rendered_results: Iterable[str]):
+        """Yields the text to echo for results already rendered with
+        render_result, such as by worker processes."""
+        for rendered_result in rendered_results:
+            yield ""
+            yield rendered_result
+
+    def render_result(
         self, git_result: CheckCmdResultData, click_echo_wrapper: ClickEchoWrapper
     ):
-        worst_status = LineStatus.GOOD
+        """Returns the text reported for a single result."""
+        with TIMINGS.phase("rendering"):
+            click_echo_wrapper.clear()
+            self.report_on_result(git_result, click_echo_wrapper)
+            text = click_echo_wrapper.get_text()
+            click_echo_wrapper.clear()
+            return text
 
-        indentation_level = 0
-        indentation_level += 1
+    def report_on_result(
+        self, git_result: CheckCmdResultData, click_echo_wrapper: ClickEchoWrapper
+    ):
+        indentation_level = 1
+        # Worktrees are only listed when there is more to say than the
+        # directory containing the .git directory
+        worktrees = git_result.git_repo_worktrees
+        repo_path = os.path.dirname(os.path.dirname(git_result.git_repo_path))
+        if worktrees != [repo_path]:
+            for worktree in worktrees:
+                click_echo_wrapper.add_line(
+                    f'worktree: "{worktree}"',
+                    indentation_level,
+                )
         click_echo_wrapper.add_line(
             f'git: user.name = "{git_result.git_user_name}"',
             indentation_level,
         )
-        if git_result.git_user_name == "":
+        if git_result.git_user_name_status == LineStatus.WARNING:
             click_echo_wrapper.add_line(
                 "Missing git user name",
                 indentation_level + 1,
                 status=LineStatus.WARNING,
             )
-            worst_status = LineStatus.WARNING
         click_echo_wrapper.add_line(
             f'git: user.email = "{git_result.git_user_email}"',
             indentation_level,
         )
-        if git_result.git_user_name == "":
+        if git_result.git_user_email_status == LineStatus.WARNING:
             click_echo_wrapper.add_line(
                 "Missing git user email",
                 indentation_level + 1,
                 status=LineStatus.WARNING,
             )
-            worst_status = LineStatus.WARNING
         click_echo_wrapper.add_line(
             f'git: user.signingkey = "{git_result.git_user_signing_key}"',
             indentation_level,
         )
-        indentation_level += 1
-        if git_result.git_user_signing_key == "":
+        if git_result.git_user_signing_key_status == LineStatus.WARNING:
             click_echo_wrapper.add_line(
                 "No signing key set for this repo",
-                indentation_level,
+                indentation_level + 1,
                 status=LineStatus.WARNING,
             )
-            worst_status = LineStatus.WARNING
         else:
-            worst_status = self.add_line_check_mismatch(
-                worst_status,
+            self.add_line_check_mismatch(
                 click_echo_wrapper,
-                indentation_level,
+                indentation_level + 1,
                 f"gpg ({git_result.git_user_signing_key}): uid.name",
                 git_result.gpg_uid_name,
                 "git user.name",
-                git_result.git_user_name,
+                git_result.gpg_uid_name_status,
             )
-            worst_status = self.add_line_check_mismatch(
-                worst_status,
+            self.add_line_check_mismatch(
                 click_echo_wrapper,
-                indentation_level,
+                indentation_level + 1,
                 f"gpg ({git_result.git_user_signing_key}): uid.email",
                 git_result.gpg_uid_email,
                 "git user.email",
-                git_result.git_user_email,
+                git_result.gpg_uid_email_status,
+            )
+        if git_result.remotes_status == LineStatus.WARNING:
+            click_echo_wrapper.add_line(
+                "No remotes configured for this repo",
+                indentation_level,
+                status=LineStatus.WARNING,
             )
-        indentation_level -= 1
-        if len(git_result.remotes) == 0:
-            if git_result.git_repo_folder_name != "GLOBAL":
-                click_echo_wrapper.add_line(
-                    "No remotes configured for this repo",
-                    indentation_level,
-                    status=LineStatus.WARNING 
-                )
-                worst_status = (
-                    LineStatus.WARNING if worst_status == LineStatus.GOOD else worst_status
-                )
         for remote in git_result.remotes:
             click_echo_wrapper.add_line(
                 f'git: [remote "{remote.remote_name}"].url = "{remote.url}"',
                 indentation_level,
             )
+            if remote.rewritten_url:
+                click_echo_wrapper.add_line(
+                    f'=> insteadOf "{remote.rewritten_url}"',
+                    indentation_level + 1,
+                )
+            if not remote.is_ssh:
+                click_echo_wrapper.add_line(
+                    f"Not an ssh remote ({remote.remote_url.scheme}), so no ssh identity applies",
+                    indentation_level + 1,
+                )
+                continue
             ssh_entry = git_result.get_ssh_entry_for_remote(remote)
             if ssh_entry is None:
                 click_echo_wrapper.add_line(
@@ -146,55 +363,89 @@ class CheckCmdResultReporter:
                     indentation_level + 1,
                     status=LineStatus.WARNING,
                 )
-                worst_status = LineStatus.WARNING
             else:
-                indentation_level += 1
                 click_echo_wrapper.add_line(
                     f'ssh (Host: "{ssh_entry.hostname}" => IdentityFile: "{ssh_entry.identity_file_path}")',
-                    indentation_level,
+                    indentation_level + 1,
                 )
-                worst_status = self.add_line_check_mismatch(
-                    worst_status,
+                self.add_line_check_mismatch(
                     click_echo_wrapper,
-                    indentation_level,
+                    indentation_level + 1,
                     "=> email",
                     ssh_entry.email,
                     "git user.email",
-                    git_result.git_user_email,
+                    git_result.get_ssh_status_for_remote(remote),
                 )
-        click_echo_wrapper.add_line(
+        click_echo_wrapper.set_heading(
             f"{git_result.git_repo_folder_name} ({git_result.git_repo_path})",
-            0,
-            isHeading=True,
-            status=worst_status,
-            insert_at_position=0,
+            git_result.worst_status,
         )
 
     def add_line_check_mismatch(
         self,
-        worst_status,
         click_echo_wrapper: ClickEchoWrapper,
         indentation_level,
         desc,
         value,
         desc_checking_against: str,
-        value_checking_against,
+        status: LineStatus,
     ):
         click_echo_wrapper.add_line(
             f'{desc} = "{value}"',
             indentation_level,
         )
-        if value == value_checking_against:
+        if status == LineStatus.GOOD:
             click_echo_wrapper.add_line(
                 f"Matches {desc_checking_against}",
                 indentation_level + 1,
                 status=LineStatus.GOOD,
             )
-            return worst_status  # no worse than it was entering this call
-        if value != value_checking_against:
+        else:
             click_echo_wrapper.add_line(
                 f"Does not match {desc_checking_against}",
                 indentation_level + 1,
                 status=LineStatus.ERROR,
             )
-            return LineStatus.ERROR
+
+
+class CheckCmdResultJsonReporter:
+    """
+    Reports results as JSON records (see CheckCmdResultData.to_record), one
+    line per repo, without any styling.
+    """
+
+    def report_on_results(
+        self, git_results: Iterable[CheckCmdResultData], as_array: bool = False
+    ):
+        """Yields one line of JSON per result, as soon as it is evaluated.
+
+        :param Iterable[CheckCmdResultData] git_results: the results to report
+        :param bool as_array: whether to wrap the records in a JSON array
+        (with each record still on its own line), rather than emitting
+        newline-delimited JSON, defaults to False
+        :yield str: a line of output
+        """
+        return self.report_on_rendered_results(
+            (self.render_result(git_result) for git_result in git_results), as_array
+        )
+
+    def report_on_rendered_results(
+        self, rendered_results: Iterable[str], as_array: bool = False
+    ):
+        """Yields one line of JSON per result already rendered with
+        render_result, such as by worker processes."""
+        if not as_array:
+            yield from rendered_results
+            return
+        # The opening bracket is only written with the first record, so that
+        # nothing is written if evaluation fails before any result
+        separator = "["
+        for rendered_result in rendered_results:
+            yield separator + rendered_result
+            separator = ","
+        yield "[]" if separator == "[" else "]"
+
+    def render_result(self, git_result: CheckCmdResultData):
+        """Returns the JSON record of a single result."""
+        with TIMINGS.phase("rendering"):
+            return json.dumps(git_result.to_record())
@@ -0,0 +1,156 @@
+"""
+Persisted state of the last check of each repo, used by check --changed-only
+to skip repos whose inputs have not changed and to report status transitions.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from gitidtool.cache import CacheFile, StatKey, _get_stat_key
+from gitidtool.check_cmd_result import CheckCmdResultData, _get_status_name
+from gitidtool.git_data import GitDataEntry, GitDataReader
+from gitidtool.identity_index import IdentityIndex
+
+CHECK_STATE_SCHEMA_VERSION = 2
+
+
+def _get_identity_digest(
+    signing_key: str, hostnames: list[str], identity_index: IdentityIndex
+):
+    """Returns a digest of the gpg and ssh entries which a repo with the given
+    signing key and remote hostnames is checked against."""
+    try:
+        gpg_entry = identity_index.get_gpg_entry_matching_signing_key(signing_key)
+        gpg_values = None if gpg_entry is None else dataclasses.astuple(gpg_entry)
+    except RuntimeError as e:
+        gpg_values = str(e)
+    ssh_values = []
+    for hostname in hostnames:
+        ssh_entry = identity_index.get_ssh_entry_matching_hostname(hostname)
+        ssh_values.append(None if ssh_entry is None else dataclasses.astuple(ssh_entry))
+    content = json.dumps([gpg_values, ssh_values])
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+@dataclass
+class CheckState:
+    """
+    The worst status of each repo as of its last check, keyed by config path,
+    with a fingerprint of its inputs: the (mtime, size, inode) of its config
+    and of each file it includes, and a digest of the gpg and ssh entries it
+    was checked against.
+    """
+
+    cache_file: CacheFile = field(
+        default_factory=lambda: CacheFile(
+            "check_state.json", CHECK_STATE_SCHEMA_VERSION
+        )
+    )
+    _seen_keys: set[str] = field(default_factory=set)
+
+    def load(self):
+        self.cache_file.load()
+        self._seen_keys.clear()
+        return self
+
+    def get_previous_status(self, path: Path):
+        """Returns the worst status name of the repo's last check, or None if
+        it has not been checked before."""
+        stored = self.cache_file.get(str(path))
+        return None if stored is None else stored["status"]
+
+    def is_unchanged(
+        self,
+        path: Path,
+        stat_key: StatKey | None,
+        identity_index: IdentityIndex,
+        get_stat_key: Callable[[str], StatKey | None] = _get_stat_key,
+    ):
+        """Returns whether none of the repo's inputs have changed since its
+        last check. Besides the stat of the config itself, this only stats
+        included files, which get_stat_key may memoize across repos."""
+        key = str(path)
+        self._seen_keys.add(key)
+        stored = self.cache_file.get(key)
+        if stored is None or stat_key is None or stored["stat"] != stat_key:
+            return False
+        for dependency_path, dependency_stat_key in stored["dependencies"]:
+            if get_stat_key(dependency_path) != dependency_stat_key:
+                return False
+        return stored["identity"] == _get_identity_digest(
+            stored["signing_key"], stored["hostnames"], identity_index
+        )
+
+    def set(
+        self,
+        path: Path,
+        stat_key: StatKey | None,
+        dependencies: list[list],
+        entry: GitDataEntry,
+        identity_index: IdentityIndex,
+        status: str,
+    ):
+        key = str(path)
+        self._seen_keys.add(key)
+        hostnames = [remote.hostname for remote in entry.remotes if remote.is_ssh]
+        self.cache_file.set(
+            key,
+            {
+                "stat": stat_key,
+                "dependencies": dependencies,
+                "signing_key": entry.signing_key,
+                "hostnames": hostnames,
+                "identity": _get_identity_digest(
+                    entry.signing_key, hostnames, identity_index
+                ),
+                "status": status,
+            },
+        )
+
+    def save(self):
+        if self.cache_file.is_modified:
+            for key in list(self.cache_file.entries):
+                if key not in self._seen_keys and not os.path.exists(key):
+                    self.cache_file.remove(key)
+        self.cache_file.save()
+
+
+def _iter_status_transitions(
+    paths: Iterable[Path],
+    identity_index: IdentityIndex,
+    state: CheckState,
+    reader: GitDataReader,
+):
+    """Yields each result whose worst status differs from the repo's last
+    check, with the previous status name (None for a new repo). Only repos
+    whose inputs have changed are parsed and re-evaluated. The state and the
+    reader's cache are saved once all paths are consumed."""
+    try:
+        for path in paths:
+            stat_key = _get_stat_key(path)
+            if state.is_unchanged(
+                path, stat_key, identity_index, reader.config_file_reader.get_stat_key
+            ):
+                continue
+            entry = reader.get_git_config_from_file(path)
+            result = CheckCmdResultData(entry, identity_index)
+            status = _get_status_name(result.worst_status)
+            previous_status = state.get_previous_status(path)
+            state.set(
+                path,
+                stat_key,
+                reader.cache.get_dependencies(path),
+                entry,
+                identity_index,
+                status,
+            )
+            if status != previous_status:
+                yield result, previous_status
+    finally:
+        state.save()
+        reader.cache.save()
@@ -0,0 +1,227 @@
+"""
+Aggregate report of a check over many repos, built in constant memory as
+results stream in, instead of reporting on each repo.
+"""
+
+import heapq
+import json
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from gitidtool.check_cmd_result import CheckCmdResultData, _get_status_name
+from gitidtool.click_echo_wrapper import ClickEchoWrapper, LineStatus
+from gitidtool.timings import TIMINGS
+
+# The number of most frequent values reported in each ranking
+DEFAULT_TOP_COUNT = 10
+# The number of distinct values tracked per ranking, beyond which the least
+# frequent is evicted. Rankings are exact while fewer values have been seen.
+DEFAULT_TRACKED_COUNT = 256
+# Every status a repo's worst status may have
+STATUS_NAMES = [
+    _get_status_name(status) for status in LineStatus if status != LineStatus.DEFAULT
+]
+
+# What render_result returns for a repo: its worst status name, its git
+# user.email if an email check failed, its signing key if a gpg check failed,
+# and the hostnames of its remotes with no matching ssh Host block
+SummaryRecord = tuple[str, str | None, str | None, tuple[str, ...]]
+
+
+@dataclass
+class SpaceSavingCounter:
+    """
+    Approximate counts of the most frequent values in a stream, in memory
+    bounded by capacity (the space-saving algorithm). Once capacity values
+    are tracked, a new value replaces the least frequent one and inherits its
+    count, which is kept as that value's possible overcount. Any value more
+    frequent than 1/capacity of the stream is always tracked.
+    """
+
+    capacity: int = DEFAULT_TRACKED_COUNT
+    # value => [count, overcount]
+    _counts: dict[str, list[int]] = field(default_factory=dict)
+    # A (count, value) entry per tracked value, whose count may be stale (it
+    # only ever falls behind), so that the least frequent value is found
+    # without scanning every count
+    _heap: list[tuple[int, str]] = field(default_factory=list)
+
+    def add(self, value: str, count: int = 1):
+        counts = self._counts.get(value)
+        if counts is not None:
+            counts[0] += count
+            return
+        if len(self._counts) < self.capacity:
+            self._counts[value] = [count, 0]
+            heapq.heappush(self._heap, (count, value))
+            return
+        evicted_count = self._evict_least_frequent()
+        self._counts[value] = [evicted_count + count, evicted_count]
+        heapq.heappush(self._heap, (evicted_count + count, value))
+
+    def _evict_least_frequent(self):
+        while True:
+            heap_count, value = self._heap[0]
+            count = self._counts[value][0]
+            if heap_count == count:
+                heapq.heappop(self._heap)
+                del self._counts[value]
+                return count
+            heapq.heapreplace(self._heap, (count, value))
+
+    def get_top(self, count: int = DEFAULT_TOP_COUNT):
+        """Returns up to count (value, count, overcount) tuples, most frequent
+        first. The true count of each is between count - overcount and
+        count."""
+        ranked = sorted(self._counts.items(), key=lambda item: (-item[1][0], item[0]))
+        return [(value, counts[0], counts[1]) for value, counts in ranked[:count]]
+
+
+@dataclass
+class CheckSummary:
+    status_counts: dict[str, int] = field(
+        default_factory=lambda: dict.fromkeys(STATUS_NAMES, 0)
+    )
+    mismatched_emails: SpaceSavingCounter = field(default_factory=SpaceSavingCounter)
+    mismatched_signing_keys: SpaceSavingCounter = field(
+        default_factory=SpaceSavingCounter
+    )
+    unmatched_ssh_hosts: SpaceSavingCounter = field(default_factory=SpaceSavingCounter)
+
+    @property
+    def repo_count(self):
+        return sum(self.status_counts.values())
+
+    def add(self, record: SummaryRecord):
+        status, mismatched_email, mismatched_signing_key, unmatched_hosts = record
+        self.status_counts[status] += 1
+        if mismatched_email:
+            self.mismatched_emails.add(mismatched_email)
+        if mismatched_signing_key:
+            self.mismatched_signing_keys.add(mismatched_signing_key)
+        for hostname in unmatched_hosts:
+            self.unmatched_ssh_hosts.add(hostname)
+
+    def to_record(self, top_count: int = DEFAULT_TOP_COUNT):
+        """Returns a JSON-serializable form of the summary."""
+
+        def get_ranking(counter: SpaceSavingCounter):
+            return [
+                {"value": value, "count": count, "max_overcount": overcount}
+                for value, count, overcount in counter.get_top(top_count)
+            ]
+
+        return {
+            "repos": self.repo_count,
+            "worst_status_counts": self.status_counts,
+            "mismatched_emails": get_ranking(self.mismatched_emails),
+            "mismatched_signing_keys": get_ranking(self.mismatched_signing_keys),
+            "unmatched_ssh_hosts": get_ranking(self.unmatched_ssh_hosts),
+        }
+
+
+class CheckSummaryReporter:
+    """
+    Reports a single summary of all results. Each result is reduced to a
+    SummaryRecord with render_result, without rendering any of its lines.
+    """
+
+    def report_on_results(
+        self,
+        git_results: Iterable[CheckCmdResultData],
+        format_: str = "text",
+        is_styled: bool = True,
+    ):
+        return self.report_on_rendered_results(
+            (self.render_result(git_result) for git_result in git_results),
+            format_,
+            is_styled,
+        )
+
+    def report_on_rendered_results(
+        self,
+        rendered_results: Iterable[SummaryRecord],
+        format_: str = "text",
+        is_styled: bool = True,
+    ):
+        """Yields the text to echo for the summary of records already rendered
+        with render_result, such as by worker processes, once all have been
+        consumed.
+
+        :param Iterable[SummaryRecord] rendered_results: the records
+        :param str format_: the output format, "text", "json" or "ndjson"
+        (for which the summary is a single JSON object), defaults to "text"
+        :param bool is_styled: whether to style text output, defaults to True
+        :yield str: the text of the summary
+        """
+        summary = CheckSummary()
+        for record in rendered_results:
+            summary.add(record)
+        if format_ != "text":
+            yield json.dumps(summary.to_record())
+            return
+        yield self._render_summary(summary, ClickEchoWrapper(is_styled))
+
+    def render_result(self, git_result: CheckCmdResultData) -> SummaryRecord:
+        with TIMINGS.phase("rendering"):
+            return self._render_result(git_result)
+
+    def _render_result(self, git_result: CheckCmdResultData):
+        is_email_mismatched = git_result.gpg_uid_email_status == LineStatus.ERROR
+        unmatched_hosts = []
+        for remote in git_result.remotes:
+            ssh_status = git_result.get_ssh_status_for_remote(remote)
+            if ssh_status == LineStatus.ERROR:
+                is_email_mismatched = True
+            elif remote.is_ssh and git_result.get_ssh_entry_for_remote(remote) is None:
+                unmatched_hosts.append(remote.hostname)
+        is_signing_key_mismatched = (
+            git_result.gpg_uid_name_status == LineStatus.ERROR
+            or git_result.gpg_uid_email_status == LineStatus.ERROR
+        )
+        return (
+            _get_status_name(git_result.worst_status),
+            git_result.git_user_email if is_email_mismatched else None,
+            git_result.git_user_signing_key if is_signing_key_mismatched else None,
+            tuple(unmatched_hosts),
+        )
+
+    def _render_summary(
+        self, summary: CheckSummary, click_echo_wrapper: ClickEchoWrapper
+    ):
+        click_echo_wrapper.set_heading(f"Summary of {summary.repo_count} repos")
+        for status_name, count in summary.status_counts.items():
+            status = LineStatus[status_name.upper()]
+            click_echo_wrapper.add_line(
+                f"{status_name}: {count}",
+                1,
+                status=status if count > 0 else LineStatus.DEFAULT,
+            )
+        for title, counter, status in [
+            (
+                "Most frequent mismatched emails",
+                summary.mismatched_emails,
+                LineStatus.ERROR,
+            ),
+            (
+                "Most frequent mismatched signing keys",
+                summary.mismatched_signing_keys,
+                LineStatus.ERROR,
+            ),
+            (
+                "Most frequent ssh hosts with no matching Host block",
+                summary.unmatched_ssh_hosts,
+                LineStatus.WARNING,
+            ),
+        ]:
+            top = counter.get_top()
+            if not top:
+                continue
+            click_echo_wrapper.add_line(f"{title}:", 0)
+            for value, count, overcount in top:
+                # Counts which may include evicted values are approximate
+                approximation = "~" if overcount else ""
+                click_echo_wrapper.add_line(
+                    f"{approximation}{count} {value}", 1, status=status
+                )
+        return click_echo_wrapper.get_text()
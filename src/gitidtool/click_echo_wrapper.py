@@ -3,6 +3,10 @@ Click echo wrapper class and related enums which provide helpful methods for
 structuring and queueing command-line output.
 """
 
+import functools
+import queue
+import threading
+from collections.abc import Iterable
 from dataclasses import dataclass, field
 from enum import Enum, StrEnum
 
@@ -29,15 +33,64 @@ class LineStatus(Enum):
     ERROR = (3,)
 
 
+# Symbol and default color of each line status
+_STATUS_DECORATIONS = {
+    LineStatus.DEFAULT: ("", ClickEchoColor.DEFAULT),
+    LineStatus.GOOD: ("✅ ", ClickEchoColor.MATCH),
+    LineStatus.WARNING: ("❔ ", ClickEchoColor.WARNING),
+    LineStatus.ERROR: ("❌ ", ClickEchoColor.MISMATCH),
+}
+INDENTATION = "    "
+
+
+@functools.cache
+def _get_style_codes(color: ClickEchoColor, is_bold: bool):
+    """Returns the escape codes which click.style puts before and after text,
+    so that each line is styled with string concatenation alone."""
+    prefix, suffix = click.style("\0", fg=color, bold=is_bold).split("\0")
+    return prefix, suffix
+
+
+def _is_stdout_styled():
+    """Returns whether output written to stdout keeps its styling, which click
+    strips when stdout is not a terminal."""
+    return click.get_text_stream("stdout").isatty()
+
+
+def _make_line(
+    text: str,
+    indentation_level: int,
+    color: ClickEchoColor,
+    is_bold: bool,
+    status: LineStatus,
+):
+    # The symbol and color are resolved up front, so that formatting the text
+    # is a single pass of concatenation. Most lines have no status, and are
+    # told apart by identity, since hashing an enum member is slow.
+    status_symbol = ""
+    if status is not LineStatus.DEFAULT:
+        status_symbol, status_color = _STATUS_DECORATIONS[status]
+        if color is ClickEchoColor.DEFAULT:
+            color = status_color
+    return (text, indentation_level, status_symbol, color, is_bold)
+
+
 @dataclass
 class ClickEchoWrapper:
     """
     Click echo wrapper class which provides helpful methods for structuring
     text decoupled from the time that the text is actually echoed to the
     command-line.
+
+    Lines are collected as (text, indentation level, status symbol, color,
+    whether bold) records, under an optional heading, and are only formatted
+    when the text is requested, in a single pass. Styling is skipped entirely if
+    is_styled is False, such as when stdout is not a terminal.
     """
 
-    _output: list[str] = field(default_factory=list)
+    is_styled: bool = True
+    _heading: tuple | None = None
+    _lines: list[tuple] = field(default_factory=list)
 
     def add_line(
         self,
@@ -64,48 +117,109 @@ class ClickEchoWrapper:
         list (a value of -1 means the end of the list, emulating queueing),
         defaults to -1
         """
-        indentation = ""
-        for _ in range(indentation_level):
-            indentation += "    "
-        status_symbol = ""
-        match status:
-            case LineStatus.GOOD:
-                color = (
-                    ClickEchoColor.MATCH if color is ClickEchoColor.DEFAULT else color
-                )
-                status_symbol = "✅ "
-            case LineStatus.WARNING:
-                color = (
-                    ClickEchoColor.WARNING if color is ClickEchoColor.DEFAULT else color
-                )
-                status_symbol = "❔ "
-            case LineStatus.ERROR:
-                color = (
-                    ClickEchoColor.MISMATCH
-                    if color is ClickEchoColor.DEFAULT
-                    else color
-                )
-                status_symbol = "❌ "
-
+        if status is LineStatus.DEFAULT:
+            line = (text, indentation_level, "", color, isHeading)
+        else:
+            line = _make_line(text, indentation_level, color, isHeading, status)
         if insert_at_position < 0:
-            self._output.append(
-                click.style(
-                    f"{indentation}{status_symbol}{text}", fg=color, bold=isHeading
-                ),
+            self._lines.append(line)
+        else:
+            self._lines.insert(insert_at_position, line)
+
+    def set_heading(self, text: str, status: LineStatus = LineStatus.DEFAULT):
+        """Sets a bold line to be echoed before all other lines, which may be
+        set once its status is known, after the lines beneath it."""
+        self._heading = _make_line(text, 0, ClickEchoColor.DEFAULT, True, status)
+
+    def get_text(self):
+        """Returns all lines joined into a single string, as they would be
+        echoed. Does not clear the lines automatically."""
+        lines = self._lines if self._heading is None else [self._heading, *self._lines]
+        if not self.is_styled:
+            return "\n".join(
+                [
+                    f"{INDENTATION * indentation_level}{status_symbol}{text}"
+                    for text, indentation_level, status_symbol, _, _ in lines
+                ]
             )
-            return
-
-        self._output.insert(
-            insert_at_position,
-            click.style(
-                f"{indentation}{status_symbol}{text}", fg=color, bold=isHeading
-            ),
-        )
+        formatted_lines = []
+        for text, indentation_level, status_symbol, color, is_bold in lines:
+            prefix, suffix = _get_style_codes(color, is_bold)
+            formatted_lines.append(
+                f"{prefix}{INDENTATION * indentation_level}{status_symbol}{text}{suffix}"
+            )
+        return "\n".join(formatted_lines)
 
     def echo_all(self):
         """Echoes all lines using click. Does not clear the lines automatically."""
-        click.echo("\n".join(self._output))
+        click.echo(self.get_text())
 
     def clear(self):
         """Removes all lines."""
-        self._output.clear()
+        self._heading = None
+        self._lines.clear()
+
+
+def _echo_in_chunks(
+    outputs: Iterable[str], max_chunk_size: int = 1 << 16, max_buffered: int = 1024
+):
+    """Echoes each output on its own line. Outputs are produced on a
+    background thread, and whichever have been produced by the time the next
+    one is not yet available are written together, in chunks of up to
+    max_chunk_size characters. Very large reports are therefore written with
+    few writes, while slowly produced output still appears as soon as it is
+    made. Output produced before the outputs raise is written before the
+    exception is re-raised."""
+    items = queue.Queue(maxsize=max_buffered)
+    is_stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        while not is_stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for output in outputs:
+                if not put((output, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+            return
+        put((done, None))
+
+    chunk = list[str]()
+    chunk_size = 0
+
+    def write():
+        nonlocal chunk_size
+        if chunk:
+            click.echo("\n".join(chunk))
+            chunk.clear()
+            chunk_size = 0
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            try:
+                output, error = items.get_nowait()
+            except queue.Empty:
+                # Nothing more is ready, so what is buffered is written now
+                write()
+                output, error = items.get()
+            if output is done:
+                if error is not None:
+                    raise error
+                return
+            chunk.append(output)
+            chunk_size += len(output) + 1
+            if chunk_size >= max_chunk_size:
+                write()
+    finally:
+        is_stopped.set()
+        write()
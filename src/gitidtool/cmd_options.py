@@ -0,0 +1,91 @@
+"""
+Click options shared between commands. This module is imported on every
+command's startup path, so it must stay cheap to import.
+"""
+
+import functools
+
+import click
+
+from gitidtool.repo_discovery import DEFAULT_PRUNED_DIRECTORIES
+from gitidtool.timings import TIMINGS
+
+
+def recursive_options(command):
+    """Adds the -r/--recursive, --max-depth, --prune and --no-default-prune
+    options, passing the command the directory names to prune as a single
+    frozenset."""
+
+    @functools.wraps(command)
+    def pruned_command(*args, prune, default_prune, **kwargs):
+        pruned = DEFAULT_PRUNED_DIRECTORIES if default_prune else frozenset()
+        return command(*args, prune=pruned | frozenset(prune), **kwargs)
+
+    options_command = click.option(
+        "--default-prune/--no-default-prune",
+        default=True,
+        show_default=True,
+        help="Whether to skip the default directory names when checking "
+        "recursively, as well as any given with --prune",
+    )(pruned_command)
+    options_command = click.option(
+        "--prune",
+        multiple=True,
+        help="Directory name to skip when checking recursively, in addition to "
+        f"the defaults ({', '.join(sorted(DEFAULT_PRUNED_DIRECTORIES))}). "
+        "Directories which are repos themselves are never skipped",
+    )(options_command)
+    options_command = click.option(
+        "--max-depth",
+        type=click.IntRange(min=0),
+        default=None,
+        help="How many directory levels below the working directory to search "
+        "for repos when checking recursively (unlimited if not set)",
+    )(options_command)
+    return click.option(
+        "-r",
+        "--recursive",
+        is_flag=True,
+        default=False,
+        show_default=True,
+        help="Whether to recursively check nested repos",
+    )(options_command)
+
+
+def refresh_gpg_option(command):
+    """Adds the --refresh-gpg option."""
+    return click.option(
+        "--refresh-gpg",
+        is_flag=True,
+        default=False,
+        show_default=True,
+        help="Whether to re-read gpg keys even if the keyring has not changed",
+    )(command)
+
+
+def timings_option(command):
+    """Adds the --timings option, which prints the time spent in each phase
+    and counters such as files opened to stderr once the command finishes.
+    Timed commands don't use the daemon, so that the work is done (and
+    measured) in this process; commands check TIMINGS.is_enabled for this."""
+
+    @functools.wraps(command)
+    def timed_command(*args, timings, **kwargs):
+        if not timings:
+            return command(*args, **kwargs)
+        TIMINGS.is_enabled = True
+        try:
+            with TIMINGS.phase("total"):
+                return command(*args, **kwargs)
+        finally:
+            click.echo(TIMINGS.get_summary(), err=True)
+
+    return click.option(
+        "--timings",
+        is_flag=True,
+        default=False,
+        show_default=True,
+        help="Whether to print the time spent in each phase, and counts of "
+        "directories visited, files opened, subprocesses spawned and cache "
+        "hits and misses, to stderr",
+    )(timed_command)
@@ -0,0 +1,210 @@
+"""
+Resident daemon which keeps parsed gpg and ssh configuration warm in memory
+and serves checks over a Unix domain socket.
+
+Requests and responses are newline-delimited JSON. A request is a single
+object; the response is a stream of {"output": text} and {"error": text}
+objects, which the client echoes in order, terminated by {"done": true}. If
+evaluating the request fails unexpectedly, a {"failed": text} message is sent
+instead, and the client falls back to checking in-process.
+"""
+
+import json
+import os
+import socketserver
+import threading
+import traceback
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from gitidtool.cache import _get_stat_key
+from gitidtool.check_cmd_result import (
+    CheckCmdResultData,
+    CheckCmdResultJsonReporter,
+    CheckCmdResultReporter,
+)
+from gitidtool.check_summary import CheckSummaryReporter
+from gitidtool.click_echo_wrapper import ClickEchoWrapper
+from gitidtool.daemon_client import _request_from_daemon
+from gitidtool.file_system import _get_gpg_config, _get_ssh_config, _iter_git_config
+from gitidtool.git_data import GitConfigCache
+from gitidtool.gpg_keyring import _get_gnupg_home, _get_keyring_fingerprint
+from gitidtool.identity_index import IdentityIndex
+from gitidtool.repo_discovery import RepoDiscovery
+from gitidtool.ssh_data import _get_default_ssh_config_path
+
+
+def _get_identity_fingerprint(ssh_config_paths: list[Path]):
+    return [
+        [_get_stat_key(path) for path in ssh_config_paths],
+        _get_keyring_fingerprint(_get_gnupg_home()),
+    ]
+
+
+@contextmanager
+def _client_environment(environment: dict[str, str | None]):
+    """Sets the given environment variables (unsetting those which are None)
+    for the duration of a request, restoring the daemon's own afterwards."""
+    previous = {name: os.environ.get(name) for name in environment}
+    try:
+        _set_environment(environment)
+        yield
+    finally:
+        _set_environment(previous)
+
+
+def _set_environment(environment: dict[str, str | None]):
+    for name, value in environment.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+@dataclass
+class _IdentityState:
+    identity_index: IdentityIndex
+    fingerprint: list
+    ssh_config_paths: list[Path]
+    # Reported with every request, as they are when checking in-process
+    ssh_warnings: list[str]
+
+
+@dataclass
+class DaemonState:
+    """
+    Parsed configuration kept warm between requests. An identity index is
+    kept for each client environment (its HOME, GNUPGHOME and so on), and is
+    rebuilt whenever the ssh config (or a file it includes) or gpg keyring
+    changes on disk.
+
+    Requests are evaluated one at a time, since each sets the process
+    environment to the client's.
+    """
+
+    git_config_cache: GitConfigCache = field(
+        default_factory=lambda: GitConfigCache().load()
+    )
+    # Client environment => its identity state
+    identity_states: dict[tuple, _IdentityState] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def get_identity_state(self, environment: dict, refresh_gpg: bool = False):
+        """Returns the identity state for the client environment, which must
+        already be set, reading it again if its files changed."""
+        key = tuple(sorted(environment.items()))
+        state = self.identity_states.get(key)
+        if (
+            refresh_gpg
+            or state is None
+            or _get_identity_fingerprint(state.ssh_config_paths) != state.fingerprint
+        ):
+            ssh_config_paths = list[Path]()
+            ssh_warnings = list[str]()
+            identity_index = IdentityIndex.build(
+                _get_gpg_config(refresh_gpg),
+                _get_ssh_config(ssh_config_paths, ssh_warnings),
+            )
+            if not ssh_config_paths:
+                ssh_config_paths = [_get_default_ssh_config_path()]
+            state = _IdentityState(
+                identity_index,
+                _get_identity_fingerprint(ssh_config_paths),
+                ssh_config_paths,
+                ssh_warnings,
+            )
+            self.identity_states[key] = state
+        return state
+
+    def handle(self, request: dict):
+        """Evaluates a request, yielding each {"output": text} or
+        {"error": text} message. Raises a RuntimeError if no repo could be
+        found."""
+        if request["command"] == "ping":
+            return
+        environment = request.get("environment", {})
+        with self._lock, _client_environment(environment):
+            identity_state = self.get_identity_state(
+                environment, request.get("refresh_gpg", False)
+            )
+            for warning in identity_state.ssh_warnings:
+                yield {"error": f"Warning: {warning}"}
+            yield from (
+                {"output": output}
+                for output in self._iter_outputs(request, identity_state.identity_index)
+            )
+
+    def _iter_outputs(self, request: dict, identity_index: IdentityIndex):
+        repo_discovery = RepoDiscovery(
+            frozenset(request.get("prune", [])), request.get("max_depth")
+        )
+        git_config = _iter_git_config(
+            request.get("global", False),
+            request.get("recursive", False),
+            request["cwd"],
+            repo_discovery,
+            self.git_config_cache,
+        )
+        results = (CheckCmdResultData(entry, identity_index) for entry in git_config)
+        format_ = request.get("format", "text")
+        if request["command"] == "check" and request.get("summary", False):
+            yield from CheckSummaryReporter().report_on_results(
+                results, format_, request.get("styled", True)
+            )
+        elif request["command"] == "check" and format_ == "text":
+            yield from CheckCmdResultReporter().report_on_results(
+                results, ClickEchoWrapper(request.get("styled", True))
+            )
+        elif request["command"] == "check":
+            yield from CheckCmdResultJsonReporter().report_on_results(
+                results, as_array=format_ == "json"
+            )
+        else:
+            for _ in results:
+                pass
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        try:
+            for message in self.server.state.handle(request):
+                self._send(message)
+        except RuntimeError as e:
+            self._send({"error": str(e)})
+        except Exception as e:
+            # Logged here, while the client falls back to checking in-process
+            traceback.print_exc()
+            self._send({"failed": f"{type(e).__name__}: {e}"})
+        self._send({"done": True})
+
+    def _send(self, message: dict):
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, state: DaemonState | None = None):
+        self.state = state if state else DaemonState()
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if socket_path.exists():
+            # A previous daemon may have exited without cleaning up
+            try:
+                for _ in _request_from_daemon({"command": "ping"}, socket_path):
+                    pass
+            except ConnectionError:
+                socket_path.unlink()
+            else:
+                raise RuntimeError(f"A daemon is already listening on {socket_path}")
+        previous_umask = os.umask(0o077)
+        try:
+            super().__init__(str(socket_path), _DaemonRequestHandler)
+        finally:
+            os.umask(previous_umask)
+
+    def server_close(self):
+        super().server_close()
+        self.state.git_config_cache.save()
+        Path(self.server_address).unlink(missing_ok=True)
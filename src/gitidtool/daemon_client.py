@@ -0,0 +1,104 @@
+"""
+Thin client for the resident daemon, used by the check and guard commands.
+This module is imported on every command's startup path, so it must stay cheap
+to import.
+"""
+
+import json
+import os
+import socket
+from pathlib import Path
+
+import click
+
+from gitidtool.cache import _get_cache_dir
+
+CLIENT_TIMEOUT_SECONDS = 30
+# The environment variables which determine which git, gpg and ssh files are
+# read, sent with each request so that the daemon reads the client's files
+# rather than its own
+CLIENT_ENVIRONMENT_VARIABLES = (
+    "GIT_CONFIG_GLOBAL",
+    "GIT_CONFIG_NOSYSTEM",
+    "GIT_CONFIG_SYSTEM",
+    "GNUPGHOME",
+    "HOME",
+    "XDG_CONFIG_HOME",
+)
+
+
+class DaemonRequestError(ConnectionError):
+    """Raised when the daemon fails while evaluating a request, rather than
+    when none is running."""
+
+
+def _get_socket_path() -> Path:
+    override = os.environ.get("GIT_ID_TOOL_SOCKET")
+    if override:
+        return Path(override)
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir, "git-id-tool.sock")
+    return _get_cache_dir().joinpath("daemon.sock")
+
+
+def _request_from_daemon(request: dict, socket_path: Path | None = None):
+    """Sends a request to a running daemon, yielding each message it responds
+    with (except for the final "done" message).
+
+    :param dict request: the request to send
+    :param Path socket_path: the daemon's socket, defaults to the standard
+    location
+    :raises ConnectionError: if no daemon is running, or it fails before
+    completing its response
+    :raises DaemonRequestError: if the daemon fails while evaluating the
+    request
+    :yield dict: the {"output": text} or {"error": text} messages, in order
+    """
+    socket_path = socket_path if socket_path else _get_socket_path()
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(CLIENT_TIMEOUT_SECONDS)
+    try:
+        client.connect(str(socket_path))
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("r") as response:
+            for line in response:
+                message = json.loads(line)
+                if message.get("done"):
+                    return
+                if "failed" in message:
+                    raise DaemonRequestError(f"The daemon failed: {message['failed']}")
+                yield message
+    except ConnectionError:
+        raise
+    except OSError as e:
+        raise ConnectionError(f"No daemon responding on {socket_path}") from e
+    finally:
+        client.close()
+    raise ConnectionError("The daemon closed the connection unexpectedly")
+
+
+def _echo_from_daemon(request: dict):
+    """Runs the request on a resident daemon if one is running, echoing its
+    output. Returns False if no daemon is available, or it fails before any
+    output, so that the caller can fall back to evaluating in-process."""
+    request = request | {
+        "environment": {
+            name: os.environ.get(name) for name in CLIENT_ENVIRONMENT_VARIABLES
+        }
+    }
+    has_output = False
+    try:
+        for message in _request_from_daemon(request):
+            if "error" in message:
+                click.echo(message["error"], err=True)
+            else:
+                has_output = True
+                click.echo(message["output"])
+    except ConnectionError as e:
+        if has_output:
+            raise click.ClickException(str(e))
+        if isinstance(e, DaemonRequestError):
+            click.echo(f"Warning: {e}, so running without it", err=True)
+        return False
+    return True
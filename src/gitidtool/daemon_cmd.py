@@ -0,0 +1,32 @@
+import signal
+from pathlib import Path
+
+import click
+
+from gitidtool.daemon import DaemonServer
+from gitidtool.daemon_client import _get_socket_path
+
+
+@click.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="The Unix domain socket to listen on (defaults to $GIT_ID_TOOL_SOCKET, "
+    "or git-id-tool.sock in $XDG_RUNTIME_DIR)",
+)
+def daemon(socket_path):
+    socket_path = socket_path if socket_path else _get_socket_path()
+    try:
+        server = DaemonServer(socket_path)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    # Stop cleanly (removing the socket) on SIGTERM, as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with server:
+        click.echo(f"Listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
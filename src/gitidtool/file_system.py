@@ -1,54 +1,151 @@
+import itertools
 import os
+import queue
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import click
-from gitidtool.git_data import GitDataEntry, GitDataEntryFactory, GitDataReader
-from gitidtool.gpg_data import GpgDataEntryFactory, GpgDataReader
-from gitidtool.ssh_data import SshDataEntryFactory, SshDataReader
+from gitidtool.git_config_file import _get_global_config_path
+from gitidtool.git_data import (
+    GitConfigCache,
+    GitDataEntry,
+    GitDataEntryFactory,
+    GitDataReader,
+)
+from gitidtool.gpg_data import GpgDataEntryFactory, GpgDataReader, GpgKeyringCache
+from gitidtool.repo_discovery import RepoDiscovery, _get_config_path
+from gitidtool.ssh_data import IdentityFileCache, SshDataEntryFactory, SshDataReader
 
 
-def _get_ssh_config():
+def _get_ssh_config(
+    read_paths: list[Path] | None = None, warnings: list[str] | None = None
+):
     factory = SshDataEntryFactory()
-    reader = SshDataReader(factory)
-    return reader.get_config_entries_from_file()
+    cache = IdentityFileCache().load()
+    reader = SshDataReader(factory, cache)
+    result = reader.get_config_entries_from_file()
+    cache.save()
+    if read_paths is not None:
+        read_paths += reader.read_paths
+    if warnings is not None:
+        warnings += reader.warnings
+    return result
 
 
-def _get_gpg_config():
+def _get_gpg_config(refresh: bool = False):
     factory = GpgDataEntryFactory()
-    reader = GpgDataReader(factory)
-    return reader.get_gpg_config()
+    cache = GpgKeyringCache().load()
+    reader = GpgDataReader(factory, cache)
+    result = reader.get_gpg_config(refresh)
+    cache.save()
+    return result
 
 
-def _get_git_config(include_global: bool, do_recursive_check: bool, relative_path: str):
-    factory = GitDataEntryFactory()
-    reader = GitDataReader(factory)
-    config_paths = _get_git_config_paths(do_recursive_check, relative_path)
+def _iter_git_config_paths(
+    include_global: bool,
+    do_recursive_check: bool,
+    relative_path: str,
+    repo_discovery: RepoDiscovery | None = None,
+):
+    """Yields the path of each repo's config as it is discovered, then the
+    global config if included. Raises a RuntimeError once discovery finishes
+    if no config was found."""
+    has_result = False
+    for path in _get_git_config_paths(
+        do_recursive_check, relative_path, repo_discovery
+    ):
+        has_result = True
+        yield path
     if include_global:
-        config_paths.add(Path("~/.gitconfig").expanduser())
-    if len(config_paths) == 0:
+        has_result = True
+        yield Path(_get_global_config_path())
+    if not has_result:
         raise RuntimeError(
-            f"Could not locate a git repo in the working directory ({os.getcwd()})"
+            "Could not locate a git repo in the working directory "
+            f"({os.path.abspath(relative_path)})"
         )
-    result = []
-    for path in config_paths:
-        result.append(reader.get_git_config_from_file(path))
-    return result
 
 
-def _get_git_config_paths(do_recursive_check: bool, relative_path: str):
-    config_paths = set[Path]()
-    current_git_repo_candidate = os.path.join(
-        os.getcwd(), relative_path, ".git", "config"
-    )
-    if Path(current_git_repo_candidate).exists():
-        config_paths.add(Path(current_git_repo_candidate))
+def _iter_git_config(
+    include_global: bool,
+    do_recursive_check: bool,
+    relative_path: str,
+    repo_discovery: RepoDiscovery | None = None,
+    cache: GitConfigCache | None = None,
+):
+    """Yields the parsed config of each repo as it is discovered. Raises a
+    RuntimeError once discovery finishes if no config was found."""
+    factory = GitDataEntryFactory()
+    cache = cache if cache else GitConfigCache().load()
+    reader = GitDataReader(factory, cache)
+    try:
+        for path in _iter_git_config_paths(
+            include_global, do_recursive_check, relative_path, repo_discovery
+        ):
+            yield reader.get_git_config_from_file(path)
+    finally:
+        cache.save()
+
+
+def _prefetch(iterable: Iterable, max_buffered: int = 64):
+    """Consumes the iterable on a background thread, up to max_buffered items
+    ahead of the caller, yielding its items (or re-raising its exception) in
+    order. This lets discovery and parsing run while earlier results are
+    being reported, without holding more than a bounded number in memory."""
+    items = queue.Queue(maxsize=max_buffered)
+    is_stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        while not is_stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+            return
+        put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        is_stopped.set()
+
+
+def _get_git_config_paths(
+    do_recursive_check: bool,
+    relative_path: str,
+    repo_discovery: RepoDiscovery | None = None,
+):
     if do_recursive_check:
-        for root, directories, _ in os.walk("."):
-            for directory in directories:
-                if directory == ".git":
-                    os_path = os.path.join(root, directory, "config")
-                    config_paths.add(Path(os_path).resolve())
-    return config_paths
+        repo_discovery = repo_discovery if repo_discovery else RepoDiscovery()
+        yield from repo_discovery.iter_config_paths(relative_path)
+        return
+    # The .git may be a directory, or a file pointing elsewhere as in a
+    # worktree or submodule
+    current_git_repo_candidate = _get_config_path(
+        Path(os.path.abspath(relative_path), ".git")
+    )
+    if current_git_repo_candidate is not None:
+        yield current_git_repo_candidate
 
 
 def _read_config(
@@ -56,20 +153,52 @@ def _read_config(
     do_recursive_check: bool,
     relative_path: str,
     suppress_status_output: bool = False,
+    repo_discovery: RepoDiscovery | None = None,
+    refresh_gpg: bool = False,
+    parse_git_config: bool = True,
+    ssh_read_paths: list[Path] | None = None,
+    ssh_warnings: list[str] | None = None,
 ):
-    if not suppress_status_output:
-        click.echo("Reading git repo configuration files...")
-    try:
-        git_config: list[GitDataEntry] = _get_git_config(
-            include_global, do_recursive_check, relative_path
+    """Reads the git, gpg and ssh configuration, returning None (after
+    reporting the error) if no repo could be found. If parse_git_config is
+    False, the paths of the git config files are returned instead of their
+    parsed entries, for callers which parse them elsewhere. If given,
+    ssh_read_paths and ssh_warnings are extended with the files the ssh
+    config depends on and with the warnings reported while reading it."""
+    # The gpg subprocess and ssh parsing are independent of the git repo
+    # configuration, so they run in the background while repos are discovered
+    # and parsed. Status messages and errors are still reported in a fixed
+    # order, as results are collected.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        gpg_future = executor.submit(_get_gpg_config, refresh_gpg)
+        ssh_warnings = ssh_warnings if ssh_warnings is not None else list[str]()
+        ssh_future = executor.submit(_get_ssh_config, ssh_read_paths, ssh_warnings)
+        if not suppress_status_output:
+            click.echo("Reading git repo configuration files...")
+        iter_git_config = (
+            _iter_git_config if parse_git_config else _iter_git_config_paths
         )
-    except RuntimeError as e:
-        click.echo(e)
-        return
-    if not suppress_status_output:
-        click.echo("Reading gpg configuration...")
-    gpg_config = _get_gpg_config()
-    if not suppress_status_output:
-        click.echo("Reading ssh configuration...")
-    ssh_config = _get_ssh_config()
+        git_config = _prefetch(
+            iter_git_config(
+                include_global, do_recursive_check, relative_path, repo_discovery
+            )
+        )
+        try:
+            # Waits for the first repo only, so that a missing repo is still
+            # reported before anything else
+            first_entry = next(git_config)
+        except RuntimeError as e:
+            click.echo(e, err=True)
+            return
+        if not suppress_status_output:
+            click.echo("Reading gpg configuration...")
+        gpg_config = gpg_future.result()
+        if not suppress_status_output:
+            click.echo("Reading ssh configuration...")
+        ssh_config = ssh_future.result()
+        for warning in ssh_warnings:
+            click.echo(f"Warning: {warning}", err=True)
+    git_config: Iterator[GitDataEntry | Path] = itertools.chain(
+        [first_entry], git_config
+    )
     return git_config, gpg_config, ssh_config
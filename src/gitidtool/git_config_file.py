@@ -0,0 +1,322 @@
+"""
+Parsing of git config files into (section, subsection, key, value) tuples, and
+native resolution of [include] and [includeIf "gitdir:..."] sections, with each
+file's parse memoized for the duration of a run. The system, XDG and global
+config files which git reads before a repo's own config are resolved the same
+way, as base layers shared by every repo.
+"""
+
+import os
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+from gitidtool.cache import StatKey, _get_stat_key
+from gitidtool.timings import TIMINGS
+
+# (section, subsection, key, value). Section and key names are lowercase, as
+# they are case-insensitive in git, while subsections are kept as written.
+GitConfigValue = tuple[str, str | None, str, str]
+
+# git's own limit on nested includes
+MAX_INCLUDE_DEPTH = 10
+
+_SECTION_HEADER_PATTERN = re.compile(
+    r'\[\s*([A-Za-z0-9.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]'
+)
+_ESCAPE_SEQUENCES = {"n": "\n", "t": "\t", "b": "\b", '"': '"', "\\": "\\"}
+
+
+def _parse_value(text: str):
+    """Parses the value after the "=" of a config line, handling quotes,
+    escapes and trailing comments. Returns the value, and whether the line
+    ends with a continuation backslash."""
+    value = []
+    # Unquoted whitespace is collapsed and trimmed, so it is only added once
+    # another character follows it
+    pending_whitespace = ""
+    is_quoted = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            if i + 1 == len(text):
+                return "".join(value) + pending_whitespace, True
+            value.append(pending_whitespace)
+            pending_whitespace = ""
+            value.append(_ESCAPE_SEQUENCES.get(text[i + 1], text[i + 1]))
+            i += 2
+            continue
+        if char == '"':
+            is_quoted = not is_quoted
+        elif not is_quoted and char in "#;":
+            break
+        elif not is_quoted and char.isspace():
+            if value:
+                pending_whitespace += char
+        else:
+            value.append(pending_whitespace)
+            pending_whitespace = ""
+            value.append(char)
+        i += 1
+    return "".join(value), False
+
+
+def _parse_git_config_lines(lines: Iterable[str]):
+    """Parses the lines of a git config file into a list of values, in the
+    order they appear."""
+    values = list[GitConfigValue]()
+    section = None
+    subsection = None
+    continued_key = None
+    continued_value = ""
+    for line in lines:
+        if continued_key is not None:
+            value, is_continued = _parse_value(line.rstrip("\n"))
+            continued_value += value
+            if is_continued:
+                continue
+            values.append((section, subsection, continued_key, continued_value))
+            continued_key = None
+            continue
+        line = line.strip()
+        if line == "" or line[0] in "#;":
+            continue
+        if line[0] == "[":
+            match = _SECTION_HEADER_PATTERN.match(line)
+            if match is None:
+                continue
+            section = match.group(1).lower()
+            subsection = match.group(2)
+            if subsection is not None:
+                subsection = re.sub(r"\\(.)", r"\1", subsection)
+            elif "." in section:
+                # Deprecated [section.subsection] syntax
+                section, subsection = section.split(".", 1)
+            line = line[match.end() :].strip()
+            if line == "" or line[0] in "#;":
+                continue
+        if section is None:
+            continue
+        key, has_value, text = line.partition("=")
+        key = key.strip().lower()
+        if not has_value:
+            # A key without a value is a boolean true
+            values.append((section, subsection, key, "true"))
+            continue
+        value, is_continued = _parse_value(text.strip())
+        if is_continued:
+            continued_key = key
+            continued_value = value
+            continue
+        values.append((section, subsection, key, value))
+    return values
+
+
+# The system config's location depends on how git was built, which is not
+# known without running git. This is where distribution packages put it.
+DEFAULT_SYSTEM_CONFIG_PATH = "/etc/gitconfig"
+
+
+def _is_env_true(name: str):
+    return os.environ.get(name, "").lower() in ("true", "yes", "on", "1")
+
+
+def _get_global_config_path():
+    """Returns the absolute path of the global config file, as written by git
+    config --global."""
+    return os.path.abspath(
+        os.environ.get("GIT_CONFIG_GLOBAL") or os.path.expanduser("~/.gitconfig")
+    )
+
+
+def _get_base_config_paths():
+    """Returns the config files git reads before a repo's own config, in the
+    order it reads them (later values win), whether or not they exist:
+    system, then XDG and global, following git's environment overrides."""
+    paths = list[str]()
+    if not _is_env_true("GIT_CONFIG_NOSYSTEM"):
+        paths.append(os.environ.get("GIT_CONFIG_SYSTEM") or DEFAULT_SYSTEM_CONFIG_PATH)
+    if "GIT_CONFIG_GLOBAL" not in os.environ:
+        xdg_config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser(
+            "~/.config"
+        )
+        paths.append(os.path.join(xdg_config_home, "git", "config"))
+    paths.append(_get_global_config_path())
+    return [os.path.abspath(path) for path in paths]
+
+
+@lru_cache(maxsize=None)
+def _compile_gitdir_pattern(pattern: str, is_case_insensitive: bool):
+    """Compiles an includeIf gitdir pattern, which must already be expanded
+    to an absolute path, into a regex following git's wildmatch rules."""
+    if pattern.endswith("/"):
+        pattern += "**"
+    regex = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            regex.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            regex.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2 :]:
+            end = pattern.index("]", i + 2)
+            char_class = pattern[i + 1 : end].replace("\\", "\\\\")
+            if char_class.startswith("!"):
+                char_class = "^" + char_class[1:]
+            regex.append(f"[{char_class}]")
+            i = end + 1
+        else:
+            regex.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(regex), re.IGNORECASE if is_case_insensitive else 0)
+
+
+def _is_include_condition_met(condition: str, included_from: str, gitdir: str | None):
+    """Returns whether an [includeIf "<condition>"] section applies. Only the
+    gitdir conditions are supported; onbranch and hasconfig conditions never
+    match."""
+    kind, _, pattern = condition.partition(":")
+    if kind not in ("gitdir", "gitdir/i") or gitdir is None:
+        return False
+    if pattern.startswith("~/"):
+        pattern = os.path.expanduser(pattern)
+    elif pattern.startswith("./"):
+        pattern = os.path.join(os.path.dirname(included_from), pattern[2:])
+    elif not pattern.startswith("/"):
+        pattern = "**/" + pattern
+    compiled = _compile_gitdir_pattern(pattern, kind == "gitdir/i")
+    return compiled.fullmatch(gitdir) is not None
+
+
+@dataclass
+class GitConfigFileReader:
+    """
+    Reads git config files, resolving includes. Each included file is stat-ed
+    and parsed at most once per reader, so a shared file included by thousands
+    of repos is only read once per run.
+    """
+
+    # path => (stat key, parsed values), both None if the file is unreadable
+    _files: dict[str, tuple[StatKey | None, list[GitConfigValue] | None]] = field(
+        default_factory=dict
+    )
+    # layer paths => (values, dependencies), for layers without includeIf
+    # sections, whose resolution is the same for every repo
+    _layers: dict[tuple[str, ...], tuple[list[GitConfigValue], list[str]]] = field(
+        default_factory=dict
+    )
+
+    def _read(self, path: str):
+        if path not in self._files:
+            stat_key = _get_stat_key(path)
+            values = None
+            if stat_key is not None:
+                try:
+                    TIMINGS.increment("files opened")
+                    with open(path, "r") as file:
+                        values = _parse_git_config_lines(file)
+                except IsADirectoryError:
+                    # Directories are only depended on for their stat, such
+                    # as a repo's list of worktrees
+                    pass
+                except OSError:
+                    stat_key = None
+            self._files[path] = (stat_key, values)
+        return self._files[path]
+
+    def get_stat_key(self, path: str):
+        """Returns the stat key of a file, as of the first time this reader
+        accessed it."""
+        return self._read(path)[0]
+
+    def resolve(self, path: str | Path, gitdir: str | None = None):
+        """Returns the values of the config file with its includes expanded in
+        place, and the paths of every included file (including missing ones,
+        so that creating one can be detected). Only included files are
+        memoized, since each repo's own config is read once anyway.
+
+        :param str | Path path: the config file
+        :param str | None gitdir: the repo's .git directory, used to evaluate
+        includeIf gitdir conditions, defaults to None (never matching)
+        """
+        path = os.path.abspath(path)
+        TIMINGS.increment("files opened")
+        with open(path, "r") as file:
+            file_values = _parse_git_config_lines(file)
+        values = list[GitConfigValue]()
+        dependencies = list[str]()
+        self._resolve(path, file_values, gitdir, values, dependencies, 0)
+        return values, dependencies
+
+    def resolve_layers(self, paths: Iterable[str], gitdir: str | None = None):
+        """Returns the values of the given layer files (such as the base layers
+        from _get_base_config_paths) in order, with their includes expanded,
+        and the paths of every layer and included file, existing or not.
+
+        Each file is only parsed once per reader. The resolution is memoized
+        too, unless a layer has includeIf sections, whose conditions depend on
+        the repo; these layers are resolved again from the parsed values.
+        The returned lists may be shared, so must not be modified.
+
+        :param Iterable[str] paths: the absolute paths of the layer files
+        :param str | None gitdir: the repo's .git directory, used to evaluate
+        includeIf gitdir conditions, defaults to None (never matching)
+        """
+        paths = tuple(paths)
+        resolved = self._layers.get(paths)
+        if resolved is not None:
+            return resolved
+        values = list[GitConfigValue]()
+        dependencies = list[str]()
+        for path in paths:
+            dependencies.append(path)
+            file_values = self._read(path)[1]
+            if file_values is not None:
+                self._resolve(path, file_values, gitdir, values, dependencies, 0)
+        is_conditional = any(value[0] == "includeif" for value in values)
+        if not is_conditional:
+            self._layers[paths] = values, dependencies
+        return values, dependencies
+
+    def _resolve(
+        self,
+        path: str,
+        file_values: list[GitConfigValue],
+        gitdir: str | None,
+        values: list[GitConfigValue],
+        dependencies: list[str],
+        depth: int,
+    ):
+        for value in file_values:
+            section, subsection, key, include_path = value
+            values.append(value)
+            if key != "path" or depth >= MAX_INCLUDE_DEPTH:
+                continue
+            if section == "include" and subsection is None:
+                pass
+            elif section == "includeif" and subsection is not None:
+                if not _is_include_condition_met(subsection, path, gitdir):
+                    continue
+            else:
+                continue
+            included = os.path.join(
+                os.path.dirname(path), os.path.expanduser(include_path)
+            )
+            included = os.path.abspath(included)
+            dependencies.append(included)
+            included_values = self._read(included)[1]
+            if included_values is not None:
+                self._resolve(
+                    included, included_values, gitdir, values, dependencies, depth + 1
+                )
@@ -1,43 +1,76 @@
+import dataclasses
+import os
+import sys
+from collections.abc import Callable, Iterable
 from dataclasses import dataclass, field
-from functools import cached_property
 from pathlib import Path
 
-import regex
-
+from gitidtool.cache import CacheFile, StatKey, _get_stat_key
+from gitidtool.git_config_file import (
+    GitConfigFileReader,
+    GitConfigValue,
+    _get_base_config_paths,
+)
 from gitidtool.gpg_data import GpgDataEntry
-from gitidtool.ssh_data import SshDataEntry
+from gitidtool.remote_url import InsteadOfRewriter, RemoteUrl, _classify_remote_url
+from gitidtool.repo_discovery import _read_pointer
+from gitidtool.ssh_data import SshDataEntry, SshHostMatcher
+from gitidtool.timings import TIMINGS
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GitRemoteDataEntry:
     remote_name: str
+    # As configured
     url: str
+    # The url after any url.<base>.insteadOf rewrite, or "" if none applies
+    rewritten_url: str = ""
+    # Derived on first access, since frozen slotted classes cannot use
+    # cached_property
+    _remote_url: RemoteUrl | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def effective_url(self):
+        return self.rewritten_url or self.url
+
+    @property
+    def remote_url(self):
+        if self._remote_url is None:
+            remote_url = _classify_remote_url(self.effective_url)
+            object.__setattr__(self, "_remote_url", remote_url)
+        return self._remote_url
 
-    @cached_property
+    @property
     def hostname(self):
-        return self.url.split("@", 1)[1].split(":", 1)[0]
+        return self.remote_url.host
+
+    @property
+    def is_ssh(self):
+        return self.remote_url.is_ssh
 
     def get_ssh_entry_matching_hostname(self, ssh_config: list[SshDataEntry]):
-        ssh_entries = [
-            ssh_entry for ssh_entry in ssh_config if ssh_entry.hostname == self.hostname
-        ]
-        if len(ssh_entries) == 0:
-            # no matching ssh host
-            return None
-        # the first entry is what matters
-        return ssh_entries[0]
+        # the first matching entry is what matters
+        return SshHostMatcher.build(ssh_config).match(self.hostname)
 
     def __hash__(self):
-        return hash((self.remote_name, self.url))
+        return hash((self.remote_name, self.url, self.rewritten_url))
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GitDataEntry:
     path: str = ""
     name: str = ""
     email: str = ""
     signing_key: str = ""
     remotes: list[GitRemoteDataEntry] = field(default_factory=list)
+    # The working tree directories which use this config: the main one, then
+    # any linked worktrees
+    worktrees: list[str] = field(default_factory=list)
+    _repo_folder_name: str | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     def get_gpg_entry_matching_signing_key(self, gpg_config: list[GpgDataEntry]):
         gpg_entries = [
@@ -56,11 +89,17 @@ class GitDataEntry:
         # the first entry is what matters
         return gpg_entries[0]
 
-    @cached_property
+    @property
     def repo_folder_name(self):
-        parts = Path(self.path).parts
+        if self._repo_folder_name is None:
+            object.__setattr__(self, "_repo_folder_name", self._get_repo_folder_name())
+        return self._repo_folder_name
+
+    def _get_repo_folder_name(self):
+        if self.worktrees:
+            return Path(self.worktrees[0]).name
         # get the third-to-last part, before "/.git/" and "/config"
-        return parts[len(parts) - 3]
+        return os.path.basename(os.path.dirname(os.path.dirname(self.path)))
 
 
 @dataclass
@@ -70,64 +109,294 @@ class GitDataEntryFactory:
     email: str = ""
     signing_key: str = ""
     remotes: list[GitRemoteDataEntry] = field(default_factory=list)
+    worktrees: list[str] = field(default_factory=list)
 
     def create(self):
+        # The same names, emails and keys repeat across many repos, so each is
+        # only stored once
         return GitDataEntry(
-            self.path, self.name, self.email, self.signing_key, self.remotes
+            self.path,
+            sys.intern(self.name),
+            sys.intern(self.email),
+            sys.intern(self.signing_key),
+            self.remotes,
+            self.worktrees,
+        )
+
+
+@dataclass
+class _GitConfigValues:
+    """
+    The values an entry is made from, as set by the config values applied so
+    far. As in git, later values of user.* and core.* keys win, while remotes
+    and url rewrites accumulate.
+    """
+
+    name: str = ""
+    email: str = ""
+    signing_key: str = ""
+    # (name, url) of each remote, rewritten once all rules are known
+    remote_urls: list[tuple[str, str]] = field(default_factory=list)
+    # (base, prefix) of each url.<base>.insteadOf value
+    instead_of_rules: list[tuple[str, str]] = field(default_factory=list)
+    core_worktree: str | None = None
+    is_bare: bool = False
+
+    def copy(self):
+        return dataclasses.replace(
+            self,
+            remote_urls=list(self.remote_urls),
+            instead_of_rules=list(self.instead_of_rules),
         )
 
+    def apply(self, values: Iterable[GitConfigValue]):
+        for section, subsection, key, value in values:
+            if section == "user" and subsection is None:
+                match key:
+                    case "name":
+                        self.name = value
+                    case "email":
+                        self.email = value
+                    case "signingkey":
+                        self.signing_key = value
+            elif section == "remote" and subsection is not None and key == "url":
+                self.remote_urls.append((subsection, value))
+            elif section == "url" and subsection is not None and key == "insteadof":
+                self.instead_of_rules.append((subsection, value))
+            elif section == "core" and subsection is None:
+                match key:
+                    case "worktree":
+                        self.core_worktree = value
+                    case "bare":
+                        self.is_bare = value.lower() in ("true", "yes", "on", "1")
+        return self
+
+
+GIT_CONFIG_CACHE_SCHEMA_VERSION = 5
+
+
+@dataclass
+class GitConfigCache:
+    """
+    Persistent cache of parsed git config files, keyed by path and validated
+    against the (mtime, size, inode) of each file and of every file it
+    includes.
+    """
+
+    cache_file: CacheFile = field(
+        default_factory=lambda: CacheFile(
+            "git_config.json", GIT_CONFIG_CACHE_SCHEMA_VERSION
+        )
+    )
+    _seen_keys: set[str] = field(default_factory=set)
+
+    def load(self):
+        self.cache_file.load()
+        self._seen_keys.clear()
+        return self
+
+    def get(
+        self,
+        path: Path,
+        stat_key: StatKey,
+        get_stat_key: Callable[[str], StatKey | None] = _get_stat_key,
+    ):
+        key = str(path)
+        self._seen_keys.add(key)
+        cached = self.cache_file.get(key)
+        if cached is None or cached["stat"] != stat_key:
+            return None
+        for dependency_path, dependency_stat_key in cached["dependencies"]:
+            if get_stat_key(dependency_path) != dependency_stat_key:
+                return None
+        return GitDataEntry(
+            path,
+            sys.intern(cached["name"]),
+            sys.intern(cached["email"]),
+            sys.intern(cached["signing_key"]),
+            [
+                GitRemoteDataEntry(
+                    sys.intern(name), sys.intern(url), sys.intern(rewritten_url)
+                )
+                for name, url, rewritten_url in cached["remotes"]
+            ],
+            cached["worktrees"],
+        )
+
+    def set(
+        self,
+        path: Path,
+        stat_key: StatKey,
+        entry: GitDataEntry,
+        dependencies: list[tuple[str, StatKey | None]] | None = None,
+    ):
+        key = str(path)
+        self._seen_keys.add(key)
+        self.cache_file.set(
+            key,
+            {
+                "stat": stat_key,
+                "dependencies": [
+                    [dependency_path, dependency_stat_key]
+                    for dependency_path, dependency_stat_key in dependencies or []
+                ],
+                "name": entry.name,
+                "email": entry.email,
+                "signing_key": entry.signing_key,
+                "remotes": [
+                    [remote.remote_name, remote.url, remote.rewritten_url]
+                    for remote in entry.remotes
+                ],
+                "worktrees": entry.worktrees,
+            },
+        )
+
+    def get_dependencies(self, path: Path):
+        """Returns the [path, stat key] of each file included by the cached
+        config, or an empty list if it is not cached."""
+        cached = self.cache_file.get(str(path))
+        return [] if cached is None else cached["dependencies"]
+
+    def get_entries(self, paths: Iterable[Path]):
+        """Returns the raw cache entries of the given paths, for merging into
+        another process's cache."""
+        entries = {}
+        for path in paths:
+            cached = self.cache_file.get(str(path))
+            if cached is not None:
+                entries[str(path)] = cached
+        return entries
+
+    def merge(self, entries: dict[str, object]):
+        """Merges raw cache entries from get_entries, marking them as seen."""
+        for key, cached in entries.items():
+            self._seen_keys.add(key)
+            if self.cache_file.get(key) != cached:
+                self.cache_file.set(key, cached)
+
+    def save(self):
+        if self.cache_file.is_modified:
+            # Evict entries for repos which no longer exist. This only happens
+            # when the cache is being rewritten anyway, so warm runs stay
+            # limited to a single stat per repo.
+            for key in list(self.cache_file.entries):
+                if key not in self._seen_keys and not os.path.exists(key):
+                    self.cache_file.remove(key)
+        self.cache_file.save()
+
 
 @dataclass
 class GitDataReader:
     factory: GitDataEntryFactory
+    cache: GitConfigCache | None = None
+    config_file_reader: GitConfigFileReader = field(default_factory=GitConfigFileReader)
+    # The config files layered beneath each config, as from
+    # _get_base_config_paths, which is used if None
+    base_config_paths: list[str] | None = None
+    # The base layers' values, and what applying them gives, which is shared
+    # by every config with the same base layers
+    _base_values: tuple[list[GitConfigValue], _GitConfigValues] | None = None
 
     def get_git_config_from_file(self, path: Path):
+        with TIMINGS.phase("git config"):
+            return self._get_git_config_from_file(path)
+
+    def _get_git_config_from_file(self, path: Path):
+        if self.cache is None:
+            return self._parse_git_config_file(path)[0]
+        stat_key = _get_stat_key(path)
+        if stat_key is not None:
+            entry = self.cache.get(path, stat_key, self.config_file_reader.get_stat_key)
+            if entry is not None:
+                TIMINGS.increment("git config cache hits")
+                return entry
+            TIMINGS.increment("git config cache misses")
+        entry, dependencies = self._parse_git_config_file(path)
+        if stat_key is not None:
+            dependency_stat_keys = [
+                (dependency, self.config_file_reader.get_stat_key(dependency))
+                for dependency in dependencies
+            ]
+            self.cache.set(path, stat_key, entry, dependency_stat_keys)
+        return entry
+
+    def _parse_git_config_file(self, path: Path):
+        """Returns the entry for a config file, with the base layers beneath
+        it, and the paths of the files it depends on: the base layers, those
+        it or they include, and the list of linked worktrees."""
+        # includeIf gitdir conditions only apply to a repo's own config
+        gitdir = Path(path).parent
+        is_repo_config = Path(path).name == "config" and (
+            gitdir.name == ".git" or gitdir.joinpath("HEAD").exists()
+        )
+        base_values, base_dependencies = self.config_file_reader.resolve_layers(
+            self._get_base_layer_paths(path), str(gitdir) if is_repo_config else None
+        )
+        values, dependencies = self.config_file_reader.resolve(
+            path, str(gitdir) if is_repo_config else None
+        )
+        dependencies += base_dependencies
+        config_values = self._get_base_config_values(base_values).copy()
+        config_values.apply(values)
+        # Values are reset so that each result depends only on its own files
         self.factory.path = path
-        is_in_user_section = False
-        is_in_remote_section = False
-        remote_name = None
+        self.factory.name = config_values.name
+        self.factory.email = config_values.email
+        self.factory.signing_key = config_values.signing_key
         self.factory.remotes = []
-        with open(path, "r") as file:
-            for line in file:
-                if line.startswith("[user]") and not is_in_user_section:
-                    is_in_user_section = True
-                    is_in_remote_section = False
-                    continue
-                if (
-                    line.startswith("[remote")
-                    and line.endswith("]\n")
-                    and not is_in_remote_section
-                ):
-                    is_in_remote_section = True
-                    is_in_user_section = False
-                    remote_name = self._get_remote_name_from_line(line)
-                    continue
-
-                if is_in_user_section:
-                    splits = line.split("=", 1)
-                    key = splits[0].strip()
-                    value = splits[1].strip()
-                    match key:
-                        case "name":
-                            self.factory.name = value
-                        case "email":
-                            self.factory.email = value
-                        case "signingkey":
-                            self.factory.signing_key = value
-
-                elif is_in_remote_section:
-                    splits = line.split("=", 1)
-                    key = splits[0].strip()
-                    if key != "url":
-                        continue
-                    value = splits[1].strip()
-                    if not value.startswith("https"):
-                        self.factory.remotes.append(
-                            GitRemoteDataEntry(remote_name, value)
-                        )
-        return self.factory.create()
-
-    def _get_remote_name_from_line(self, line: str):
-        remote_name = regex.search(r'"[^"]*"', line).group(0)
-        remote_name = remote_name.removeprefix('"').removesuffix('"')
-        return remote_name
+        rewriter = InsteadOfRewriter.build(tuple(config_values.instead_of_rules))
+        for name, url in config_values.remote_urls:
+            rewritten_url = rewriter.rewrite(url)
+            self.factory.remotes.append(
+                GitRemoteDataEntry(
+                    sys.intern(name),
+                    sys.intern(url),
+                    sys.intern(rewritten_url if rewritten_url != url else ""),
+                )
+            )
+        self.factory.worktrees = []
+        if is_repo_config:
+            self.factory.worktrees = _get_worktrees(
+                gitdir, config_values.core_worktree, config_values.is_bare
+            )
+            # Adding or removing a linked worktree changes this directory
+            dependencies.append(str(gitdir.joinpath("worktrees")))
+        return self.factory.create(), dependencies
+
+    def _get_base_layer_paths(self, path: Path):
+        if self.base_config_paths is None:
+            self.base_config_paths = _get_base_config_paths()
+        path = os.path.abspath(path)
+        if path in self.base_config_paths:
+            # A base layer itself, such as the global config, only has the
+            # layers beneath it
+            return self.base_config_paths[: self.base_config_paths.index(path)]
+        return self.base_config_paths
+
+    def _get_base_config_values(self, base_values: list[GitConfigValue]):
+        # The same list is returned for every repo unless the base layers have
+        # includeIf sections
+        if self._base_values is None or self._base_values[0] is not base_values:
+            self._base_values = base_values, _GitConfigValues().apply(base_values)
+        return self._base_values[1]
+
+
+def _get_worktrees(gitdir: Path, core_worktree: str | None, is_bare: bool):
+    """Returns the working tree directories of a repo: the main one (if not
+    bare), then each linked worktree, sorted by name."""
+    worktrees = list[str]()
+    if core_worktree is not None:
+        # Set for submodules, whose gitdir is in the superproject's .git
+        worktrees.append(os.path.normpath(gitdir.joinpath(core_worktree)))
+    elif not is_bare and gitdir.name == ".git":
+        worktrees.append(str(gitdir.parent))
+    try:
+        names = sorted(os.listdir(gitdir.joinpath("worktrees")))
+    except OSError:
+        names = []
+    for name in names:
+        # Points to the .git file in the linked worktree
+        dot_git_path = _read_pointer(str(gitdir.joinpath("worktrees", name, "gitdir")))
+        if dot_git_path is not None:
+            worktrees.append(os.path.dirname(dot_git_path))
+    return worktrees
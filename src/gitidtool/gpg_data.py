@@ -1,14 +1,45 @@
+import calendar
 import subprocess
-from dataclasses import dataclass
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
 
-import regex
+from gitidtool.cache import CacheFile
+from gitidtool.gpg_keyring import _get_gnupg_home, _get_keyring_fingerprint
+from gitidtool.timings import TIMINGS
 
+GPG_KEYRING_CACHE_SCHEMA_VERSION = 4
+# Fields of a --with-colons record (see doc/DETAILS in the gnupg sources)
+_FIELD_VALIDITY = 1
+_FIELD_KEY_ID = 4
+_FIELD_EXPIRATION = 6
+_FIELD_USER_ID = 9
+_FIELD_CAPABILITIES = 11
+_FIELD_TOKEN = 14
+# Validity of revoked and expired keys and uids, which cannot be used
+_UNUSABLE_VALIDITIES = frozenset("re")
+_PARSED_RECORD_TYPES = frozenset(["sec:", "uid:", "ssb:"])
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class GpgDataEntry:
     public_key: str
+    # Of the key's primary uid
     name: str
     email: str
+    # The (name, email) of each of the key's other usable uids
+    secondary_uids: tuple[tuple[str, str], ...] = ()
+
+    def get_uid_matching_email(self, email: str):
+        """Returns the (name, email) of the key's uid with the given email, or
+        of its primary uid if none has it."""
+        if self.email != email:
+            for uid in self.secondary_uids:
+                if uid[1] == email:
+                    return uid
+        return self.name, self.email
 
 
 @dataclass
@@ -16,46 +47,264 @@ class GpgDataEntryFactory:
     public_key: str = ""
     name: str = ""
     email: str = ""
+    secondary_uids: list[tuple[str, str]] = field(default_factory=list)
 
     def create(self):
-        return GpgDataEntry(self.public_key, self.name, self.email)
+        return GpgDataEntry(
+            sys.intern(self.public_key),
+            sys.intern(self.name),
+            sys.intern(self.email),
+            tuple(
+                (sys.intern(name), sys.intern(email))
+                for name, email in self.secondary_uids
+            ),
+        )
+
+
+@dataclass(slots=True)
+class GpgSubkey:
+    key_id: str
+    # Lowercase letters: s(ign), c(ertify), e(ncrypt) and a(uthenticate)
+    capabilities: str
+    # Whether the secret part is available here, rather than only on a card
+    # or removed (a stub)
+    has_secret: bool = True
+
+
+@dataclass(slots=True)
+class GpgKey:
+    """A secret primary key, with its (name, email) uids and subkeys."""
+
+    key_id: str
+    uids: list[tuple[str, str]] = field(default_factory=list)
+    subkeys: list[GpgSubkey] = field(default_factory=list)
+    # The earliest expiry of the key and its usable uids and subkeys, in
+    # seconds since the epoch, or None if none of them expire
+    expires_at: int | None = None
+
+    def add_expiry(self, expiration: str):
+        """Takes the expiration field of one of the key's records into
+        account, which gpg writes in seconds since the epoch, or as an ISO
+        8601 time without separators."""
+        if not expiration:
+            return
+        if expiration.isdigit():
+            expires_at = int(expiration)
+        else:
+            try:
+                expires_at = calendar.timegm(
+                    time.strptime(expiration, "%Y%m%dT%H%M%S")
+                )
+            except ValueError:
+                return
+        if self.expires_at is None or expires_at < self.expires_at:
+            self.expires_at = expires_at
+
+    def get_signing_key_ids(self):
+        """Returns the key ids which may be set as a repo's signing key: the
+        primary key, whose signing subkeys gpg picks from if it cannot sign
+        itself, and each subkey which can sign."""
+        return [self.key_id] + [
+            subkey.key_id
+            for subkey in self.subkeys
+            if "s" in subkey.capabilities and subkey.has_secret
+        ]
+
+
+def _unescape_colons_value(value: str):
+    """Decodes the \\xHH escapes gpg writes for colons, backslashes and
+    control characters in --with-colons values."""
+    if "\\" not in value:
+        return value
+    parts = value.split("\\x")
+    decoded = bytearray(parts[0].encode())
+    for part in parts[1:]:
+        try:
+            decoded.append(int(part[:2], 16))
+            decoded += part[2:].encode()
+        except ValueError:
+            decoded += b"\\x" + part.encode()
+    return decoded.decode(errors="replace")
+
+
+def _parse_user_id(user_id: str):
+    """Splits a "Name (Comment) <email>" user id into its name (with any
+    comment) and email address, either of which may be empty."""
+    start = user_id.rfind("<")
+    end = user_id.rfind(">")
+    if start == -1 or end < start:
+        return user_id.strip(), ""
+    return user_id[:start].strip(), user_id[start + 1 : end]
+
+
+def _iter_gpg_keys(lines: Iterable[str]) -> Iterator[GpgKey]:
+    """Yields each usable secret key in gpg --list-secret-keys --with-colons
+    output, as soon as its last record has been read. Revoked and expired
+    keys, subkeys and uids are skipped."""
+    key = None
+    for line in lines:
+        # Most records (fpr, grp and others) are skipped without splitting
+        record_type = line[:4]
+        if record_type not in _PARSED_RECORD_TYPES:
+            continue
+        fields = line.split(":", _FIELD_TOKEN + 1)
+        if len(fields) <= _FIELD_TOKEN:
+            continue
+        if record_type == "sec:":
+            if key is not None:
+                yield key
+            key = None
+            if fields[_FIELD_VALIDITY] not in _UNUSABLE_VALIDITIES:
+                key = GpgKey(fields[_FIELD_KEY_ID])
+                key.add_expiry(fields[_FIELD_EXPIRATION])
+        elif key is None:
+            continue
+        elif record_type == "uid:":
+            if fields[_FIELD_VALIDITY] not in _UNUSABLE_VALIDITIES:
+                key.uids.append(
+                    _parse_user_id(_unescape_colons_value(fields[_FIELD_USER_ID]))
+                )
+                key.add_expiry(fields[_FIELD_EXPIRATION])
+        elif record_type == "ssb:":
+            if fields[_FIELD_VALIDITY] not in _UNUSABLE_VALIDITIES:
+                key.subkeys.append(
+                    GpgSubkey(
+                        fields[_FIELD_KEY_ID],
+                        fields[_FIELD_CAPABILITIES],
+                        fields[_FIELD_TOKEN] != "#",
+                    )
+                )
+                key.add_expiry(fields[_FIELD_EXPIRATION])
+    if key is not None:
+        yield key
+
+
+@dataclass
+class GpgKeyringCache:
+    """
+    Persistent cache of the parsed secret keyring, keyed by GNUPGHOME and
+    validated against the keyring fingerprint. gpg's output also changes
+    without the keyring changing once a key, uid or subkey expires, so the
+    cache is invalidated at the earliest expiry too.
+    """
+
+    cache_file: CacheFile = field(
+        default_factory=lambda: CacheFile(
+            "gpg_keyring.json", GPG_KEYRING_CACHE_SCHEMA_VERSION
+        )
+    )
+
+    def load(self):
+        self.cache_file.load()
+        return self
+
+    def get(self, gnupg_home: Path, fingerprint: list):
+        cached = self.cache_file.get(str(gnupg_home))
+        if cached is None or cached["fingerprint"] != fingerprint:
+            return None
+        if cached["expires_at"] is not None and time.time() >= cached["expires_at"]:
+            return None
+        return [
+            GpgDataEntry(
+                public_key,
+                name,
+                email,
+                tuple((uid_name, uid_email) for uid_name, uid_email in secondary_uids),
+            )
+            for public_key, name, email, secondary_uids in cached["entries"]
+        ]
+
+    def set(
+        self,
+        gnupg_home: Path,
+        fingerprint: list,
+        entries: list[GpgDataEntry],
+        expires_at: int | None = None,
+    ):
+        self.cache_file.set(
+            str(gnupg_home),
+            {
+                "fingerprint": fingerprint,
+                "expires_at": expires_at,
+                "entries": [
+                    [
+                        entry.public_key,
+                        entry.name,
+                        entry.email,
+                        [list(uid) for uid in entry.secondary_uids],
+                    ]
+                    for entry in entries
+                ],
+            },
+        )
+
+    def save(self):
+        self.cache_file.save()
 
 
 @dataclass
 class GpgDataReader:
     factory: GpgDataEntryFactory
+    cache: GpgKeyringCache | None = None
+    # The earliest expiry of the keys read (or their uids and subkeys), in
+    # seconds since the epoch, or None if none of them expire
+    expires_at: int | None = None
+
+    def get_gpg_config(self, refresh: bool = False):
+        """Returns an entry for each key id which can sign, with the uids of
+        its secret key. If a cache is
+        set, gpg is only run when the keyring has changed since the cached
+        result was stored, a key, uid or subkey has expired since, or when
+        refresh is True.
+        """
+        with TIMINGS.phase("gpg"):
+            return self._get_gpg_config(refresh)
+
+    def _get_gpg_config(self, refresh: bool):
+        if self.cache is None:
+            return self._read_gpg_config()
+        gnupg_home = _get_gnupg_home()
+        fingerprint = _get_keyring_fingerprint(gnupg_home)
+        if not refresh:
+            config_entries = self.cache.get(gnupg_home, fingerprint)
+            if config_entries is not None:
+                TIMINGS.increment("gpg cache hits")
+                return config_entries
+        TIMINGS.increment("gpg cache misses")
+        config_entries = self._read_gpg_config()
+        self.cache.set(gnupg_home, fingerprint, config_entries, self.expires_at)
+        return config_entries
 
-    def get_gpg_config(self):
+    def _read_gpg_config(self):
         config_entries = list[GpgDataEntry]()
-        output = self._get_cmd_output()
-        for line in output.splitlines():
-            if line.startswith("sec"):
-                self.factory.public_key = self._get_signing_key_from_line(line)
+        self.expires_at = None
+        for key in _iter_gpg_keys(self._iter_cmd_output_lines()):
+            if not key.uids:
                 continue
-            if line.startswith("uid"):
-                self.factory.name = self._get_name_from_line(line)
-                self.factory.email = self._get_email_from_line(line)
+            if key.expires_at is not None and (
+                self.expires_at is None or key.expires_at < self.expires_at
+            ):
+                self.expires_at = key.expires_at
+            # gpg lists the primary uid first
+            (self.factory.name, self.factory.email), *self.factory.secondary_uids = (
+                key.uids
+            )
+            for key_id in key.get_signing_key_ids():
+                self.factory.public_key = key_id
                 config_entries.append(self.factory.create())
-                continue
-
         return config_entries
 
-    def _get_cmd_output(self):
-        output = subprocess.run(
-            ["gpg", "--list-secret-keys", "--keyid-format=long"],
-            capture_output=True,
-            check=True,
-        )
-        return output.stdout.decode()
-
-    def _get_signing_key_from_line(self, line: str):
-        value = regex.search(r"(?<=\/)\w+", line).group(0)
-        return value
-
-    def _get_name_from_line(self, line: str):
-        value = regex.search(r"(?<=\] ).+(?= \<)", line).group(0)
-        return value
-
-    def _get_email_from_line(self, line: str):
-        value = regex.search(r"(?<=\<).+(?=\>)", line).group(0)
-        return value
+    def _iter_cmd_output_lines(self):
+        """Yields each line of gpg's machine-readable listing of secret keys
+        as gpg writes it. Raises a CalledProcessError if gpg fails."""
+        TIMINGS.increment("subprocesses spawned")
+        with subprocess.Popen(
+            ["gpg", "--list-secret-keys", "--with-colons"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            encoding="utf-8",
+            errors="replace",
+        ) as process:
+            yield from process.stdout
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
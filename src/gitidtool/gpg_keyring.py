@@ -0,0 +1,31 @@
+"""
+Locating the gpg keyring and fingerprinting its files, without running gpg.
+Kept apart from gpg_data so that guard can check for changes cheaply.
+"""
+
+import os
+from pathlib import Path
+
+from gitidtool.cache import _get_stat_key
+
+# Files and directories under GNUPGHOME whose changes may affect the output of
+# gpg --list-secret-keys
+GPG_KEYRING_PATHS = (
+    "pubring.kbx",
+    "pubring.gpg",
+    "secring.gpg",
+    "trustdb.gpg",
+    "private-keys-v1.d",
+)
+
+
+def _get_gnupg_home():
+    return Path(os.environ.get("GNUPGHOME") or Path.home().joinpath(".gnupg"))
+
+
+def _get_keyring_fingerprint(gnupg_home: Path):
+    """Returns the stat keys of the keyring files under the given GNUPGHOME,
+    which change whenever keys are added, removed or modified."""
+    return [
+        [name, _get_stat_key(gnupg_home.joinpath(name))] for name in GPG_KEYRING_PATHS
+    ]
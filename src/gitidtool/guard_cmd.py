@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+
+import click
+
+from gitidtool.cmd_options import (
+    recursive_options,
+    refresh_gpg_option,
+    timings_option,
+)
+from gitidtool.daemon_client import _echo_from_daemon
+from gitidtool.guard_verdict import GuardVerdict, GuardVerdictCache
+from gitidtool.repo_discovery import (
+    RepoDiscovery,
+    _get_config_path,
+)
+from gitidtool.timings import TIMINGS
+
+
+@click.command()
+@recursive_options
+@refresh_gpg_option
+@timings_option
+def guard(recursive, max_depth, prune, refresh_gpg):
+    repo_discovery = RepoDiscovery(prune, max_depth)
+    # Verdicts are only stored for the repo in the working directory, which is
+    # how guard runs before a commit or push
+    config_path = None
+    if not recursive:
+        config_path = _get_config_path(Path(os.getcwd(), ".git"))
+    verdict_cache = GuardVerdictCache().load()
+    if config_path is not None and not refresh_gpg:
+        verdict = verdict_cache.get(config_path)
+        TIMINGS.increment(
+            "guard verdict cache misses"
+            if verdict is None
+            else "guard verdict cache hits"
+        )
+        if verdict is not None:
+            for warning in verdict.warnings:
+                click.echo(f"Warning: {warning}", err=True)
+            return
+    if not TIMINGS.is_enabled and _echo_from_daemon(
+        {
+            "command": "guard",
+            "cwd": os.getcwd(),
+            "recursive": recursive,
+            "max_depth": max_depth,
+            "prune": sorted(repo_discovery.prune),
+            "refresh_gpg": refresh_gpg,
+        }
+    ):
+        return
+    # Only needed when no daemon is running
+    from gitidtool.check_cmd_result import CheckCmdResultData, _get_status_name
+    from gitidtool.file_system import _read_config
+    from gitidtool.git_data import GitConfigCache
+    from gitidtool.identity_index import IdentityIndex
+
+    ssh_read_paths = list[Path]()
+    ssh_warnings = list[str]()
+    config = _read_config(
+        False,
+        recursive,
+        ".",
+        repo_discovery=repo_discovery,
+        refresh_gpg=refresh_gpg,
+        ssh_read_paths=ssh_read_paths,
+        ssh_warnings=ssh_warnings,
+    )
+    if config is None:
+        return
+    git_config, gpg_config, ssh_config = config
+    identity_index = IdentityIndex.build(gpg_config, ssh_config)
+    results = [CheckCmdResultData(entry, identity_index) for entry in git_config]
+    if config_path is not None:
+        # The git config cache was saved once the configs were read, with the
+        # files each one includes
+        git_dependencies = [
+            Path(path)
+            for path, _ in GitConfigCache().load().get_dependencies(config_path)
+        ]
+        verdict = GuardVerdict(_get_status_name(results[0].worst_status), ssh_warnings)
+        verdict_cache.set(config_path, git_dependencies + ssh_read_paths, verdict)
+        verdict_cache.save()
@@ -0,0 +1,91 @@
+"""
+Persisted verdicts of guard, which runs before every commit or push, usually
+in the same repo with the same configuration. A repeated guard returns the
+stored verdict after a stat of each file it depended on, without parsing any
+config or running gpg. This module is imported on guard's startup path, so it
+must stay cheap to import.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from gitidtool.cache import CacheFile, _get_stat_key
+from gitidtool.git_config_file import _get_base_config_paths
+from gitidtool.gpg_keyring import _get_gnupg_home, _get_keyring_fingerprint
+
+GUARD_VERDICT_CACHE_SCHEMA_VERSION = 3
+
+
+def _get_base_config_stat_keys():
+    # Which files are base layers depends on the environment, so their paths
+    # are compared as well as their stat keys
+    return [[path, _get_stat_key(path)] for path in _get_base_config_paths()]
+
+
+@dataclass
+class GuardVerdict:
+    # The worst status name of the repo's checks
+    status: str
+    # Warnings reported while reading the configuration, repeated on each run
+    warnings: list[str] = field(default_factory=list)
+
+
+@dataclass
+class GuardVerdictCache:
+    """
+    The verdict of guard for each repo, keyed by config path, with the stat
+    keys of every file it was derived from: the repo's config and the files it
+    includes, the base config files (system, XDG and global, as resolved from
+    the environment), the ssh config with its includes and public keys, and
+    the gpg keyring files under GNUPGHOME.
+    """
+
+    cache_file: CacheFile = field(
+        default_factory=lambda: CacheFile(
+            "guard_verdicts.json", GUARD_VERDICT_CACHE_SCHEMA_VERSION
+        )
+    )
+
+    def load(self):
+        self.cache_file.load()
+        return self
+
+    def get(self, config_path: Path):
+        """Returns the stored verdict of the repo, or None if it has none or
+        any of its inputs have changed since."""
+        stored = self.cache_file.get(str(config_path))
+        if stored is None:
+            return None
+        gnupg_home = _get_gnupg_home()
+        if stored["gnupg_home"] != str(gnupg_home):
+            return None
+        for path, stat_key in stored["inputs"]:
+            if _get_stat_key(path) != stat_key:
+                return None
+        if stored["keyring"] != _get_keyring_fingerprint(gnupg_home):
+            return None
+        if stored["base_config"] != _get_base_config_stat_keys():
+            return None
+        return GuardVerdict(stored["status"], stored["warnings"])
+
+    def set(self, config_path: Path, input_paths: list[Path], verdict: GuardVerdict):
+        """Stores the verdict of the repo, with the current stat keys of the
+        files it was derived from besides the keyring."""
+        gnupg_home = _get_gnupg_home()
+        self.cache_file.set(
+            str(config_path),
+            {
+                "inputs": [
+                    [str(path), _get_stat_key(path)]
+                    for path in [config_path, *input_paths]
+                ],
+                "gnupg_home": str(gnupg_home),
+                "keyring": _get_keyring_fingerprint(gnupg_home),
+                "base_config": _get_base_config_stat_keys(),
+                "status": verdict.status,
+                "warnings": verdict.warnings,
+            },
+        )
+
+    def save(self):
+        self.cache_file.save()
@@ -0,0 +1,46 @@
+"""
+Hash indexes over the gpg and ssh configuration, built once per run so that
+each repo and remote resolves its matching entries in constant time.
+"""
+
+from dataclasses import dataclass, field
+
+from gitidtool.gpg_data import GpgDataEntry
+from gitidtool.ssh_data import SshDataEntry, SshHostMatcher
+
+
+@dataclass
+class IdentityIndex:
+    """
+    Lookup tables of gpg entries keyed by signing key, and a compiled matcher
+    of ssh entries by Host pattern. Matching follows the same rules as the
+    per-entry lookups on GitDataEntry and GitRemoteDataEntry: the first ssh
+    entry matching a hostname wins, and a signing key shared by several gpg
+    entries is an error.
+    """
+
+    gpg_entries_by_signing_key: dict[str, GpgDataEntry] = field(default_factory=dict)
+    ssh_matcher: SshHostMatcher = field(default_factory=SshHostMatcher)
+    duplicate_signing_keys: set[str] = field(default_factory=set)
+
+    @classmethod
+    def build(cls, gpg_config: list[GpgDataEntry], ssh_config: list[SshDataEntry]):
+        index = cls()
+        for gpg_entry in gpg_config:
+            if gpg_entry.public_key in index.gpg_entries_by_signing_key:
+                index.duplicate_signing_keys.add(gpg_entry.public_key)
+                continue
+            index.gpg_entries_by_signing_key[gpg_entry.public_key] = gpg_entry
+        index.ssh_matcher = SshHostMatcher.build(ssh_config)
+        return index
+
+    def get_gpg_entry_matching_signing_key(self, signing_key: str):
+        if signing_key in self.duplicate_signing_keys:
+            # invalid
+            raise RuntimeError(
+                f"Multiple gpg entries match the given signing key {signing_key}, which is not allowed."
+            )
+        return self.gpg_entries_by_signing_key.get(signing_key)
+
+    def get_ssh_entry_matching_hostname(self, hostname: str):
+        return self.ssh_matcher.match(hostname)
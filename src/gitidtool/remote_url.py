@@ -0,0 +1,140 @@
+"""
+Classification of git remote URLs into their scheme, user, host and port, in
+every form git accepts, and rewriting of URLs by url.<base>.insteadOf rules.
+
+Parsing is memoized on the part of a URL before its path, so that thousands of
+remotes on the same few hosts are each split with a couple of string
+operations, and only each distinct prefix is parsed.
+"""
+
+import functools
+import os
+from dataclasses import dataclass
+
+# Schemes whose URLs are fetched over ssh, so that an ssh identity applies
+SSH_SCHEMES = frozenset(["ssh", "git+ssh", "ssh+git"])
+
+
+@dataclass(frozen=True, slots=True)
+class RemoteUrl:
+    # "ssh" for both ssh:// and scp-like URLs, the URL scheme otherwise (such
+    # as "https" or "git"), or "file" for local paths
+    scheme: str
+    user: str | None = None
+    # None for local paths and remote helper URLs
+    host: str | None = None
+    port: int | None = None
+
+    @property
+    def is_ssh(self):
+        return self.scheme == "ssh"
+
+
+def _split_remote_url(url: str):
+    """Returns the part of the URL which identifies where it points, with
+    everything from the path onwards removed, and its form: "url" for
+    <scheme>://, "scp" for [user@]host:path, "helper" for <transport>::address
+    or "file" for local paths."""
+    helper_end = url.find("::")
+    if helper_end > 0 and url[:helper_end].replace("-", "").isalnum():
+        return url[:helper_end], "helper"
+    scheme_end = url.find("://")
+    if scheme_end != -1 and "/" not in url[:scheme_end]:
+        path_start = url.find("/", scheme_end + 3)
+        return url if path_start == -1 else url[:path_start], "url"
+    # As in git, a colon before any slash makes an scp-like URL, except for a
+    # drive letter on Windows. Brackets may hide colons, as in [::1]:path.
+    colon = url.find(":")
+    open_bracket = url.find("[")
+    if open_bracket != -1 and open_bracket < colon:
+        colon = url.find(":", url.find("]", open_bracket) + 1)
+    slash = url.find("/")
+    if colon > 0 and (slash == -1 or colon < slash) and not _is_drive_letter(url):
+        return url[:colon], "scp"
+    return "", "file"
+
+
+def _is_drive_letter(url: str, is_windows: bool = os.name == "nt"):
+    # As git's has_dos_drive_prefix, which is only defined on Windows
+    return is_windows and len(url) >= 2 and url[0].isalpha() and url[1] == ":"
+
+
+def _split_port(authority: str):
+    """Splits host[:port] (with the host possibly in brackets) into the host
+    and the port, which is None if absent or not a number."""
+    if authority.startswith("["):
+        bracket_end = authority.find("]")
+        if bracket_end != -1:
+            port = authority[bracket_end + 2 :]
+            return authority[1:bracket_end], int(port) if port.isdigit() else None
+    host, separator, port = authority.rpartition(":")
+    if not separator or not port.isdigit():
+        return authority, None
+    return host, int(port)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_remote_url_prefix(prefix: str, form: str):
+    if form == "file":
+        return RemoteUrl("file")
+    if form == "helper":
+        return RemoteUrl(prefix)
+    if form == "scp":
+        user, _, host = prefix.rpartition("@")
+        if host.startswith("[") and host.endswith("]"):
+            host = host[1:-1]
+        return RemoteUrl("ssh", user or None, host)
+    scheme, _, authority = prefix.partition("://")
+    scheme = scheme.lower()
+    if scheme in SSH_SCHEMES:
+        scheme = "ssh"
+    if scheme == "file":
+        return RemoteUrl("file")
+    user_info, _, authority = authority.rpartition("@")
+    # Any password in http(s) URLs is not kept
+    user = user_info.partition(":")[0] or None
+    host, port = _split_port(authority)
+    return RemoteUrl(scheme, user, host, port)
+
+
+def _classify_remote_url(url: str):
+    """Returns the scheme, user, host and port of a remote URL."""
+    prefix, form = _split_remote_url(url)
+    return _parse_remote_url_prefix(prefix, form)
+
+
+@dataclass(frozen=True, slots=True)
+class InsteadOfRewriter:
+    """
+    URL rewrites from url.<base>.insteadOf values: a URL starting with any of
+    the given prefixes has its longest matching prefix replaced with that
+    prefix's base, as git does.
+    """
+
+    # prefix => base
+    bases_by_prefix: dict[str, str]
+    # The distinct prefix lengths, longest first
+    prefix_lengths: tuple[int, ...]
+
+    @classmethod
+    def build(cls, rules: tuple[tuple[str, str], ...]):
+        """Builds the rewriter from (base, prefix) rules in config order. As
+        in git, the first rule for a prefix wins."""
+        return _build_instead_of_rewriter(rules)
+
+    def rewrite(self, url: str):
+        for length in self.prefix_lengths:
+            base = self.bases_by_prefix.get(url[:length])
+            if base is not None:
+                return base + url[length:]
+        return url
+
+
+@functools.lru_cache(maxsize=256)
+def _build_instead_of_rewriter(rules: tuple[tuple[str, str], ...]):
+    # Memoized, since most repos share the same rules from shared config
+    bases_by_prefix = dict[str, str]()
+    for base, prefix in rules:
+        bases_by_prefix.setdefault(prefix, base)
+    prefix_lengths = tuple(sorted({len(prefix) for prefix in bases_by_prefix})[::-1])
+    return InsteadOfRewriter(bases_by_prefix, prefix_lengths)
@@ -0,0 +1,192 @@
+"""
+Repo discovery engine which locates git repo config files beneath a directory
+tree, without descending into repos or pruned directories (unless they are
+repos themselves).
+
+A repo's .git may be a directory, or a file with a "gitdir:" pointer (as in
+worktrees and submodules). A gitdir with a "commondir" file (a linked
+worktree's) shares the config of the repo it points to, so configs are
+resolved to their real paths and each is yielded once.
+"""
+
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from gitidtool.timings import TIMINGS
+
+# Directories which are never repos themselves, nor hold repos of the user's
+DEFAULT_PRUNED_DIRECTORIES = frozenset(
+    {
+        ".mypy_cache",
+        ".pytest_cache",
+        "__pycache__",
+        "node_modules",
+    }
+)
+
+
+def _read_pointer(path: str, prefix: str = ""):
+    """Returns the path in a gitdir pointer file (.git, commondir or a
+    worktree's gitdir), resolved relative to the file's directory, or None if
+    it cannot be read."""
+    try:
+        TIMINGS.increment("files opened")
+        with open(path, "r") as file:
+            content = file.read().strip()
+    except OSError:
+        return None
+    if not content.startswith(prefix):
+        return None
+    target = content.removeprefix(prefix).strip()
+    return os.path.normpath(os.path.join(os.path.dirname(path), target))
+
+
+def _get_gitdir(dot_git_path: str):
+    """Returns the gitdir of a .git directory or file, or None if a .git file
+    does not point anywhere."""
+    if os.path.isdir(dot_git_path):
+        return dot_git_path
+    return _read_pointer(dot_git_path, "gitdir:")
+
+
+def _get_config_path(dot_git_path: str | Path):
+    """Returns the real path of the config used by the repo whose .git
+    directory or file is at the given path, following gitdir and commondir
+    pointers, or None if it cannot be resolved."""
+    gitdir = _get_gitdir(str(dot_git_path))
+    if gitdir is None:
+        return None
+    commondir = _read_pointer(os.path.join(gitdir, "commondir"))
+    config_path = os.path.join(commondir if commondir else gitdir, "config")
+    if not os.path.isfile(config_path):
+        return None
+    return Path(os.path.realpath(config_path))
+
+
+def _iter_submodule_config_paths(gitdir: Path) -> Iterator[Path]:
+    """Yields the config path of each submodule whose gitdir is under the
+    given gitdir's modules directory (including nested submodules), in sorted
+    order."""
+    modules_path = gitdir.joinpath("modules")
+    if not modules_path.is_dir():
+        return
+    for directory, subdirectories, files in os.walk(modules_path):
+        subdirectories.sort()
+        if "config" in files and "HEAD" in files:
+            # A submodule's gitdir, which may contain nested submodules
+            # under its own modules directory
+            subdirectories[:] = [name for name in subdirectories if name == "modules"]
+            yield Path(directory, "config")
+
+
+@dataclass(frozen=True)
+class _ScannedDirectory:
+    path: str
+    # The gitdir and resolved config path if the directory is a repo, else None
+    gitdir: str | None
+    config_path: Path | None
+    subdirectories: list[str]
+
+
+def _scan_directory(path: str) -> _ScannedDirectory:
+    # Directories are scanned on several threads at once, so the phase's time
+    # may exceed the wall time spent discovering repos
+    with TIMINGS.phase("discovery"):
+        return _scan_directory_untimed(path)
+
+
+def _scan_directory_untimed(path: str):
+    dot_git_path = None
+    subdirectories = []
+    TIMINGS.increment("directories visited")
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name == ".git":
+                    dot_git_path = entry.path
+                    continue
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                subdirectories.append(entry.name)
+    except OSError:
+        # Unreadable directories are skipped, as os.walk does by default
+        pass
+    subdirectories.sort()
+    gitdir = None if dot_git_path is None else _get_gitdir(dot_git_path)
+    config_path = None if gitdir is None else _get_config_path(dot_git_path)
+    return _ScannedDirectory(path, gitdir, config_path, subdirectories)
+
+
+@dataclass
+class RepoDiscovery:
+    """
+    Finds the .git/config files of repos beneath a root directory.
+
+    Directory listings are fanned out over a thread pool, while paths are
+    yielded in a deterministic depth-first order (sorted by name) as soon as
+    they are found. Once a directory below the root is found to be a repo, its
+    contents are not searched any further; instead, the configs of its
+    submodules are found through its gitdir. Each real config path is only
+    yielded once, however many worktrees share it.
+    """
+
+    prune: frozenset[str] = DEFAULT_PRUNED_DIRECTORIES
+    max_depth: int | None = None
+    max_workers: int = 8
+
+    def iter_config_paths(self, root: str | Path) -> Iterator[Path]:
+        """Yields the path of each repo's config file beneath the root
+        directory (including the root itself).
+
+        :param str | Path root: the directory to start searching from
+        :yield Path: the real path of a repo's config file
+        """
+        # Imported here rather than at module level, since commands import this
+        # module for its defaults before knowing whether they will walk a tree
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            root_path = os.path.abspath(root)
+            seen_config_paths = set[Path]()
+            for config_path in self._walk(
+                executor, executor.submit(_scan_directory, root_path), 0
+            ):
+                if config_path not in seen_config_paths:
+                    seen_config_paths.add(config_path)
+                    yield config_path
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _walk(self, executor, pending_scan, depth: int) -> Iterator[Path]:
+        scanned = pending_scan.result()
+        if scanned.config_path is not None:
+            yield scanned.config_path
+            # Submodules belong to the worktree, so are under its own gitdir
+            # rather than the common one
+            yield from _iter_submodule_config_paths(
+                Path(os.path.realpath(scanned.gitdir))
+            )
+            if depth > 0:
+                # Nested repos within a repo are not searched for
+                return
+        if self.max_depth is not None and depth >= self.max_depth:
+            return
+        # Submit all children up front so that their listings run in parallel
+        # while earlier siblings are being walked
+        child_scans = [
+            executor.submit(_scan_directory, path)
+            for path in self._iter_unpruned_paths(scanned)
+        ]
+        for child_scan in child_scans:
+            yield from self._walk(executor, child_scan, depth + 1)
+
+    def _iter_unpruned_paths(self, scanned: _ScannedDirectory):
+        for name in scanned.subdirectories:
+            path = os.path.join(scanned.path, name)
+            # A directory which is itself a repo is never pruned, whatever its
+            # name
+            if name not in self.prune or os.path.lexists(os.path.join(path, ".git")):
+                yield path
@@ -0,0 +1,136 @@
+"""
+Evaluation of repos across a pool of worker processes, for checks over very
+many repos. Config paths are split into ordered shards, and each worker parses
+and renders the repos in its shards against a snapshot of the gpg and ssh
+configuration which it receives once, when it starts.
+"""
+
+import functools
+import itertools
+from collections import deque
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from pathlib import Path
+
+from gitidtool.check_cmd_result import (
+    CheckCmdResultData,
+    CheckCmdResultJsonReporter,
+    CheckCmdResultReporter,
+)
+from gitidtool.check_summary import CheckSummaryReporter
+from gitidtool.click_echo_wrapper import ClickEchoWrapper
+from gitidtool.git_data import GitConfigCache, GitDataEntryFactory, GitDataReader
+from gitidtool.identity_index import IdentityIndex
+from gitidtool.timings import TIMINGS
+
+DEFAULT_SHARD_SIZE = 64
+
+
+@dataclass
+class _WorkerState:
+    identity_index: IdentityIndex
+    format_: str
+    is_styled: bool
+    reader: GitDataReader
+
+
+# Set in each worker process by _init_worker
+_worker_state: _WorkerState | None = None
+
+
+def _init_worker(
+    identity_index: IdentityIndex, format_: str, is_styled: bool, is_timed: bool
+):
+    global _worker_state
+    TIMINGS.is_enabled = is_timed
+    # Workers only read the cache; their new entries are returned to the
+    # parent, which writes it once
+    cache = GitConfigCache().load()
+    _worker_state = _WorkerState(
+        identity_index,
+        format_,
+        is_styled,
+        GitDataReader(GitDataEntryFactory(), cache),
+    )
+
+
+def _evaluate_shard(paths: list[Path]):
+    """Returns the rendered result of each config in the shard, in order, the
+    git config cache entries of the shard, and the timings recorded while
+    evaluating it."""
+    state = _worker_state
+    if state.format_ == "summary":
+        render = CheckSummaryReporter().render_result
+    elif state.format_ == "text":
+        reporter = CheckCmdResultReporter()
+        click_echo_wrapper = ClickEchoWrapper(state.is_styled)
+        render = functools.partial(
+            reporter.render_result, click_echo_wrapper=click_echo_wrapper
+        )
+    else:
+        render = CheckCmdResultJsonReporter().render_result
+    rendered_results = [
+        render(
+            CheckCmdResultData(
+                state.reader.get_git_config_from_file(path), state.identity_index
+            )
+        )
+        for path in paths
+    ]
+    return rendered_results, state.reader.cache.get_entries(paths), TIMINGS.pop()
+
+
+def _iter_sharded_results(
+    paths: Iterable[Path],
+    identity_index: IdentityIndex,
+    format_: str,
+    jobs: int,
+    is_styled: bool = True,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+):
+    """Yields the rendered result of each config, in the order of the paths,
+    as rendered by render_result on the reporter for the format.
+
+    :param Iterable[Path] paths: the config paths, consumed as shards are
+    submitted
+    :param IdentityIndex identity_index: the gpg and ssh snapshot to check
+    against
+    :param str format_: the output format, "text", "json" or "ndjson", or
+    "summary" for the SummaryRecord of each result
+    :param int jobs: the number of worker processes
+    :param bool is_styled: whether to style text results, defaults to True
+    :param int shard_size: the number of paths per shard, defaults to
+    DEFAULT_SHARD_SIZE
+    """
+    cache = GitConfigCache().load()
+    paths = iter(paths)
+    # Workers are spawned rather than forked, since discovery threads may be
+    # running in this process
+    with ProcessPoolExecutor(
+        jobs,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(identity_index, format_, is_styled, TIMINGS.is_enabled),
+    ) as executor:
+        try:
+            pending = deque()
+            while shard := list(itertools.islice(paths, shard_size)):
+                pending.append(executor.submit(_evaluate_shard, shard))
+                # Limits how far discovery runs ahead of reporting, while
+                # keeping every worker busy
+                while len(pending) > jobs * 2:
+                    yield from _collect(pending.popleft(), cache)
+            while pending:
+                yield from _collect(pending.popleft(), cache)
+        finally:
+            executor.shutdown(cancel_futures=True)
+            cache.save()
+
+
+def _collect(future, cache: GitConfigCache):
+    rendered_results, cache_entries, (phases, counters) = future.result()
+    cache.merge(cache_entries)
+    TIMINGS.merge(phases, counters)
+    yield from rendered_results
@@ -1,11 +1,28 @@
-from dataclasses import dataclass
+import glob
+import os
+import re
+import sys
+from dataclasses import dataclass, field
 from pathlib import Path
 
-import regex
+from gitidtool.cache import CacheFile, StatKey, _get_stat_key
+from gitidtool.timings import TIMINGS
 
+# ssh's own limit on nested includes
+MAX_INCLUDE_DEPTH = 16
 
-@dataclass(frozen=True)
+IDENTITY_FILE_CACHE_SCHEMA_VERSION = 1
+
+_ARGUMENT_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+# The keyword, then whitespace, or an "=" with optional whitespace around it,
+# as in ssh's own parser
+_KEYWORD_PATTERN = re.compile(r"([^\s=]+)(?:\s*=\s*|\s*)(.*)")
+_EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+@dataclass(frozen=True, slots=True)
 class SshDataEntry:
+    # The space-separated Host patterns of the block the IdentityFile is in
     hostname: str
     email: str
     identity_file_path: str
@@ -13,44 +30,302 @@ class SshDataEntry:
 
 class SshDataEntryFactory:
     email: str
-    hostname: str
+    hostname: str | None
     identity_file_path: str
 
     def create(self):
-        return SshDataEntry(self.hostname, self.email, self.identity_file_path)
+        return SshDataEntry(
+            sys.intern(self.hostname),
+            sys.intern(self.email),
+            sys.intern(self.identity_file_path),
+        )
+
+
+def _get_default_ssh_config_path():
+    # Resolved on each call, since the daemon reads it for each client's HOME
+    return Path.home().joinpath(".ssh", "config")
+
+
+def _split_config_line(line: str):
+    """Splits an ssh config line into its lowercased keyword and arguments,
+    accepting both "Keyword value" and "Keyword=value". Returns None for blank
+    lines and comments."""
+    line = line.strip()
+    if line == "" or line.startswith("#"):
+        return None
+    match = _KEYWORD_PATTERN.fullmatch(line)
+    if match is None:
+        return None
+    keyword, rest = match.groups()
+    arguments = [
+        quoted if quoted else unquoted
+        for quoted, unquoted in _ARGUMENT_PATTERN.findall(rest)
+    ]
+    return keyword.lower(), arguments
+
+
+def _get_match_host_patterns(arguments: list[str]):
+    """Returns the Host patterns equivalent to a Match line, or None if the
+    line uses criteria other than host and all, which cannot be evaluated
+    without connecting."""
+    if [argument.lower() for argument in arguments] == ["all"]:
+        return "*"
+    if len(arguments) != 2 or arguments[0].lower() != "host":
+        return None
+    return " ".join(arguments[1].split(","))
+
+
+def _translate_host_pattern(pattern: str):
+    return "".join(
+        ".*" if char == "*" else "." if char == "?" else re.escape(char)
+        for char in pattern
+    )
+
+
+def _compile_host_patterns(patterns: list[str]):
+    if not patterns:
+        return None
+    return re.compile("|".join(_translate_host_pattern(p) for p in patterns))
+
+
+@dataclass
+class SshHostMatcher:
+    """
+    Resolves hostnames to the first ssh entry whose Host patterns match, as
+    ssh does. Literal patterns are looked up in a dict, and wildcard patterns
+    are combined into a single regex with one group per pattern in config
+    order, so the first group to match belongs to the earliest entry. Entries
+    with negated patterns are rare, and are checked one by one.
+    """
+
+    entries: list[SshDataEntry] = field(default_factory=list)
+    literal_indexes: dict[str, int] = field(default_factory=dict)
+    wildcard_pattern: re.Pattern | None = None
+    # The entry index of each group in the wildcard pattern
+    wildcard_group_indexes: list[int] = field(default_factory=list)
+    # (entry index, positive patterns, negated patterns), in config order
+    negated_entries: list[tuple[int, re.Pattern | None, re.Pattern]] = field(
+        default_factory=list
+    )
+    _matches: dict[str, SshDataEntry | None] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, entries: list[SshDataEntry]):
+        matcher = cls(list(entries))
+        wildcard_patterns = list[str]()
+        for index, entry in enumerate(matcher.entries):
+            patterns = entry.hostname.lower().split()
+            negated = [pattern[1:] for pattern in patterns if pattern.startswith("!")]
+            patterns = [pattern for pattern in patterns if not pattern.startswith("!")]
+            if negated:
+                matcher.negated_entries.append(
+                    (
+                        index,
+                        _compile_host_patterns(patterns),
+                        _compile_host_patterns(negated),
+                    )
+                )
+                continue
+            for pattern in patterns:
+                if "*" in pattern or "?" in pattern:
+                    wildcard_patterns.append(f"({_translate_host_pattern(pattern)})")
+                    matcher.wildcard_group_indexes.append(index)
+                else:
+                    # the first entry is what matters
+                    matcher.literal_indexes.setdefault(pattern, index)
+        if wildcard_patterns:
+            matcher.wildcard_pattern = re.compile("|".join(wildcard_patterns))
+        return matcher
+
+    def match(self, hostname: str):
+        hostname = hostname.lower()
+        if hostname in self._matches:
+            return self._matches[hostname]
+        indexes = list[int]()
+        if hostname in self.literal_indexes:
+            indexes.append(self.literal_indexes[hostname])
+        if self.wildcard_pattern is not None:
+            match = self.wildcard_pattern.fullmatch(hostname)
+            if match is not None:
+                indexes.append(self.wildcard_group_indexes[match.lastindex - 1])
+        for index, patterns, negated in self.negated_entries:
+            if indexes and index > min(indexes):
+                break
+            if (
+                patterns is not None
+                and patterns.fullmatch(hostname)
+                and not negated.fullmatch(hostname)
+            ):
+                indexes.append(index)
+                break
+        entry = self.entries[min(indexes)] if indexes else None
+        self._matches[hostname] = entry
+        return entry
+
+
+def _get_email_from_public_key(content: str):
+    """Returns the email address in the comment field of a public key (the
+    text after the key type and the base64 key), or None if there is none."""
+    for line in content.splitlines():
+        fields = line.split(None, 2)
+        if len(fields) == 0:
+            continue
+        if len(fields) < 3:
+            return None
+        match = _EMAIL_PATTERN.search(fields[2])
+        return match.group(0) if match else None
+    return None
+
+
+@dataclass
+class IdentityFileCache:
+    """
+    Persistent cache of the email address of each public key file, keyed by
+    resolved path and validated against the file's (mtime, size, inode).
+    """
+
+    cache_file: CacheFile = field(
+        default_factory=lambda: CacheFile(
+            "identity_files.json", IDENTITY_FILE_CACHE_SCHEMA_VERSION
+        )
+    )
+
+    def load(self):
+        self.cache_file.load()
+        return self
+
+    def get(self, path: Path, stat_key: StatKey):
+        cached = self.cache_file.get(str(path))
+        if cached is None or cached["stat"] != stat_key:
+            return None
+        return cached["email"]
+
+    def set(self, path: Path, stat_key: StatKey, email: str):
+        self.cache_file.set(str(path), {"stat": stat_key, "email": email})
+
+    def save(self):
+        if self.cache_file.is_modified:
+            for key in list(self.cache_file.entries):
+                if not os.path.exists(key):
+                    self.cache_file.remove(key)
+        self.cache_file.save()
 
 
 @dataclass
 class SshDataReader:
     factory: SshDataEntryFactory
+    cache: IdentityFileCache | None = None
+    # Each config file read, plus each missing Include file, the directory of
+    # each Include glob and each identity file's public key, so that changes
+    # can be detected with a stat
+    read_paths: list[Path] = field(default_factory=list)
+    # Problems with identity files, which are reported rather than raised
+    warnings: list[str] = field(default_factory=list)
+    # Public key file path => email, so that each is read at most once
+    _emails: dict[Path, str] = field(default_factory=dict)
 
-    def get_config_entries_from_file(
-        self, path: Path = Path.home().joinpath(".ssh", "config")
-    ):
+    def get_config_entries_from_file(self, path: Path | None = None):
+        path = path if path else _get_default_ssh_config_path()
         config_entries: list[SshDataEntry] = []
+        # Options before the first Host line apply to every host
+        self.factory.hostname = "*"
+        self.read_paths = [Path(path)]
+        with TIMINGS.phase("ssh config"):
+            try:
+                self._read_config_file(Path(path), config_entries, 0)
+            except FileNotFoundError:
+                # As in ssh, a missing config is the same as an empty one. Its
+                # path is still read, so that creating it is noticed
+                pass
+        return config_entries
+
+    def _read_config_file(
+        self, path: Path, config_entries: list[SshDataEntry], depth: int
+    ):
+        TIMINGS.increment("files opened")
         with open(path, "r") as file:
             for line in file:
-                # Remove whitespace
-                line_stripped = line.strip()
-                # Skip the line if it is blank
-                if line_stripped == "":
+                split = _split_config_line(line)
+                if split is None:
                     continue
-                # Get the key/value pair on the line
-                [key, value] = line_stripped.split()
-                # switch on the key
-                match key:
-                    case "Host":
-                        self.factory.hostname = value
-                    case "IdentityFile":
-                        self.factory.identity_file_path = value
-                        self.factory.email = self.get_email_from_identity_file(value)
+                keyword, arguments = split
+                match keyword:
+                    case "host":
+                        self.factory.hostname = " ".join(arguments)
+                    case "match":
+                        self.factory.hostname = _get_match_host_patterns(arguments)
+                    case "include":
+                        if depth >= MAX_INCLUDE_DEPTH:
+                            continue
+                        # Lines after the Include belong to the block it is in,
+                        # not to the included file's last block
+                        hostname = self.factory.hostname
+                        for include_path in self._get_include_paths(arguments):
+                            self._read_config_file(
+                                include_path, config_entries, depth + 1
+                            )
+                        self.factory.hostname = hostname
+                    case "identityfile":
+                        # Blocks with unsupported Match criteria never match
+                        if self.factory.hostname is None or not arguments:
+                            continue
+                        self.factory.identity_file_path = arguments[0]
+                        self.factory.email = self.get_email_from_identity_file(
+                            arguments[0]
+                        )
                         config_entries.append(self.factory.create())
-        return config_entries
 
-    def get_email_from_identity_file(self, identity_file: Path):
-        pub_path = Path(f"{identity_file}.pub").expanduser()
-        content = ""
-        with open(pub_path.resolve(), "r") as file:
-            content = file.read()
-        # From the public key content, get the email address
-        return regex.search(r"\b\w*@\w*\.\w*\b", content).group(0).strip()
+    def _get_include_paths(self, patterns: list[str]):
+        """Expands the globs of an Include line. Relative paths are relative to
+        the directory of the top-level config, ~/.ssh by default."""
+        include_paths = list[Path]()
+        for pattern in patterns:
+            pattern = self.read_paths[0].parent.joinpath(os.path.expanduser(pattern))
+            if any(char in str(pattern) for char in "*?["):
+                self.read_paths.append(pattern.parent)
+            else:
+                self.read_paths.append(pattern)
+            include_paths += [
+                Path(include_path)
+                for include_path in sorted(glob.glob(str(pattern)))
+                if os.path.isfile(include_path)
+            ]
+        return include_paths
+
+    def get_email_from_identity_file(self, identity_file: str):
+        """Returns the email address in the comment of the identity file's
+        public key, or "" if it cannot be read, recording a warning."""
+        pub_path = Path(f"{identity_file}.pub").expanduser().resolve()
+        if pub_path in self._emails:
+            return self._emails[pub_path]
+        self.read_paths.append(pub_path)
+        stat_key = _get_stat_key(pub_path)
+        email = None
+        if stat_key is not None and self.cache is not None:
+            email = self.cache.get(pub_path, stat_key)
+            TIMINGS.increment(
+                "identity file cache misses"
+                if email is None
+                else "identity file cache hits"
+            )
+        if email is None:
+            email = self._read_email_from_public_key(pub_path)
+            # Failures aren't cached, so their warnings are repeated each run
+            if email and stat_key is not None and self.cache is not None:
+                self.cache.set(pub_path, stat_key, email)
+        self._emails[pub_path] = email
+        return email
+
+    def _read_email_from_public_key(self, pub_path: Path):
+        try:
+            TIMINGS.increment("files opened")
+            with open(pub_path, "r") as file:
+                content = file.read()
+        except OSError as e:
+            self.warnings.append(f"Could not read public key {pub_path}: {e.strerror}")
+            return ""
+        email = _get_email_from_public_key(content)
+        if email is None:
+            self.warnings.append(f"No email address in the comment of {pub_path}")
+            return ""
+        return email
@@ -0,0 +1,81 @@
+"""
+Lightweight instrumentation of where a run spends its time: wall time per
+phase, and counters such as files opened and cache hits. Recording is a no-op
+until enabled, so instrumented code paths cost next to nothing by default.
+"""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+
+# Returned by disabled timings, so that timed blocks cost a single call
+_NULL_CONTEXT = nullcontext()
+
+
+@dataclass
+class Timings:
+    """
+    Accumulated wall time (in seconds) per phase, and counts per counter.
+    Phases may run on several threads at once (gpg and ssh are read alongside
+    repos), in which case their times overlap.
+    """
+
+    is_enabled: bool = False
+    phases: dict[str, float] = field(default_factory=dict)
+    counters: dict[str, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add_time(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0) + seconds
+
+    def increment(self, counter: str, count: int = 1):
+        if not self.is_enabled:
+            return
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + count
+
+    def phase(self, phase: str) -> AbstractContextManager[None]:
+        """Adds the time spent in the with block to the phase."""
+        if not self.is_enabled:
+            return _NULL_CONTEXT
+        return self._time_phase(phase)
+
+    @contextmanager
+    def _time_phase(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def merge(self, phases: dict[str, float], counters: dict[str, int]):
+        """Adds phases and counters recorded elsewhere, such as by a worker
+        process."""
+        for phase, seconds in phases.items():
+            self.add_time(phase, seconds)
+        with self._lock:
+            for counter, count in counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + count
+
+    def pop(self):
+        """Returns the recorded phases and counters, and clears them."""
+        with self._lock:
+            phases, counters = self.phases, self.counters
+            self.phases, self.counters = {}, {}
+        return phases, counters
+
+    def get_summary(self):
+        lines = ["Timings (phases on different threads may overlap):"]
+        for phase, seconds in self.phases.items():
+            lines.append(f"  {phase:<32}{seconds * 1000:>10.2f} ms")
+        lines.append("Counters:")
+        for counter, count in sorted(self.counters.items()):
+            lines.append(f"  {counter:<32}{count:>10}")
+        return "\n".join(lines)
+
+
+# Shared by everything in the process
+TIMINGS = Timings()
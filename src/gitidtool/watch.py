@@ -0,0 +1,330 @@
+"""
+Incremental re-evaluation for check --watch. After a first full check, the
+files each result depends on are watched: each repo's config and the files it
+includes, the ssh config, its includes and public keys, and the gpg keyring.
+A change re-evaluates only the repos it affects (every repo, for gpg and ssh
+changes), and only results whose output changed are reported again.
+
+Files are watched with Linux inotify, through ctypes, so that waiting for a
+change uses no CPU. Where inotify is unavailable, or runs out of watches,
+files are polled with a stat instead.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from gitidtool.cache import StatKey, _get_stat_key
+from gitidtool.check_cmd_result import CheckCmdResultData
+from gitidtool.git_data import (
+    GitConfigCache,
+    GitDataEntry,
+    GitDataEntryFactory,
+    GitDataReader,
+)
+from gitidtool.gpg_keyring import GPG_KEYRING_PATHS, _get_gnupg_home
+from gitidtool.identity_index import IdentityIndex
+
+# From <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ONLYDIR = 0x1000000
+# Completed writes, and files replaced by rename (as git and most editors
+# write them), created or deleted
+_WATCH_MASK = (
+    _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+# struct inotify_event, before its variable-length name
+_EVENT_HEADER = struct.Struct("iIII")
+
+# How long to keep collecting changes after the first one, so that a burst of
+# writes (such as git rewriting a config) is evaluated once
+DEBOUNCE_DELAY = 0.1
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+class InotifyFileWatcher:
+    """
+    Watches files with inotify. The directory containing each file is watched
+    (as is each path which is itself a directory), so that files which are
+    replaced by rename, or which do not exist yet, are seen. Files in
+    directories which do not exist are not seen until they are watched again.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        self._libc = libc
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.paths = set[str]()
+        # watch descriptor => directory
+        self._directories = dict[int, str]()
+        self._watched_directories = set[str]()
+
+    def watch(self, paths: Iterable[str]):
+        """Watches the given paths, in addition to those already watched.
+        Raises an OSError if the system's limit on watches is reached."""
+        for path in paths:
+            self.paths.add(path)
+            directories = [os.path.dirname(path)]
+            if os.path.isdir(path):
+                directories.append(path)
+            for directory in directories:
+                if directory not in self._watched_directories:
+                    self._add_watch(directory)
+
+    def _add_watch(self, directory: str):
+        descriptor = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), _WATCH_MASK
+        )
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return
+            raise OSError(error, f"Could not watch {directory}: {os.strerror(error)}")
+        self._directories[descriptor] = directory
+        self._watched_directories.add(directory)
+
+    def wait(self, timeout: float | None = None):
+        """Blocks until a watched path may have changed, or until the timeout
+        (in seconds) passes, returning the watched paths which may have
+        changed. If events were lost, every watched path is returned."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set[str]()
+        try:
+            buffer = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return set[str]()
+        changed = set[str]()
+        offset = 0
+        while offset < len(buffer):
+            descriptor, mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            if mask & _IN_Q_OVERFLOW:
+                return set(self.paths)
+            directory = self._directories.get(descriptor)
+            if directory is None:
+                continue
+            if mask & _IN_IGNORED:
+                # The directory was removed
+                del self._directories[descriptor]
+                self._watched_directories.discard(directory)
+            # A change to a file in a watched directory changes the directory
+            # too, for directories which are depended on for their stat
+            for path in [directory, os.path.join(directory, os.fsdecode(name))]:
+                if path in self.paths:
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+@dataclass
+class PollingFileWatcher:
+    """
+    Watches files by comparing their stat keys every interval seconds, for
+    systems without inotify.
+    """
+
+    interval: float = DEFAULT_POLL_INTERVAL
+    _stat_keys: dict[str, StatKey | None] = field(default_factory=dict)
+
+    @property
+    def paths(self):
+        return set(self._stat_keys)
+
+    def watch(self, paths: Iterable[str]):
+        for path in paths:
+            if path not in self._stat_keys:
+                self._stat_keys[path] = _get_stat_key(path)
+
+    def wait(self, timeout: float | None = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, max(deadline - time.monotonic(), 0))
+            time.sleep(delay)
+            changed = set[str]()
+            for path, stat_key in self._stat_keys.items():
+                new_stat_key = _get_stat_key(path)
+                if new_stat_key != stat_key:
+                    self._stat_keys[path] = new_stat_key
+                    changed.add(path)
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def _create_file_watcher():
+    try:
+        return InotifyFileWatcher()
+    except OSError:
+        return PollingFileWatcher()
+
+
+def _get_gpg_keyring_paths():
+    gnupg_home = _get_gnupg_home()
+    return [str(gnupg_home.joinpath(name)) for name in GPG_KEYRING_PATHS]
+
+
+@dataclass
+class CheckWatchSession:
+    """
+    The results of a watched check, with the files each depends on.
+
+    :param Callable[[CheckCmdResultData], str] render_result: renders a result
+    :param Callable[[list[Path]], IdentityIndex] read_identity_index: reads the
+    gpg and ssh configuration, extending the given list with the ssh files it
+    depends on
+    """
+
+    render_result: Callable[[CheckCmdResultData], str]
+    read_identity_index: Callable[[list[Path]], IdentityIndex]
+    watcher: InotifyFileWatcher | PollingFileWatcher = field(
+        default_factory=_create_file_watcher
+    )
+    cache: GitConfigCache = field(default_factory=lambda: GitConfigCache().load())
+    identity_index: IdentityIndex | None = None
+    # The gpg and ssh files the identity index was read from
+    identity_paths: set[str] = field(default_factory=set)
+    # Keyed by config path, in the order repos were first reported
+    entries: dict[str, GitDataEntry] = field(default_factory=dict)
+    rendered_results: dict[str, str] = field(default_factory=dict)
+    # Watched path => the config paths of the repos which depend on it
+    dependents: dict[str, set[str]] = field(default_factory=dict)
+    # Problems reported on watching, such as falling back to polling
+    warnings: list[str] = field(default_factory=list)
+
+    def start(
+        self,
+        config_paths: Iterable[Path],
+        identity_index: IdentityIndex,
+        ssh_read_paths: list[Path],
+    ):
+        """Evaluates every repo against the given identity index, read from
+        the given ssh files, yielding the rendered result of each."""
+        self.identity_index = identity_index
+        self._set_identity_paths(ssh_read_paths)
+        for path, rendered_result in self._evaluate_repos(
+            str(path) for path in config_paths
+        ):
+            if rendered_result is not None:
+                yield rendered_result
+
+    def wait_for_changes(self):
+        """Blocks until a watched file changes, then yields (config path,
+        rendered result) for each repo whose output changed, with None for
+        repos which no longer exist."""
+        changed_paths = self.watcher.wait()
+        while changed_paths:
+            more_changed_paths = self.watcher.wait(DEBOUNCE_DELAY)
+            if not more_changed_paths:
+                break
+            changed_paths |= more_changed_paths
+        if not changed_paths:
+            return
+        if not changed_paths.isdisjoint(self.identity_paths):
+            ssh_read_paths = list[Path]()
+            self.identity_index = self.read_identity_index(ssh_read_paths)
+            self._set_identity_paths(ssh_read_paths)
+            # Any repo may be affected, but none need to be parsed again
+            yield from self._render_repos(list(self.entries))
+        repos = set[str]()
+        for path in changed_paths:
+            repos |= self.dependents.get(path, set())
+        # In the order they were first reported
+        yield from self._evaluate_repos(
+            [path for path in self.entries if path in repos]
+        )
+        self.cache.save()
+
+    def _set_identity_paths(self, ssh_read_paths: list[Path]):
+        self.identity_paths = {str(path) for path in ssh_read_paths}
+        self.identity_paths.update(_get_gpg_keyring_paths())
+        self._watch(self.identity_paths)
+
+    def _evaluate_repos(self, config_paths: Iterable[str]):
+        # Included files are memoized per reader, so each round reads them
+        # again
+        reader = GitDataReader(GitDataEntryFactory(), self.cache)
+        for path in config_paths:
+            try:
+                self.entries[path] = reader.get_git_config_from_file(Path(path))
+            except OSError:
+                # The repo was removed
+                if self.entries.pop(path, None) is not None:
+                    self.rendered_results.pop(path, None)
+                    yield path, None
+                continue
+            self._watch_repo(path)
+            yield from self._render_repos([path])
+
+    def _render_repos(self, config_paths: list[str]):
+        for path in config_paths:
+            rendered_result = self.render_result(
+                CheckCmdResultData(self.entries[path], self.identity_index)
+            )
+            if self.rendered_results.get(path) != rendered_result:
+                self.rendered_results[path] = rendered_result
+                yield path, rendered_result
+
+    def _watch_repo(self, path: str):
+        paths = [path]
+        paths += [dependency for dependency, _ in self.cache.get_dependencies(path)]
+        for dependency in paths:
+            self.dependents.setdefault(dependency, set()).add(path)
+        self._watch(paths)
+
+    def _watch(self, paths: Iterable[str]):
+        paths = list(paths)
+        try:
+            self.watcher.watch(paths)
+        except OSError as e:
+            # Such as reaching the limit on inotify watches
+            self.warnings.append(f"{e}, so files are polled for changes instead")
+            watched_paths = self.watcher.paths
+            self.watcher.close()
+            self.watcher = PollingFileWatcher()
+            self.watcher.watch(watched_paths)
+            self.watcher.watch(paths)
+
+    def close(self):
+        self.watcher.close()
+        self.cache.save()
@@ -0,0 +1,436 @@
+"""
+Component microbenchmarks, using the case generators to synthesise large
+inputs.
+
+Run the suite and store the results as a JSON baseline:
+    python -m tests.bench run -o baseline.json
+Then compare a later run against it, flagging regressions:
+    python -m tests.bench run -o current.json
+    python -m tests.bench compare baseline.json current.json
+Measure the memory held per parsed repo, against the earlier representation:
+    python -m tests.bench memory
+"""
+
+import gc
+import json
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from unittest.mock import patch
+
+import click
+from faker import Faker
+
+from gitidtool.check_cmd_result import (
+    CheckCmdResultData,
+    CheckCmdResultJsonReporter,
+    CheckCmdResultReporter,
+)
+from gitidtool.cache import CacheFile
+from gitidtool.check_summary import CheckSummaryReporter
+from gitidtool.click_echo_wrapper import ClickEchoWrapper
+from gitidtool.git_data import (
+    GIT_CONFIG_CACHE_SCHEMA_VERSION,
+    GitConfigCache,
+    GitDataEntry,
+)
+from gitidtool.gpg_data import GpgDataEntry, GpgDataEntryFactory, GpgDataReader
+from gitidtool.identity_index import IdentityIndex
+from gitidtool.ssh_data import SshDataEntry, SshDataEntryFactory, SshDataReader
+from tests.cases import (
+    GitDataEntryGenerator,
+    GitRemoteDataEntryGenerator,
+    GpgDataEntryGenerator,
+    SshDataEntryGenerator,
+)
+
+BENCH_SCHEMA_VERSION = 1
+DEFAULT_SEED = "bench_seed"
+
+
+@dataclass
+class BenchData:
+    """Synthetic git, gpg and ssh data, where most repos match a known ssh host
+    and signing key."""
+
+    git_data: list[GitDataEntry] = field(default_factory=list)
+    gpg_data: list[GpgDataEntry] = field(default_factory=list)
+    ssh_data: list[SshDataEntry] = field(default_factory=list)
+
+    @classmethod
+    def generate(cls, repos: int, ssh_hosts: int, gpg_keys: int, seed: str):
+        faker = Faker()
+        faker.seed_instance(seed)
+        # The generators re-seed the global random module, so choices are made
+        # with a separate instance
+        rng = random.Random(seed)
+        data = cls()
+        for i in range(gpg_keys):
+            # Generated signing keys are drawn from a small vocabulary of
+            # seeds, so unique ones are assigned to avoid duplicate key errors
+            generator = GpgDataEntryGenerator(signing_key=f"{i:016X}")
+            data.gpg_data.append(generator.generate(faker))
+        for _ in range(ssh_hosts):
+            data.ssh_data.append(SshDataEntryGenerator().generate(faker))
+        for _ in range(repos):
+            # Most repos use a known identity, the rest get random values
+            is_known = rng.random() < 0.9
+            gpg_entry = rng.choice(data.gpg_data)
+            ssh_entry = rng.choice(data.ssh_data)
+            remote_generator = GitRemoteDataEntryGenerator(
+                hostname=ssh_entry.hostname if is_known else ""
+            )
+            generator = GitDataEntryGenerator(
+                email=gpg_entry.email if is_known else "",
+                user_name=gpg_entry.name if is_known else "",
+                signing_key=gpg_entry.public_key if is_known else "",
+                remotes=[remote_generator.generate(faker)],
+            )
+            data.git_data.append(generator.generate(faker))
+        return data
+
+    def get_gpg_cmd_output(self):
+        """Returns text in the format of gpg --list-secret-keys --with-colons,
+        with an entry for each gpg key."""
+        lines = []
+        for entry in self.gpg_data:
+            fingerprint = f"{entry.public_key * 2}{entry.public_key[:8]}"
+            lines += [
+                f"sec:u:255:22:{entry.public_key}:1704067200:::u:::cSC:::+::"
+                "ed25519:::0:",
+                f"fpr:::::::::{fingerprint}:",
+                f"grp:::::::::{fingerprint}:",
+                f"uid:u::::1704067200::{fingerprint}::{entry.name} "
+                f"<{entry.email}>::::::::::0:",
+                f"ssb:u:255:18:{entry.public_key[::-1]}:1704067200::::::e:::+::"
+                "cv25519::",
+                f"fpr:::::::::{fingerprint[::-1]}:",
+                f"grp:::::::::{fingerprint[::-1]}:",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write_ssh_config(self, directory: Path):
+        """Writes an ssh config file with a Host block for each ssh entry, and
+        the public key file for each identity file. Returns the config path."""
+        lines = []
+        for i, entry in enumerate(self.ssh_data):
+            identity_file = directory.joinpath(f"id-file-{i}")
+            identity_file.with_suffix(".pub").write_text(
+                f"ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAI {entry.email}\n"
+            )
+            lines += [
+                f"Host {entry.hostname}",
+                f"  HostName {entry.hostname}",
+                f"  IdentityFile {identity_file}",
+                "",
+            ]
+        config_path = directory.joinpath("config")
+        config_path.write_text("\n".join(lines))
+        return config_path
+
+
+@dataclass(frozen=True)
+class LegacyGitRemoteDataEntry:
+    """The representation of a remote before it was slotted, for comparison."""
+
+    remote_name: str
+    url: str
+
+    @cached_property
+    def hostname(self):
+        return self.url.split("@", 1)[1].split(":", 1)[0]
+
+
+@dataclass(frozen=True)
+class LegacyGitDataEntry:
+    """The representation of a repo before it was slotted, for comparison."""
+
+    path: str = ""
+    name: str = ""
+    email: str = ""
+    signing_key: str = ""
+    remotes: list[LegacyGitRemoteDataEntry] = field(default_factory=list)
+    worktrees: list[str] = field(default_factory=list)
+
+    @cached_property
+    def repo_folder_name(self):
+        parts = Path(self.path).parts
+        return parts[len(parts) - 3]
+
+
+def _get_git_config_cache_content(data: BenchData):
+    """Returns the git config cache file content for the data's repos, each
+    at a unique path."""
+    entries = {}
+    for i, entry in enumerate(data.git_data):
+        entries[f"/home/user/repos/repo-{i}/.git/config"] = {
+            "stat": [i, i, i],
+            "dependencies": [],
+            "name": entry.name,
+            "email": entry.email,
+            "signing_key": entry.signing_key,
+            "remotes": [
+                [remote.remote_name, remote.url, remote.rewritten_url]
+                for remote in entry.remotes
+            ],
+            "worktrees": [f"/home/user/repos/repo-{i}"],
+        }
+    return json.dumps(
+        {"schema_version": GIT_CONFIG_CACHE_SCHEMA_VERSION, "entries": entries}
+    )
+
+
+def _measure_memory_per_repo(content: str, load_entries):
+    """Returns the bytes held per repo by the entries that load_entries
+    creates from the loaded cache entries, including the strings they refer
+    to, once the loaded content is released."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        cached_entries = json.loads(content)["entries"]
+        entries = load_entries(cached_entries)
+        for entry in entries:
+            # Derived values are held too, once used
+            entry.repo_folder_name
+            for remote in entry.remotes:
+                remote.hostname
+        del cached_entries
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size / len(entries)
+
+
+def measure_memory(data: BenchData):
+    """Measures the memory held per repo by the current and legacy
+    representations, loading each repo from the git config cache."""
+
+    def load_legacy(cached_entries: dict):
+        return [
+            LegacyGitDataEntry(
+                path,
+                cached["name"],
+                cached["email"],
+                cached["signing_key"],
+                [
+                    LegacyGitRemoteDataEntry(name, url)
+                    for name, url, _ in cached["remotes"]
+                ],
+                cached["worktrees"],
+            )
+            for path, cached in cached_entries.items()
+        ]
+
+    def load(cached_entries: dict):
+        cache = GitConfigCache(
+            CacheFile(
+                "git_config.json",
+                GIT_CONFIG_CACHE_SCHEMA_VERSION,
+                entries=cached_entries,
+            )
+        )
+        return [
+            cache.get(path, cached["stat"]) for path, cached in cached_entries.items()
+        ]
+
+    content = _get_git_config_cache_content(data)
+    return {
+        "legacy_bytes_per_repo": _measure_memory_per_repo(content, load_legacy),
+        "bytes_per_repo": _measure_memory_per_repo(content, load),
+    }
+
+
+def _time(function, repeat: int):
+    """Returns the fastest of several timed calls, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_benchmarks(data: BenchData, repeat: int):
+    """Times each component against the data, returning the fastest time in
+    seconds for each benchmark, by name."""
+    results = {}
+    identity_index = IdentityIndex.build(data.gpg_data, data.ssh_data)
+    results["identity_index_build"] = _time(
+        lambda: IdentityIndex.build(data.gpg_data, data.ssh_data), repeat
+    )
+
+    def evaluate():
+        return [CheckCmdResultData(entry, identity_index) for entry in data.git_data]
+
+    results["check_cmd_result_data"] = _time(evaluate, repeat)
+
+    # Results cache derived values, so each reporting run gets fresh ones
+    def report():
+        click_echo_wrapper = ClickEchoWrapper()
+        reporter = CheckCmdResultReporter()
+        for result in evaluate():
+            reporter.report_on_result(result, click_echo_wrapper)
+            click_echo_wrapper.clear()
+
+    results["check_cmd_result_reporter"] = max(
+        _time(report, repeat) - results["check_cmd_result_data"], 0
+    )
+
+    def report_json():
+        for _ in CheckCmdResultJsonReporter().report_on_results(evaluate()):
+            pass
+
+    results["check_cmd_result_json_reporter"] = max(
+        _time(report_json, repeat) - results["check_cmd_result_data"], 0
+    )
+
+    def report_summary():
+        for _ in CheckSummaryReporter().report_on_results(evaluate()):
+            pass
+
+    results["check_summary_reporter"] = max(
+        _time(report_summary, repeat) - results["check_cmd_result_data"], 0
+    )
+
+    gpg_cmd_output = data.get_gpg_cmd_output()
+    with patch.object(
+        GpgDataReader,
+        "_iter_cmd_output_lines",
+        side_effect=lambda: iter(gpg_cmd_output.splitlines(keepends=True)),
+    ):
+        results["gpg_parser"] = _time(
+            lambda: GpgDataReader(GpgDataEntryFactory()).get_gpg_config(), repeat
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = data.write_ssh_config(Path(directory))
+        results["ssh_parser"] = _time(
+            lambda: SshDataReader(SshDataEntryFactory()).get_config_entries_from_file(
+                config_path
+            ),
+            repeat,
+        )
+    return results
+
+
+@click.group()
+def bench():
+    pass
+
+
+@bench.command()
+@click.option("--repos", default=10_000, show_default=True)
+@click.option("--ssh-hosts", default=1_000, show_default=True)
+@click.option("--gpg-keys", default=500, show_default=True)
+@click.option("--repeat", default=5, show_default=True)
+@click.option("--seed", default=DEFAULT_SEED, show_default=True)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="The file to store the results in as JSON (printed if not set)",
+)
+def run(repos, ssh_hosts, gpg_keys, repeat, seed, output):
+    """Runs the benchmarks."""
+    click.echo(
+        f"Generating {repos} repos, {ssh_hosts} ssh hosts and {gpg_keys} gpg keys...",
+        err=True,
+    )
+    data = BenchData.generate(repos, ssh_hosts, gpg_keys, seed)
+    results = run_benchmarks(data, repeat)
+    for name, seconds in results.items():
+        click.echo(f"{name:<36}{seconds * 1000:>10.2f} ms", err=True)
+    content = json.dumps(
+        {
+            "schema_version": BENCH_SCHEMA_VERSION,
+            "python": platform.python_version(),
+            "parameters": {
+                "repos": repos,
+                "ssh_hosts": ssh_hosts,
+                "gpg_keys": gpg_keys,
+                "repeat": repeat,
+                "seed": seed,
+            },
+            "results": results,
+        },
+        indent=2,
+    )
+    if output is None:
+        click.echo(content)
+        return
+    output.write_text(content + "\n")
+
+
+@bench.command()
+@click.option("--repos", default=50_000, show_default=True)
+@click.option("--ssh-hosts", default=1_000, show_default=True)
+@click.option("--gpg-keys", default=500, show_default=True)
+@click.option("--seed", default=DEFAULT_SEED, show_default=True)
+def memory(repos, ssh_hosts, gpg_keys, seed):
+    """Measures the memory held per parsed repo, before and after the records
+    were slotted and their strings interned."""
+    click.echo(f"Generating {repos} repos...", err=True)
+    data = BenchData.generate(repos, ssh_hosts, gpg_keys, seed)
+    results = measure_memory(data)
+    legacy = results["legacy_bytes_per_repo"]
+    current = results["bytes_per_repo"]
+    click.echo(f"{'legacy':<36}{legacy:>10.0f} B/repo")
+    click.echo(f"{'current':<36}{current:>10.0f} B/repo{current / legacy:>8.2f}x")
+
+
+@bench.command()
+@click.argument(
+    "baseline", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument("current", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--threshold",
+    default=0.2,
+    show_default=True,
+    help="The fraction by which a benchmark may slow down before it is flagged",
+)
+@click.option(
+    "--min-difference-ms",
+    default=1.0,
+    show_default=True,
+    help="The slowdown in milliseconds below which a benchmark is never flagged, "
+    "since very fast benchmarks are dominated by noise",
+)
+def compare(baseline, current, threshold, min_difference_ms):
+    """Compares two sets of results, exiting with an error if any benchmark
+    has regressed by more than the threshold."""
+    baseline_content = json.loads(baseline.read_text())
+    current_content = json.loads(current.read_text())
+    if baseline_content["parameters"] != current_content["parameters"]:
+        click.echo("Warning: the results were run with different parameters", err=True)
+    regressions = []
+    for name, current_seconds in current_content["results"].items():
+        baseline_seconds = baseline_content["results"].get(name)
+        if baseline_seconds is None:
+            click.echo(f"{name:<36}{'(new)':>10}")
+            continue
+        ratio = current_seconds / baseline_seconds if baseline_seconds > 0 else 1
+        is_regression = (
+            ratio > 1 + threshold
+            and (current_seconds - baseline_seconds) * 1000 > min_difference_ms
+        )
+        if is_regression:
+            regressions.append(name)
+        click.echo(
+            f"{name:<36}{baseline_seconds * 1000:>10.2f} ms"
+            f"{current_seconds * 1000:>10.2f} ms{ratio:>8.2f}x"
+            + ("  REGRESSION" if is_regression else "")
+        )
+    if regressions:
+        raise click.ClickException(f"Regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    bench()
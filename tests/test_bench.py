@@ -0,0 +1,23 @@
+import unittest
+
+from tests.bench import BenchData, measure_memory, run_benchmarks
+
+
+class TestBench(unittest.TestCase):
+    def test_runs_at_small_scale(self):
+        data = BenchData.generate(repos=50, ssh_hosts=10, gpg_keys=5, seed="test")
+        self.assertEqual(len(data.git_data), 50)
+        results = run_benchmarks(data, repeat=1)
+        self.assertIn("check_cmd_result_data", results)
+        self.assertIn("gpg_parser", results)
+        self.assertIn("ssh_parser", results)
+        self.assertTrue(all(seconds >= 0 for seconds in results.values()))
+
+    def test_slotted_records_use_less_memory(self):
+        data = BenchData.generate(repos=500, ssh_hosts=10, gpg_keys=5, seed="test")
+        results = measure_memory(data)
+        self.assertLess(results["bytes_per_repo"], results["legacy_bytes_per_repo"])
+
+
+if __name__ == "__main__":
+    unittest.main()
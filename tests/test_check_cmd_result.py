@@ -0,0 +1,84 @@
+import json
+import os
+import random
+import unittest
+from unittest.mock import patch
+
+from faker import Faker
+
+from gitidtool.check_cmd_result import CheckCmdResultData, CheckCmdResultJsonReporter
+from gitidtool.click_echo_wrapper import LineStatus
+from gitidtool.git_data import GitDataEntry
+from gitidtool.identity_index import IdentityIndex
+from tests.cases import CaseGenerator
+
+
+class TestCheckCmdResultData(unittest.TestCase):
+    def setUp(self):
+        self.seed = "example_seed"
+        self.fake = Faker()
+        self.fake.seed_instance(self.seed)
+        random.seed(self.seed)
+
+    def generate_consistent_case(self):
+        generator = CaseGenerator(faker=self.fake, hostname="example.com")
+        case = generator.generate_git(override_from_output=True)
+        case = generator.generate_gpg(case, True)
+        return generator.generate_ssh(case, True)
+
+    def evaluate(self, case):
+        index = IdentityIndex.build(case.gpg_data, case.ssh_data)
+        return [CheckCmdResultData(entry, index) for entry in case.git_data]
+
+    def test_consistent(self):
+        [result] = self.evaluate(self.generate_consistent_case())
+        self.assertEqual(result.worst_status, LineStatus.GOOD)
+        self.assertTrue(result.is_consistent)
+        record = result.to_record()
+        self.assertEqual(record["worst_status"], "good")
+        self.assertEqual(record["checks"]["gpg_uid_email"], "good")
+        self.assertTrue(all(remote["status"] == "good" for remote in record["remotes"]))
+
+    def test_global_config(self):
+        entry = GitDataEntry("/tmp/cfg/global", "User", "user@example.com")
+        index = IdentityIndex.build([], [])
+        with patch.dict(os.environ, {"GIT_CONFIG_GLOBAL": "/tmp/cfg/global"}):
+            result = CheckCmdResultData(entry, index)
+            self.assertEqual(result.git_repo_folder_name, "GLOBAL")
+            # The global config needs no remotes
+            self.assertEqual(result.remotes_status, LineStatus.DEFAULT)
+        result = CheckCmdResultData(entry, index)
+        self.assertEqual(result.git_repo_folder_name, "tmp")
+
+    def test_mismatch(self):
+        case = self.generate_consistent_case()
+        generator = CaseGenerator(faker=self.fake, hostname="example.com")
+        case.ssh_data = generator.generate_ssh().ssh_data
+        [result] = self.evaluate(case)
+        self.assertEqual(result.worst_status, LineStatus.ERROR)
+        self.assertEqual(result.to_record()["remotes"][0]["status"], "error")
+
+    def test_missing_gpg_key(self):
+        case = self.generate_consistent_case()
+        case.gpg_data = []
+        [result] = self.evaluate(case)
+        self.assertEqual(result.gpg_uid_email, "")
+        self.assertEqual(result.gpg_uid_email_status, LineStatus.ERROR)
+        self.assertIsNone(result.to_record()["gpg"])
+
+    def test_json_reporter(self):
+        results = self.evaluate(self.generate_consistent_case())
+        results += self.evaluate(self.generate_consistent_case())
+        reporter = CheckCmdResultJsonReporter()
+        lines = list(reporter.report_on_results(results))
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [result.to_record() for result in results],
+        )
+        records = json.loads("\n".join(reporter.report_on_results(results, True)))
+        self.assertEqual(records, [result.to_record() for result in results])
+        self.assertEqual(json.loads("".join(reporter.report_on_results([], True))), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
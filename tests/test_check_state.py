@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from gitidtool.cache import CacheFile
+from gitidtool.check_state import (
+    CHECK_STATE_SCHEMA_VERSION,
+    CheckState,
+    _iter_status_transitions,
+)
+from gitidtool.git_data import (
+    GIT_CONFIG_CACHE_SCHEMA_VERSION,
+    GitConfigCache,
+    GitDataEntryFactory,
+    GitDataReader,
+)
+from gitidtool.identity_index import IdentityIndex
+from gitidtool.ssh_data import SshDataEntry
+
+CONFIG_CONTENT = """[user]
+\tname = Repo User
+\temail = repo@example.com
+[remote "origin"]
+\turl = git@example.com:user-name/repo-name.git
+"""
+
+
+class TestStatusTransitions(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        # Isolated from the system and user's own config, as base layers
+        patcher = patch.dict(
+            "os.environ",
+            {
+                "GIT_CONFIG_NOSYSTEM": "1",
+                "GIT_CONFIG_GLOBAL": str(self.root.joinpath("gitconfig-global")),
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.paths = []
+        for repo in ["first", "second"]:
+            path = self.root.joinpath(repo, ".git", "config")
+            path.parent.mkdir(parents=True)
+            path.write_text(CONFIG_CONTENT)
+            self.paths.append(path)
+        self.identity_index = self.build_identity_index("repo@example.com")
+
+    def build_identity_index(self, ssh_email: str):
+        return IdentityIndex.build(
+            [], [SshDataEntry("example.com", ssh_email, "~/.ssh/id")]
+        )
+
+    def check(self, identity_index: IdentityIndex):
+        cache_dir = self.root.joinpath("cache")
+        state = CheckState(
+            CacheFile("check_state.json", CHECK_STATE_SCHEMA_VERSION, cache_dir)
+        ).load()
+        cache = GitConfigCache(
+            CacheFile("git_config.json", GIT_CONFIG_CACHE_SCHEMA_VERSION, cache_dir)
+        ).load()
+        transitions = _iter_status_transitions(
+            self.paths,
+            identity_index,
+            state,
+            GitDataReader(GitDataEntryFactory(), cache),
+        )
+        return [
+            (result.git_repo_path, previous_status)
+            for result, previous_status in transitions
+        ]
+
+    def test_first_run_reports_all(self):
+        self.assertEqual(
+            self.check(self.identity_index), [(path, None) for path in self.paths]
+        )
+
+    def test_unchanged_repos_not_parsed(self):
+        self.check(self.identity_index)
+        with patch.object(GitDataReader, "get_git_config_from_file") as mock_get:
+            self.assertEqual(self.check(self.identity_index), [])
+            mock_get.assert_not_called()
+
+    def test_config_change(self):
+        self.check(self.identity_index)
+        self.paths[1].write_text(CONFIG_CONTENT.replace("repo@", "other@"))
+        self.assertEqual(self.check(self.identity_index), [(self.paths[1], "warning")])
+        self.assertEqual(self.check(self.identity_index), [])
+
+    def test_identity_change(self):
+        self.check(self.identity_index)
+        self.assertEqual(
+            self.check(self.build_identity_index("other@example.com")),
+            [(path, "warning") for path in self.paths],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
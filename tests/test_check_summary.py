@@ -0,0 +1,95 @@
+import json
+import unittest
+
+from gitidtool.check_cmd_result import CheckCmdResultData
+from gitidtool.check_summary import CheckSummaryReporter, SpaceSavingCounter
+from gitidtool.git_data import GitDataEntry, GitRemoteDataEntry
+from gitidtool.gpg_data import GpgDataEntry
+from gitidtool.identity_index import IdentityIndex
+from gitidtool.ssh_data import SshDataEntry
+
+
+class TestSpaceSavingCounter(unittest.TestCase):
+    def test_exact_within_capacity(self):
+        counter = SpaceSavingCounter(capacity=4)
+        for value in "abacab":
+            counter.add(value)
+        self.assertEqual(counter.get_top(2), [("a", 3, 0), ("b", 2, 0)])
+
+    def test_keeps_frequent_values_beyond_capacity(self):
+        counter = SpaceSavingCounter(capacity=4)
+        for i in range(1000):
+            counter.add("frequent" if i % 3 == 0 else f"rare-{i}")
+        value, count, overcount = counter.get_top(1)[0]
+        self.assertEqual(value, "frequent")
+        self.assertLessEqual(count - overcount, 334)
+        self.assertGreaterEqual(count, 334)
+        self.assertEqual(len(counter.get_top(10)), 4)
+
+
+class TestCheckSummaryReporter(unittest.TestCase):
+    def setUp(self):
+        identity_index = IdentityIndex.build(
+            [GpgDataEntry("KEY", "User", "user@example.com")],
+            [SshDataEntry("example.com", "user@example.com", "~/.ssh/id")],
+        )
+        entries = [
+            self.build_entry("good", "user@example.com", "KEY", "example.com"),
+            self.build_entry("ssh", "other@example.com", "", "example.com"),
+            self.build_entry("gpg", "other@example.com", "KEY", "example.com"),
+            self.build_entry("host", "user@example.com", "KEY", "unknown.com"),
+        ]
+        self.results = [CheckCmdResultData(entry, identity_index) for entry in entries]
+
+    def build_entry(self, repo: str, email: str, signing_key: str, hostname: str):
+        return GitDataEntry(
+            f"/repos/{repo}/.git/config",
+            "User",
+            email,
+            signing_key,
+            [GitRemoteDataEntry("origin", f"git@{hostname}:user/{repo}.git")],
+        )
+
+    def test_json(self):
+        (output,) = CheckSummaryReporter().report_on_results(self.results, "json")
+        record = json.loads(output)
+        self.assertEqual(record["repos"], 4)
+        self.assertEqual(
+            record["worst_status_counts"], {"good": 1, "warning": 1, "error": 2}
+        )
+        self.assertEqual(
+            record["mismatched_emails"],
+            [{"value": "other@example.com", "count": 2, "max_overcount": 0}],
+        )
+        self.assertEqual(
+            record["mismatched_signing_keys"],
+            [{"value": "KEY", "count": 1, "max_overcount": 0}],
+        )
+        self.assertEqual(
+            record["unmatched_ssh_hosts"],
+            [{"value": "unknown.com", "count": 1, "max_overcount": 0}],
+        )
+
+    def test_text(self):
+        (output,) = CheckSummaryReporter().report_on_results(
+            self.results, "text", is_styled=False
+        )
+        self.assertEqual(
+            output.splitlines(),
+            [
+                "Summary of 4 repos",
+                "    ✅ good: 1",
+                "    ❔ warning: 1",
+                "    ❌ error: 2",
+                "Most frequent mismatched emails:",
+                "    ❌ 2 other@example.com",
+                "Most frequent mismatched signing keys:",
+                "    ❌ 1 KEY",
+                "Most frequent ssh hosts with no matching Host block:",
+                "    ❔ 1 unknown.com",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
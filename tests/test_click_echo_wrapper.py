@@ -0,0 +1,84 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import click
+
+from gitidtool.click_echo_wrapper import (
+    ClickEchoColor,
+    ClickEchoWrapper,
+    LineStatus,
+    _echo_in_chunks,
+)
+
+
+class TestClickEchoWrapper(unittest.TestCase):
+    def add_lines(self, click_echo_wrapper: ClickEchoWrapper):
+        click_echo_wrapper.add_line("name", 1)
+        click_echo_wrapper.add_line("Matches", 2, status=LineStatus.GOOD)
+        click_echo_wrapper.add_line(
+            "Missing", 2, color=ClickEchoColor.MISMATCH, status=LineStatus.WARNING
+        )
+        click_echo_wrapper.set_heading("repo", LineStatus.ERROR)
+
+    def test_styled(self):
+        click_echo_wrapper = ClickEchoWrapper()
+        self.add_lines(click_echo_wrapper)
+        self.assertEqual(
+            click_echo_wrapper.get_text(),
+            "\n".join(
+                [
+                    click.style("❌ repo", fg="red", bold=True),
+                    click.style("    name", fg="white", bold=False),
+                    click.style("        ✅ Matches", fg="green", bold=False),
+                    click.style("        ❔ Missing", fg="red", bold=False),
+                ]
+            ),
+        )
+
+    def test_unstyled(self):
+        click_echo_wrapper = ClickEchoWrapper(is_styled=False)
+        self.add_lines(click_echo_wrapper)
+        self.assertEqual(
+            click_echo_wrapper.get_text(),
+            "❌ repo\n    name\n        ✅ Matches\n        ❔ Missing",
+        )
+        click_echo_wrapper.clear()
+        self.assertEqual(click_echo_wrapper.get_text(), "")
+
+    def test_echo_in_chunks(self):
+        outputs = [f"line {i}" for i in range(10)]
+        is_produced = threading.Event()
+
+        def produce():
+            # Every output is ready before the first is written
+            yield from outputs
+            is_produced.set()
+
+        with patch(
+            "click.echo", side_effect=lambda _: is_produced.wait(5)
+        ) as mock_echo:
+            _echo_in_chunks(produce(), max_chunk_size=20)
+        chunks = [call.args[0] for call in mock_echo.call_args_list]
+        self.assertLess(len(chunks), len(outputs))
+        self.assertEqual("\n".join(chunks), "\n".join(outputs))
+
+    def test_echo_in_chunks_slow_producer(self):
+        echoed = list[str]()
+
+        def produce():
+            yield "first"
+            # Each output is written before the next is produced
+            time.sleep(0.2)
+            yield f"after {list(echoed)}"
+            raise RuntimeError("Failed")
+
+        with patch("click.echo", side_effect=echoed.append):
+            with self.assertRaises(RuntimeError):
+                _echo_in_chunks(produce())
+        self.assertEqual(echoed, ["first", "after ['first']"])
+
+
+if __name__ == "__main__":
+    unittest.main()
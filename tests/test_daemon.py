@@ -0,0 +1,149 @@
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from gitidtool.cache import CacheFile
+from gitidtool.daemon import DaemonServer, DaemonState
+from gitidtool.daemon_client import DaemonRequestError, _request_from_daemon
+from gitidtool.git_data import GIT_CONFIG_CACHE_SCHEMA_VERSION, GitConfigCache
+from gitidtool.gpg_data import GpgDataEntry
+from gitidtool.ssh_data import SshDataEntry
+
+CONFIG_CONTENT = """[user]
+\tname = Repo User
+\temail = repo@example.com
+\tsigningkey = ABCDEFGHIJKLMNOP
+[remote "origin"]
+\turl = git@example.com:user-name/repo-name.git
+"""
+
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.repo = self.root.joinpath("repo")
+        self.repo.joinpath(".git").mkdir(parents=True)
+        self.repo.joinpath(".git", "config").write_text(CONFIG_CONTENT)
+        self.socket_path = self.root.joinpath("daemon.sock")
+
+        gpg_patcher = patch(
+            "gitidtool.daemon._get_gpg_config",
+            return_value=[
+                GpgDataEntry("ABCDEFGHIJKLMNOP", "Repo User", "repo@example.com")
+            ],
+        )
+        self.mock_gpg_config = gpg_patcher.start()
+        self.addCleanup(gpg_patcher.stop)
+        self.ssh_warnings = []
+
+        def get_ssh_config(read_paths, warnings):
+            warnings += self.ssh_warnings
+            return [SshDataEntry("example.com", "repo@example.com", "~/id")]
+
+        ssh_patcher = patch(
+            "gitidtool.daemon._get_ssh_config", side_effect=get_ssh_config
+        )
+        ssh_patcher.start()
+        self.addCleanup(ssh_patcher.stop)
+
+    def start_server(self):
+        state = DaemonState(
+            GitConfigCache(
+                CacheFile(
+                    "git_config.json",
+                    GIT_CONFIG_CACHE_SCHEMA_VERSION,
+                    self.root.joinpath("cache"),
+                )
+            )
+        )
+        server = DaemonServer(self.socket_path, state)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+        self.addCleanup(stop)
+        return server
+
+    def request_check(self, environment: dict | None = None):
+        return "\n".join(
+            message["output"]
+            for message in self.request_messages(environment)
+            if "output" in message
+        )
+
+    def request_messages(self, environment: dict | None = None):
+        request = {"command": "check", "cwd": str(self.repo)}
+        if environment is not None:
+            request["environment"] = environment
+        return list(_request_from_daemon(request, self.socket_path))
+
+    def test_no_daemon(self):
+        with self.assertRaises(ConnectionError):
+            self.request_check()
+
+    def test_check(self):
+        self.start_server()
+        output = self.request_check()
+        self.assertIn(f"repo ({self.repo.joinpath('.git', 'config')})", output)
+        self.assertIn("Matches git user.email", output)
+        self.assertNotIn("Does not match", output)
+
+    def test_state_stays_warm(self):
+        self.start_server()
+        first = self.request_check()
+        second = self.request_check()
+        self.assertEqual(first, second)
+        self.assertEqual(self.mock_gpg_config.call_count, 1)
+
+    def test_ssh_warnings_sent_to_client(self):
+        self.ssh_warnings.append("Could not read ~/id.pub")
+        self.start_server()
+        for _ in range(2):
+            messages = self.request_messages()
+            self.assertEqual(messages[0], {"error": "Warning: Could not read ~/id.pub"})
+
+    def test_client_environment(self):
+        gnupg_homes = []
+        gpg_config = self.mock_gpg_config.return_value
+
+        def get_gpg_config(refresh):
+            gnupg_homes.append(os.environ.get("GNUPGHOME"))
+            return gpg_config
+
+        self.mock_gpg_config.side_effect = get_gpg_config
+        self.start_server()
+        daemon_gnupg_home = os.environ.get("GNUPGHOME")
+        for gnupg_home in ["/first", "/second", "/first"]:
+            self.request_check({"GNUPGHOME": gnupg_home})
+        # Each environment's index is kept warm separately
+        self.assertEqual(gnupg_homes, ["/first", "/second"])
+        self.assertEqual(os.environ.get("GNUPGHOME"), daemon_gnupg_home)
+
+    def test_unexpected_error(self):
+        self.mock_gpg_config.side_effect = ValueError("bad keyring")
+        self.start_server()
+        with patch("gitidtool.daemon.traceback.print_exc"), self.assertRaisesRegex(
+            DaemonRequestError, "ValueError: bad keyring"
+        ):
+            self.request_check()
+        # The daemon keeps serving
+        self.mock_gpg_config.side_effect = None
+        self.assertIn("Matches git user.email", self.request_check())
+
+    def test_already_running(self):
+        self.start_server()
+        with self.assertRaises(RuntimeError):
+            DaemonServer(self.socket_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
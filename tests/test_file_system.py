@@ -0,0 +1,101 @@
+import threading
+import time
+import unittest
+from unittest.mock import call, patch
+
+from gitidtool.file_system import _prefetch, _read_config
+
+
+class TestReadConfig(unittest.TestCase):
+    def setUp(self):
+        self.gpg_started = threading.Event()
+        self.ssh_started = threading.Event()
+
+        def iter_git_config(*args):
+            # Only completes if gpg and ssh are read while repos are parsed
+            self.assertTrue(self.gpg_started.wait(5))
+            self.assertTrue(self.ssh_started.wait(5))
+            yield "git"
+
+        def get_gpg_config(*args):
+            self.gpg_started.set()
+            return ["gpg"]
+
+        def get_ssh_config(*args):
+            self.ssh_started.set()
+            return ["ssh"]
+
+        for name, side_effect in [
+            ("_iter_git_config", iter_git_config),
+            ("_get_gpg_config", get_gpg_config),
+            ("_get_ssh_config", get_ssh_config),
+        ]:
+            patcher = patch(f"gitidtool.file_system.{name}", side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_phases_overlap_with_ordered_status_output(self):
+        with patch("gitidtool.file_system.click.echo") as mock_echo:
+            result = _read_config(False, True, ".")
+        git_config, gpg_config, ssh_config = result
+        self.assertEqual(
+            (list(git_config), gpg_config, ssh_config), (["git"], ["gpg"], ["ssh"])
+        )
+        self.assertEqual(
+            mock_echo.call_args_list,
+            [
+                call("Reading git repo configuration files..."),
+                call("Reading gpg configuration..."),
+                call("Reading ssh configuration..."),
+            ],
+        )
+
+    def test_git_error_reported(self):
+        error = RuntimeError("Could not locate a git repo")
+
+        def iter_git_config(*args):
+            raise error
+            yield
+
+        with patch("gitidtool.file_system._iter_git_config", iter_git_config):
+            with patch("gitidtool.file_system.click.echo") as mock_echo:
+                result = _read_config(False, False, ".", suppress_status_output=True)
+        self.assertIsNone(result)
+        mock_echo.assert_called_once_with(error, err=True)
+
+
+class TestPrefetch(unittest.TestCase):
+    def test_yields_in_order(self):
+        self.assertEqual(
+            list(_prefetch(range(1000), max_buffered=8)), list(range(1000))
+        )
+
+    def test_runs_ahead_of_consumer_within_bound(self):
+        consumed = []
+
+        def produce():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        items = _prefetch(produce(), max_buffered=4)
+        self.assertEqual(next(items), 0)
+        time.sleep(0.2)
+        # The first item, the buffer, and one more waiting to be buffered
+        self.assertLessEqual(len(consumed), 6)
+        self.assertGreater(len(consumed), 1)
+        items.close()
+
+    def test_reraises_errors(self):
+        def produce():
+            yield 1
+            raise ValueError("failed")
+
+        items = _prefetch(produce())
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,314 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from gitidtool.cache import CacheFile
+from gitidtool.git_config_file import GitConfigFileReader, _parse_git_config_lines
+from gitidtool.git_data import (
+    GIT_CONFIG_CACHE_SCHEMA_VERSION,
+    GitConfigCache,
+    GitDataEntryFactory,
+    GitDataReader,
+    _GitConfigValues,
+)
+
+CONFIG_CONTENT = """[user]
+\tname = Repo User
+\temail = repo@example.com
+\tsigningkey = ABCDEFGHIJKLMNOP
+[remote "origin"]
+\turl = git@example.com:user-name/repo-name.git
+\tfetch = +refs/heads/*:refs/remotes/origin/*
+"""
+
+
+class TestGitDataReader(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        # Isolated from the system and user's own config, as base layers
+        self.global_path = self.root.joinpath("gitconfig-global")
+        patcher = patch.dict(
+            "os.environ",
+            {"GIT_CONFIG_NOSYSTEM": "1", "GIT_CONFIG_GLOBAL": str(self.global_path)},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.config_path = self.write_config("repo", CONFIG_CONTENT)
+
+    def write_config(self, repo: str, content: str):
+        path = self.root.joinpath(repo, ".git", "config")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        return path
+
+    def create_cache(self):
+        return GitConfigCache(
+            CacheFile(
+                "git_config.json",
+                GIT_CONFIG_CACHE_SCHEMA_VERSION,
+                self.root.joinpath("cache"),
+            )
+        ).load()
+
+    def test_parse(self):
+        entry = GitDataReader(GitDataEntryFactory()).get_git_config_from_file(
+            self.config_path
+        )
+        self.assertEqual(entry.name, "Repo User")
+        self.assertEqual(entry.email, "repo@example.com")
+        self.assertEqual(entry.signing_key, "ABCDEFGHIJKLMNOP")
+        self.assertEqual(len(entry.remotes), 1)
+        self.assertEqual(entry.remotes[0].remote_name, "origin")
+        self.assertEqual(entry.remotes[0].hostname, "example.com")
+
+    def test_parse_remote_urls(self):
+        path = self.write_config(
+            "rewritten",
+            "\n".join(
+                [
+                    '[remote "origin"]',
+                    "\turl = gh:user-name/repo-name.git",
+                    '[remote "mirror"]',
+                    "\turl = https://example.com/user-name/repo-name.git",
+                    '[remote "local"]',
+                    "\turl = ../repo-name",
+                    '[url "git@github.com:"]',
+                    "\tinsteadOf = g",
+                    '[url "ssh://git@github.com:2222/"]',
+                    "\tinsteadOf = gh:",
+                    "",
+                ]
+            ),
+        )
+        entry = GitDataReader(GitDataEntryFactory()).get_git_config_from_file(path)
+        origin, mirror, local = entry.remotes
+        # The longest matching prefix wins
+        self.assertEqual(origin.url, "gh:user-name/repo-name.git")
+        self.assertEqual(
+            origin.rewritten_url, "ssh://git@github.com:2222/user-name/repo-name.git"
+        )
+        self.assertEqual(origin.hostname, "github.com")
+        self.assertEqual(origin.remote_url.port, 2222)
+        self.assertTrue(origin.is_ssh)
+        self.assertEqual(mirror.rewritten_url, "")
+        self.assertEqual(mirror.remote_url.scheme, "https")
+        self.assertFalse(mirror.is_ssh)
+        self.assertIsNone(local.hostname)
+        self.assertFalse(local.is_ssh)
+
+    def test_parse_syntax(self):
+        values = _parse_git_config_lines(
+            [
+                "# comment\n",
+                "[User] ; comment\n",
+                '\tName = "Quoted  Name" # comment\n',
+                "\temail = first@example.com\\\n",
+                "second\n",
+                "[remote.origin]\n",
+                "\tprune\n",
+            ]
+        )
+        self.assertEqual(
+            values,
+            [
+                ("user", None, "name", "Quoted  Name"),
+                ("user", None, "email", "first@example.comsecond"),
+                ("remote", "origin", "prune", "true"),
+            ],
+        )
+
+    def test_include(self):
+        self.root.joinpath("gitconfig-work").write_text(
+            "[user]\n\tname = Work User\n\temail = work@example.com\n"
+        )
+        config_path = self.write_config(
+            "included",
+            "[user]\n\tname = Local User\n"
+            "[include]\n\tpath = ../../gitconfig-work\n"
+            "[user]\n\tsigningkey = ABCDEFGHIJKLMNOP\n",
+        )
+        entry = GitDataReader(GitDataEntryFactory()).get_git_config_from_file(
+            config_path
+        )
+        self.assertEqual(entry.name, "Work User")
+        self.assertEqual(entry.email, "work@example.com")
+        self.assertEqual(entry.signing_key, "ABCDEFGHIJKLMNOP")
+
+    def test_include_if_gitdir(self):
+        include_path = self.root.joinpath("gitconfig-work")
+        include_path.write_text("[user]\n\temail = work@example.com\n")
+        content = (
+            "[user]\n\temail = home@example.com\n"
+            f'[includeIf "gitdir:{self.root}/work/"]\n\tpath = {include_path}\n'
+            f'[includeIf "gitdir/i:{str(self.root).upper()}/CASE/"]\n'
+            f"\tpath = {include_path}\n"
+            '[includeIf "onbranch:main"]\n'
+            f"\tpath = {include_path}\n"
+        )
+        reader = GitDataReader(GitDataEntryFactory())
+        for repo, email in [
+            ("work/repo", "work@example.com"),
+            ("case/repo", "work@example.com"),
+            ("home", "home@example.com"),
+        ]:
+            entry = reader.get_git_config_from_file(self.write_config(repo, content))
+            self.assertEqual(entry.email, email, repo)
+
+    def test_base_layers(self):
+        system_path = self.root.joinpath("gitconfig-system")
+        system_path.write_text(
+            "[user]\n\tname = System User\n\temail = system@example.com\n"
+        )
+        work_path = self.root.joinpath("gitconfig-work")
+        work_path.write_text("[user]\n\temail = work@example.com\n")
+        self.global_path.write_text(
+            "[user]\n\temail = global@example.com\n"
+            f'[includeIf "gitdir:{self.root}/work/"]\n\tpath = {work_path}\n'
+            '[url "git@example.com:"]\n\tinsteadOf = ex:\n'
+        )
+        content = '[user]\n\tname = Repo User\n[remote "origin"]\n\turl = ex:repo\n'
+        reader = GitDataReader(
+            GitDataEntryFactory(),
+            base_config_paths=[str(system_path), str(self.global_path)],
+        )
+        for repo, email in [
+            ("work/repo", "work@example.com"),
+            ("home", "global@example.com"),
+        ]:
+            entry = reader.get_git_config_from_file(self.write_config(repo, content))
+            self.assertEqual(entry.name, "Repo User", repo)
+            self.assertEqual(entry.email, email, repo)
+            self.assertEqual(entry.remotes[0].rewritten_url, "git@example.com:repo")
+        # The global config itself only has the layers beneath it
+        entry = reader.get_git_config_from_file(self.global_path)
+        self.assertEqual(entry.name, "System User")
+        self.assertEqual(entry.email, "global@example.com")
+
+    def test_base_layers_parsed_once(self):
+        self.global_path.write_text("[user]\n\temail = global@example.com\n")
+        paths = [self.write_config(f"repo-{i}", "") for i in range(10)]
+        reader = GitDataReader(GitDataEntryFactory())
+        with patch(
+            "gitidtool.git_config_file._parse_git_config_lines",
+            wraps=_parse_git_config_lines,
+        ) as mock_parse, patch.object(
+            _GitConfigValues, "apply", autospec=True, side_effect=_GitConfigValues.apply
+        ) as mock_apply:
+            entries = [reader.get_git_config_from_file(path) for path in paths]
+        self.assertEqual(mock_parse.call_count, len(paths) + 1)
+        # The base layers' values are applied once, and only overlaid after
+        self.assertEqual(mock_apply.call_count, len(paths) + 1)
+        self.assertTrue(all(entry.email == "global@example.com" for entry in entries))
+
+    def test_cache_invalidated_on_base_layer_change(self):
+        cache = self.create_cache()
+        GitDataReader(GitDataEntryFactory(), cache).get_git_config_from_file(
+            self.config_path
+        )
+        cache.save()
+
+        # The global config did not exist, and now overrides nothing
+        self.global_path.write_text("[user]\n\tname = Global User\n")
+        self.write_config("other", "[user]\n\temail = other@example.com\n")
+        cache = self.create_cache()
+        entry = GitDataReader(GitDataEntryFactory(), cache).get_git_config_from_file(
+            self.root.joinpath("other", ".git", "config")
+        )
+        self.assertEqual(entry.name, "Global User")
+        self.assertIn(
+            str(self.global_path),
+            [path for path, _ in cache.get_dependencies(self.config_path)],
+        )
+
+    def test_shared_include_parsed_once(self):
+        include_path = self.root.joinpath("gitconfig-work")
+        include_path.write_text("[user]\n\temail = work@example.com\n")
+        content = f"[include]\n\tpath = {include_path}\n"
+        paths = [self.write_config(f"repo-{i}", content) for i in range(10)]
+        config_file_reader = GitConfigFileReader()
+        reader = GitDataReader(
+            GitDataEntryFactory(), self.create_cache(), config_file_reader
+        )
+        with patch(
+            "gitidtool.git_config_file._parse_git_config_lines",
+            wraps=_parse_git_config_lines,
+        ) as mock_parse:
+            entries = [reader.get_git_config_from_file(path) for path in paths]
+        # Once for each repo's own config, and once for the shared include
+        self.assertEqual(mock_parse.call_count, len(paths) + 1)
+        self.assertTrue(all(entry.email == "work@example.com" for entry in entries))
+
+    def test_cache_invalidated_on_include_change(self):
+        include_path = self.root.joinpath("gitconfig-work")
+        include_path.write_text("[user]\n\temail = work@example.com\n")
+        missing_path = self.root.joinpath("gitconfig-missing")
+        config_path = self.write_config(
+            "included",
+            f"[include]\n\tpath = {include_path}\n\tpath = {missing_path}\n",
+        )
+        cache = self.create_cache()
+        GitDataReader(GitDataEntryFactory(), cache).get_git_config_from_file(
+            config_path
+        )
+        cache.save()
+
+        missing_path.write_text("[user]\n\temail = other@example.com\n")
+        cache = self.create_cache()
+        entry = GitDataReader(GitDataEntryFactory(), cache).get_git_config_from_file(
+            config_path
+        )
+        self.assertEqual(entry.email, "other@example.com")
+
+    def test_cache_skips_parsing_when_unchanged(self):
+        cache = self.create_cache()
+        first = GitDataReader(GitDataEntryFactory(), cache).get_git_config_from_file(
+            self.config_path
+        )
+        cache.save()
+
+        cache = self.create_cache()
+        reader = GitDataReader(GitDataEntryFactory(), cache)
+        with patch.object(GitDataReader, "_parse_git_config_file") as mock_parse:
+            second = reader.get_git_config_from_file(self.config_path)
+            mock_parse.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_cache_invalidated_on_change(self):
+        cache = self.create_cache()
+        GitDataReader(GitDataEntryFactory(), cache).get_git_config_from_file(
+            self.config_path
+        )
+        cache.save()
+
+        self.write_config("repo", CONFIG_CONTENT.replace("Repo User", "Other User"))
+        cache = self.create_cache()
+        entry = GitDataReader(GitDataEntryFactory(), cache).get_git_config_from_file(
+            self.config_path
+        )
+        self.assertEqual(entry.name, "Other User")
+
+    def test_cache_evicts_missing_repos(self):
+        removed_path = self.write_config("removed", CONFIG_CONTENT)
+        cache = self.create_cache()
+        reader = GitDataReader(GitDataEntryFactory(), cache)
+        reader.get_git_config_from_file(self.config_path)
+        reader.get_git_config_from_file(removed_path)
+        cache.save()
+        os.remove(removed_path)
+
+        cache = self.create_cache()
+        self.assertIn(str(removed_path), cache.cache_file.entries)
+        other_path = self.write_config("other", CONFIG_CONTENT)
+        GitDataReader(GitDataEntryFactory(), cache).get_git_config_from_file(other_path)
+        cache.save()
+        cache = self.create_cache()
+        self.assertNotIn(str(removed_path), cache.cache_file.entries)
+        self.assertIn(str(self.config_path), cache.cache_file.entries)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from gitidtool.cache import CacheFile
+from gitidtool.check_cmd_result import CheckCmdResultData
+from gitidtool.click_echo_wrapper import LineStatus
+from gitidtool.git_data import GitDataEntry
+from gitidtool.gpg_data import (
+    GPG_KEYRING_CACHE_SCHEMA_VERSION,
+    GpgDataEntry,
+    GpgDataEntryFactory,
+    GpgDataReader,
+    GpgKey,
+    GpgKeyringCache,
+    GpgSubkey,
+    _iter_gpg_keys,
+)
+from gitidtool.identity_index import IdentityIndex
+
+GPG_OUTPUT = """sec:u:255:22:ABCDEFGHIJKLMNOP:1704067200:::u:::cSC:::+::ed25519:::0:
+fpr:::::::::0123456789ABCDEF0123456789ABCDEFGHIJKLMNOP:
+grp:::::::::0123456789ABCDEF0123456789ABCDEF01234567:
+uid:u::::1704067200::0123456789ABCDEF0123456789ABCDEF01234567::Gpg User <gpg@example.com>::::::::::0:
+ssb:u:255:18:QRSTUVWXYZ012345:1704067200::::::e:::+::cv25519::
+fpr:::::::::0123456789ABCDEF0123456789ABCDEFQRSTUVWXYZ012345:
+grp:::::::::0123456789ABCDEF0123456789ABCDEF01234567:
+"""
+
+
+class TestGpgDataReader(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.gnupg_home = self.root.joinpath("gnupg")
+        self.gnupg_home.mkdir()
+        self.gnupg_home.joinpath("pubring.kbx").write_text("keyring")
+        patcher = patch.dict("os.environ", {"GNUPGHOME": str(self.gnupg_home)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(
+            GpgDataReader,
+            "_iter_cmd_output_lines",
+            side_effect=lambda: iter(GPG_OUTPUT.splitlines(keepends=True)),
+        )
+        self.mock_cmd_output = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_with_cache(self, refresh=False):
+        cache = GpgKeyringCache(
+            CacheFile(
+                "gpg_keyring.json",
+                GPG_KEYRING_CACHE_SCHEMA_VERSION,
+                self.root.joinpath("cache"),
+            )
+        ).load()
+        result = GpgDataReader(GpgDataEntryFactory(), cache).get_gpg_config(refresh)
+        cache.save()
+        return result
+
+    def test_parse(self):
+        self.assertEqual(
+            GpgDataReader(GpgDataEntryFactory()).get_gpg_config(),
+            [GpgDataEntry("ABCDEFGHIJKLMNOP", "Gpg User", "gpg@example.com")],
+        )
+
+    def test_parse_keys(self):
+        lines = [
+            "sec:u:255:22:AAAAAAAAAAAAAAAA:1704067200:::u:::cSC:::#::ed25519:::0:",
+            "uid:u::::1704067200::HASH::Work\\x3a User (laptop) <work@example.com>::::::::::0:",
+            "uid:r::::1704067200::HASH::Old User <old@example.com>::::::::::0:",
+            "uid:u::::1704067200::HASH::No Email::::::::::0:",
+            "ssb:u:255:22:BBBBBBBBBBBBBBBB:1704067200::::::s:::+::ed25519::",
+            "ssb:e:255:22:CCCCCCCCCCCCCCCC:1704067200::::::s:::+::ed25519::",
+            "ssb:u:255:22:DDDDDDDDDDDDDDDD:1704067200::::::s:::#::ed25519::",
+            "ssb:u:255:18:EEEEEEEEEEEEEEEE:1704067200::::::e:::+::cv25519::",
+            "sec:r:255:22:FFFFFFFFFFFFFFFF:1704067200:::u:::cSC:::+::ed25519:::0:",
+            "uid:u::::1704067200::HASH::Revoked <revoked@example.com>::::::::::0:",
+        ]
+        keys = list(_iter_gpg_keys(lines))
+        self.assertEqual(
+            keys,
+            [
+                GpgKey(
+                    "AAAAAAAAAAAAAAAA",
+                    [("Work: User (laptop)", "work@example.com"), ("No Email", "")],
+                    [
+                        GpgSubkey("BBBBBBBBBBBBBBBB", "s", True),
+                        GpgSubkey("DDDDDDDDDDDDDDDD", "s", False),
+                        GpgSubkey("EEEEEEEEEEEEEEEE", "e", True),
+                    ],
+                )
+            ],
+        )
+        # Signing subkeys are attributed to the key's uids, rather than only
+        # the primary key
+        self.assertEqual(
+            keys[0].get_signing_key_ids(), ["AAAAAAAAAAAAAAAA", "BBBBBBBBBBBBBBBB"]
+        )
+
+    def test_expiry(self):
+        lines = [
+            "sec:u:255:22:AAAAAAAAAAAAAAAA:1704067200:1900000000::u:::cSC:::+::ed25519:::0:",
+            "uid:u::::1704067200:20300101T000000:HASH::Work User <work@example.com>::::::::::0:",
+            "ssb:u:255:22:BBBBBBBBBBBBBBBB:1704067200:1800000000:::::s:::+::ed25519::",
+            "sec:u:255:22:CCCCCCCCCCCCCCCC:1704067200:::u:::cSC:::+::ed25519:::0:",
+        ]
+        first, second = _iter_gpg_keys(lines)
+        # The earliest of the key's, its uid's (1893456000) and its subkey's
+        self.assertEqual(first.expires_at, 1800000000)
+        self.assertIsNone(second.expires_at)
+
+    def test_key_with_several_uids(self):
+        lines = [
+            "sec:u:255:22:AAAAAAAAAAAAAAAA:1704067200:::u:::cSC:::+::ed25519:::0:",
+            "uid:u::::1704067200::HASH::Work User <work@example.com>::::::::::0:",
+            "uid:u::::1704067200::HASH::Home User <home@example.com>::::::::::0:",
+            "ssb:u:255:22:BBBBBBBBBBBBBBBB:1704067200::::::s:::+::ed25519::",
+        ]
+        with patch.object(
+            GpgDataReader, "_iter_cmd_output_lines", return_value=iter(lines)
+        ):
+            gpg_config = GpgDataReader(GpgDataEntryFactory()).get_gpg_config()
+        self.assertEqual(len(gpg_config), 2)
+        identity_index = IdentityIndex.build(gpg_config, [])
+        for signing_key, name, email in [
+            ("AAAAAAAAAAAAAAAA", "Work User", "work@example.com"),
+            ("BBBBBBBBBBBBBBBB", "Home User", "home@example.com"),
+        ]:
+            entry = GitDataEntry("/repo/.git/config", name, email, signing_key)
+            result = CheckCmdResultData(entry, identity_index)
+            # Any of the key's uids may match, not only the primary one
+            self.assertEqual(result.gpg_uid_email, email)
+            self.assertEqual(result.gpg_uid_name_status, LineStatus.GOOD)
+            self.assertEqual(result.gpg_uid_email_status, LineStatus.GOOD)
+        entry = GitDataEntry(
+            "/repo/.git/config", "Other", "other@example.com", "B" * 16
+        )
+        result = CheckCmdResultData(entry, identity_index)
+        self.assertEqual(result.gpg_uid_email, "work@example.com")
+        self.assertEqual(result.gpg_uid_email_status, LineStatus.ERROR)
+
+    def test_cache_skips_gpg_when_keyring_unchanged(self):
+        first = self.read_with_cache()
+        second = self.read_with_cache()
+        self.assertEqual(first, second)
+        self.assertEqual(self.mock_cmd_output.call_count, 1)
+
+    def test_cache_invalidated_on_keyring_change(self):
+        self.read_with_cache()
+        self.gnupg_home.joinpath("private-keys-v1.d").mkdir()
+        self.read_with_cache()
+        self.assertEqual(self.mock_cmd_output.call_count, 2)
+
+    def test_cache_invalidated_on_expiry(self):
+        lines = [
+            "sec:u:255:22:AAAAAAAAAAAAAAAA:1704067200:1900000000::u:::cSC:::+::ed25519:::0:",
+            "uid:u::::1704067200::HASH::Gpg User <gpg@example.com>::::::::::0:",
+        ]
+        self.mock_cmd_output.side_effect = lambda: iter(lines)
+        for now, call_count in [(1800000000, 1), (1899999999, 1), (1900000000, 2)]:
+            with self.subTest(now=now), patch(
+                "gitidtool.gpg_data.time.time", return_value=now
+            ):
+                self.read_with_cache()
+                self.assertEqual(self.mock_cmd_output.call_count, call_count)
+
+    def test_refresh(self):
+        self.read_with_cache()
+        self.read_with_cache(refresh=True)
+        self.assertEqual(self.mock_cmd_output.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
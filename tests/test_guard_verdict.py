@@ -0,0 +1,94 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from gitidtool.cache import CacheFile
+from gitidtool.guard_verdict import (
+    GUARD_VERDICT_CACHE_SCHEMA_VERSION,
+    GuardVerdict,
+    GuardVerdictCache,
+)
+
+
+class TestGuardVerdictCache(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.gnupg_home = self.root.joinpath("gnupg")
+        self.gnupg_home.mkdir()
+        self.gnupg_home.joinpath("pubring.kbx").write_text("keyring")
+        self.global_path = self.root.joinpath("gitconfig-global")
+        patcher = patch.dict(
+            "os.environ",
+            {
+                "GNUPGHOME": str(self.gnupg_home),
+                "GIT_CONFIG_NOSYSTEM": "1",
+                "GIT_CONFIG_GLOBAL": str(self.global_path),
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.config_path = self.root.joinpath("repo", ".git", "config")
+        self.config_path.parent.mkdir(parents=True)
+        self.config_path.write_text("[user]\n\tname = Repo User\n")
+        self.ssh_config_path = self.root.joinpath("ssh_config")
+        self.ssh_config_path.write_text("Host *\n\tIdentityFile ~/id\n")
+        # Missing files are inputs too, so that creating one is detected
+        self.missing_path = self.root.joinpath("missing.pub")
+        self.verdict = GuardVerdict("warning", ["No email address"])
+
+    def load(self):
+        return GuardVerdictCache(
+            CacheFile(
+                "guard_verdicts.json",
+                GUARD_VERDICT_CACHE_SCHEMA_VERSION,
+                self.root.joinpath("cache"),
+            )
+        ).load()
+
+    def store(self):
+        cache = self.load()
+        cache.set(
+            self.config_path, [self.ssh_config_path, self.missing_path], self.verdict
+        )
+        cache.save()
+
+    def test_unchanged(self):
+        self.store()
+        self.assertEqual(self.load().get(self.config_path), self.verdict)
+
+    def test_changed_inputs(self):
+        for change in [
+            lambda: self.config_path.write_text("[user]\n\tname = Other User\n"),
+            lambda: self.ssh_config_path.write_text("Host other\n"),
+            lambda: self.missing_path.write_text("ssh-ed25519 AAAA me@example.com"),
+            lambda: self.gnupg_home.joinpath("private-keys-v1.d").mkdir(),
+            lambda: self.global_path.write_text("[user]\n\tname = Global\n"),
+        ]:
+            with self.subTest(change=change):
+                self.store()
+                change()
+                self.assertIsNone(self.load().get(self.config_path))
+
+    def test_different_gnupg_home(self):
+        self.store()
+        with patch.dict("os.environ", {"GNUPGHOME": str(self.root)}):
+            self.assertIsNone(self.load().get(self.config_path))
+
+    def test_different_base_config(self):
+        self.store()
+        for environment in [
+            {"GIT_CONFIG_GLOBAL": str(self.root.joinpath("other-gitconfig"))},
+            {"GIT_CONFIG_NOSYSTEM": "0"},
+        ]:
+            with self.subTest(environment=environment), patch.dict(
+                "os.environ", environment
+            ):
+                self.assertIsNone(self.load().get(self.config_path))
+        self.assertEqual(self.load().get(self.config_path), self.verdict)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import random
+import unittest
+
+from faker import Faker
+
+from gitidtool.gpg_data import GpgDataEntry
+from gitidtool.identity_index import IdentityIndex
+from tests.cases import CaseGenerator
+
+
+class TestIdentityIndex(unittest.TestCase):
+    def setUp(self):
+        self.seed = "example_seed"
+        fake = Faker()
+        fake.seed_instance(self.seed)
+        random.seed(self.seed)
+        generator = CaseGenerator(faker=fake)
+        self.case = generator.generate_git(override_from_output=True)
+        for _ in range(20):
+            self.case = generator.generate_gpg(self.case)
+            self.case = generator.generate_ssh(self.case)
+            self.case = generator.generate_git(self.case)
+
+    def test_matches_linear_lookups(self):
+        def outcome(lookup, *args):
+            try:
+                return lookup(*args)
+            except RuntimeError as e:
+                return str(e)
+
+        index = IdentityIndex.build(self.case.gpg_data, self.case.ssh_data)
+        for git_entry in self.case.git_data:
+            self.assertEqual(
+                outcome(
+                    index.get_gpg_entry_matching_signing_key, git_entry.signing_key
+                ),
+                outcome(
+                    git_entry.get_gpg_entry_matching_signing_key, self.case.gpg_data
+                ),
+            )
+            for remote in git_entry.remotes:
+                self.assertEqual(
+                    index.get_ssh_entry_matching_hostname(remote.hostname),
+                    remote.get_ssh_entry_matching_hostname(self.case.ssh_data),
+                )
+
+    def test_first_ssh_entry_wins(self):
+        ssh_data = self.case.ssh_data + self.case.ssh_data[::-1]
+        index = IdentityIndex.build(self.case.gpg_data, ssh_data)
+        for ssh_entry in self.case.ssh_data:
+            self.assertIs(
+                index.get_ssh_entry_matching_hostname(ssh_entry.hostname),
+                next(
+                    entry for entry in ssh_data if entry.hostname == ssh_entry.hostname
+                ),
+            )
+
+    def test_duplicate_signing_key(self):
+        gpg_entry = self.case.gpg_data[0]
+        duplicate = GpgDataEntry(gpg_entry.public_key, "other name", "other email")
+        index = IdentityIndex.build([gpg_entry, duplicate], self.case.ssh_data)
+        self.assertIn(gpg_entry.public_key, index.duplicate_signing_keys)
+        with self.assertRaises(RuntimeError):
+            index.get_gpg_entry_matching_signing_key(gpg_entry.public_key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+SRC_PATH = Path(__file__).parents[1].joinpath("src")
+# Total cumulative import time allowed for loading the guard command, measured
+# with `python -X importtime`. The interpreter's own startup is not included.
+GUARD_IMPORT_TIME_BUDGET_MICROSECONDS = 150_000
+# Modules which guard must not import before knowing that it needs to evaluate
+# in-process (rather than asking a running daemon)
+GUARD_FORBIDDEN_MODULES = [
+    "concurrent.futures",
+    "gitidtool.check_cmd_result",
+    "gitidtool.file_system",
+    "gitidtool.git_data",
+    "gitidtool.gpg_data",
+    "gitidtool.ssh_data",
+    "regex",
+    "subprocess",
+]
+
+
+def measure_import_times(statement: str):
+    """Runs the statement in a fresh interpreter with -X importtime, returning
+    the cumulative import time in microseconds of each imported module."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(SRC_PATH), *filter(None, [env.get("PYTHONPATH")])]
+    )
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    ).stderr
+    import_times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        # Nested imports are indented beneath the module that imported them,
+        # and are already included in its cumulative time
+        import_times[name.strip()] = (int(cumulative), name.startswith("  "))
+    return import_times
+
+
+class TestImportTime(unittest.TestCase):
+    def setUp(self):
+        # The fastest of several runs, to reduce noise from other processes
+        runs = [
+            measure_import_times(
+                "from gitidtool import program; program.get_command(None, 'guard')"
+            )
+            for _ in range(3)
+        ]
+        self.import_times = min(
+            runs,
+            key=lambda times: sum(
+                cumulative for cumulative, is_nested in times.values() if not is_nested
+            ),
+        )
+
+    def test_guard_within_budget(self):
+        total = sum(
+            cumulative
+            for cumulative, is_nested in self.import_times.values()
+            if not is_nested
+        )
+        self.assertLessEqual(
+            total,
+            GUARD_IMPORT_TIME_BUDGET_MICROSECONDS,
+            f"Importing guard took {total} us, over the budget of "
+            f"{GUARD_IMPORT_TIME_BUDGET_MICROSECONDS} us",
+        )
+
+    def test_guard_avoids_heavy_modules(self):
+        for module in GUARD_FORBIDDEN_MODULES:
+            self.assertNotIn(module, self.import_times)
+
+
+if __name__ == "__main__":
+    unittest.main()
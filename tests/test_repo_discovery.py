@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from gitidtool.git_data import GitDataEntryFactory, GitDataReader
+from gitidtool.repo_discovery import RepoDiscovery
+
+
+class TestRepoDiscovery(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        # Discovered config paths are real paths
+        self.root = Path(os.path.realpath(temp_dir.name))
+        for repo in [
+            "",
+            "a/repo1",
+            "a/repo1/nested",
+            "b/c/repo2",
+            "b/node_modules/dependency",
+            "d/e/f/repo3",
+        ]:
+            os.makedirs(self.root.joinpath(repo, ".git"))
+            self.root.joinpath(repo, ".git", "config").touch()
+        self.root.joinpath("a", "repo1", ".git", "objects").mkdir()
+
+    def config_path(self, repo: str):
+        return self.root.joinpath(repo, ".git", "config")
+
+    def test_finds_repos_in_sorted_order(self):
+        paths = list(RepoDiscovery().iter_config_paths(self.root))
+        self.assertEqual(
+            paths,
+            [
+                self.config_path(""),
+                self.config_path("a/repo1"),
+                self.config_path("b/c/repo2"),
+                self.config_path("d/e/f/repo3"),
+            ],
+        )
+
+    def test_prune_list(self):
+        paths = list(RepoDiscovery(prune=frozenset({"b"})).iter_config_paths(self.root))
+        self.assertNotIn(self.config_path("b/c/repo2"), paths)
+        paths = list(RepoDiscovery(prune=frozenset()).iter_config_paths(self.root))
+        self.assertIn(self.config_path("b/node_modules/dependency"), paths)
+
+    def test_repo_on_prune_list(self):
+        prune = frozenset({"repo1", "c"})
+        paths = list(RepoDiscovery(prune=prune).iter_config_paths(self.root))
+        self.assertIn(self.config_path("a/repo1"), paths)
+        self.assertNotIn(self.config_path("b/c/repo2"), paths)
+
+    def test_max_depth(self):
+        paths = list(RepoDiscovery(max_depth=0).iter_config_paths(self.root))
+        self.assertEqual(paths, [self.config_path("")])
+        paths = list(RepoDiscovery(max_depth=3).iter_config_paths(self.root))
+        self.assertIn(self.config_path("b/c/repo2"), paths)
+        self.assertNotIn(self.config_path("d/e/f/repo3"), paths)
+
+
+class TestWorktreeDiscovery(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(os.path.realpath(temp_dir.name))
+        # A main worktree, and a linked worktree of it
+        self.gitdir = self.root.joinpath("main", ".git")
+        self.write(self.gitdir.joinpath("HEAD"), "ref: refs/heads/main\n")
+        self.write(self.gitdir.joinpath("config"), "[user]\n\tname = Main\n")
+        linked_gitdir = self.gitdir.joinpath("worktrees", "linked")
+        self.write(linked_gitdir.joinpath("commondir"), "../..\n")
+        self.write(linked_gitdir.joinpath("gitdir"), f"{self.root}/linked/.git\n")
+        self.write(self.root.joinpath("linked", ".git"), f"gitdir: {linked_gitdir}\n")
+        # A submodule, whose gitdir is inside the superproject's
+        module_gitdir = self.gitdir.joinpath("modules", "libs", "sub")
+        self.write(module_gitdir.joinpath("HEAD"), "ref: refs/heads/main\n")
+        self.write(
+            module_gitdir.joinpath("config"),
+            "[core]\n\tworktree = ../../../../libs/sub\n",
+        )
+        self.write(
+            self.root.joinpath("main", "libs", "sub", ".git"),
+            "gitdir: ../../.git/modules/libs/sub\n",
+        )
+
+    def write(self, path: Path, content: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    def test_follows_pointers_and_deduplicates(self):
+        paths = list(RepoDiscovery().iter_config_paths(self.root))
+        self.assertEqual(
+            paths,
+            [
+                self.gitdir.joinpath("config"),
+                self.gitdir.joinpath("modules", "libs", "sub", "config"),
+            ],
+        )
+        # Also found from within the linked worktree or submodule alone
+        for directory in ["linked", "main/libs/sub"]:
+            self.assertEqual(
+                len(list(RepoDiscovery().iter_config_paths(self.root / directory))),
+                1,
+            )
+
+    def test_worktrees_listed(self):
+        reader = GitDataReader(GitDataEntryFactory())
+        main, submodule = [
+            reader.get_git_config_from_file(path)
+            for path in RepoDiscovery().iter_config_paths(self.root)
+        ]
+        self.assertEqual(
+            main.worktrees,
+            [str(self.root.joinpath("main")), str(self.root.joinpath("linked"))],
+        )
+        self.assertEqual(main.repo_folder_name, "main")
+        self.assertEqual(
+            submodule.worktrees, [str(self.root.joinpath("main", "libs", "sub"))]
+        )
+        self.assertEqual(submodule.repo_folder_name, "sub")
+
+
+if __name__ == "__main__":
+    unittest.main()
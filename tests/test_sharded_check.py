@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from gitidtool.check_cmd_result import CheckCmdResultData, CheckCmdResultJsonReporter
+from gitidtool.check_summary import CheckSummaryReporter
+from gitidtool.git_data import GitConfigCache, GitDataEntryFactory, GitDataReader
+from gitidtool.gpg_data import GpgDataEntry
+from gitidtool.identity_index import IdentityIndex
+from gitidtool.repo_discovery import RepoDiscovery
+from gitidtool.sharded_check import _iter_sharded_results
+from gitidtool.ssh_data import SshDataEntry
+
+
+class TestShardedCheck(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        env_patcher = patch.dict(
+            os.environ, {"GIT_ID_TOOL_CACHE_DIR": str(self.root.joinpath("cache"))}
+        )
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+        for i in range(25):
+            path = self.root.joinpath("repos", f"repo-{i:02}", ".git", "config")
+            path.parent.mkdir(parents=True)
+            path.write_text(
+                f"[user]\n\tname = User {i % 3}\n\temail = user@example.com\n"
+                f"\tsigningkey = {i % 3:016X}\n"
+                f'[remote "origin"]\n\turl = git@host-{i % 4}.example.com:repo.git\n'
+            )
+        self.identity_index = IdentityIndex.build(
+            [
+                GpgDataEntry(f"{i:016X}", f"User {i}", "user@example.com")
+                for i in [0, 1]
+            ],
+            [SshDataEntry("host-0.example.com host-1.*", "user@example.com", "~/id")],
+        )
+        self.paths = list(
+            RepoDiscovery(frozenset()).iter_config_paths(self.root.joinpath("repos"))
+        )
+
+    def test_matches_serial_evaluation(self):
+        reader = GitDataReader(GitDataEntryFactory())
+        reporter = CheckCmdResultJsonReporter()
+        expected = [
+            reporter.render_result(
+                CheckCmdResultData(
+                    reader.get_git_config_from_file(path), self.identity_index
+                )
+            )
+            for path in self.paths
+        ]
+        rendered_results = list(
+            _iter_sharded_results(
+                iter(self.paths), self.identity_index, "ndjson", 2, shard_size=4
+            )
+        )
+        self.assertEqual(rendered_results, expected)
+        # Entries parsed by the workers are written to the cache by the parent
+        cache = GitConfigCache().load()
+        self.assertEqual(
+            set(cache.cache_file.entries), {str(path) for path in self.paths}
+        )
+
+    def test_summary_records(self):
+        reader = GitDataReader(GitDataEntryFactory())
+        expected = [
+            CheckSummaryReporter().render_result(
+                CheckCmdResultData(
+                    reader.get_git_config_from_file(path), self.identity_index
+                )
+            )
+            for path in self.paths
+        ]
+        records = _iter_sharded_results(
+            iter(self.paths), self.identity_index, "summary", 2, shard_size=4
+        )
+        self.assertEqual(list(records), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from gitidtool.cache import CacheFile
+from gitidtool.ssh_data import (
+    IDENTITY_FILE_CACHE_SCHEMA_VERSION,
+    IdentityFileCache,
+    SshDataEntry,
+    SshDataEntryFactory,
+    SshDataReader,
+    SshHostMatcher,
+    _split_config_line,
+)
+
+
+class TestSshDataReader(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        for name in ["work", "home", "default"]:
+            self.root.joinpath(f"id-{name}.pub").write_text(
+                f"ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAI {name}@example.com\n"
+            )
+
+    def read(self, content: str, cache: IdentityFileCache | None = None):
+        config_path = self.root.joinpath("config")
+        config_path.write_text(content)
+        reader = SshDataReader(SshDataEntryFactory(), cache)
+        return reader, reader.get_config_entries_from_file(config_path)
+
+    def create_cache(self):
+        return IdentityFileCache(
+            CacheFile(
+                "identity_files.json",
+                IDENTITY_FILE_CACHE_SCHEMA_VERSION,
+                self.root.joinpath("cache"),
+            )
+        ).load()
+
+    def test_parse(self):
+        _, entries = self.read(
+            "# comment\n"
+            "Host work.example.com *.work.example.com\n"
+            f'  IdentityFile="{self.root}/id-work"\n'
+            "  User git\n"
+            "\n"
+            "Match host home.example.com,!other.example.com\n"
+            f"  identityfile {self.root}/id-home\n"
+            "Match exec true\n"
+            f"  IdentityFile {self.root}/id-home\n"
+            "Match all\n"
+            f"  IdentityFile = {self.root}/id-default\n"
+        )
+        self.assertEqual(
+            entries,
+            [
+                SshDataEntry(
+                    "work.example.com *.work.example.com",
+                    "work@example.com",
+                    f"{self.root}/id-work",
+                ),
+                SshDataEntry(
+                    "home.example.com !other.example.com",
+                    "home@example.com",
+                    f"{self.root}/id-home",
+                ),
+                SshDataEntry("*", "default@example.com", f"{self.root}/id-default"),
+            ],
+        )
+
+    def test_split_config_line(self):
+        for line, expected in [
+            ("Host\tgithub.com", ("host", ["github.com"])),
+            ("  IdentityFile\t ~/.ssh/id\n", ("identityfile", ["~/.ssh/id"])),
+            ("IdentityFile=~/.ssh/id", ("identityfile", ["~/.ssh/id"])),
+            ("IdentityFile \t= ~/.ssh/id", ("identityfile", ["~/.ssh/id"])),
+            # Only an "=" directly after the keyword separates it
+            ("IdentityFile ~/.ssh/id=work", ("identityfile", ["~/.ssh/id=work"])),
+            ('Host "a b" c', ("host", ["a b", "c"])),
+            ("# Host comment", None),
+            ("", None),
+        ]:
+            with self.subTest(line=line):
+                self.assertEqual(_split_config_line(line), expected)
+
+    def test_include(self):
+        self.root.joinpath("config.d").mkdir()
+        self.root.joinpath("config.d", "b").write_text(
+            f"Host home.example.com\n  IdentityFile {self.root}/id-home\n"
+        )
+        self.root.joinpath("config.d", "a").write_text(
+            f"Host work.example.com\n  IdentityFile {self.root}/id-work\n"
+        )
+        reader, entries = self.read(
+            "Include config.d/* missing\n"
+            f"Host *\n  IdentityFile {self.root}/id-default\n"
+        )
+        self.assertEqual(
+            [entry.hostname for entry in entries],
+            ["work.example.com", "home.example.com", "*"],
+        )
+        self.assertIn(self.root.joinpath("config.d"), reader.read_paths)
+        self.assertIn(self.root.joinpath("missing"), reader.read_paths)
+
+    def test_include_in_host_block(self):
+        self.root.joinpath("included").write_text(
+            f"Host home.example.com\n  IdentityFile {self.root}/id-home\n"
+        )
+        _, entries = self.read(
+            "Host work.example.com\n"
+            "  Include included\n"
+            f"  IdentityFile {self.root}/id-work\n"
+        )
+        self.assertEqual(
+            [(entry.hostname, entry.email) for entry in entries],
+            [
+                ("home.example.com", "home@example.com"),
+                ("work.example.com", "work@example.com"),
+            ],
+        )
+
+    def test_missing_config(self):
+        reader = SshDataReader(SshDataEntryFactory())
+        path = self.root.joinpath("missing")
+        self.assertEqual(reader.get_config_entries_from_file(path), [])
+        self.assertEqual(reader.read_paths, [path])
+
+    def test_identity_file_read_once(self):
+        content = "".join(
+            f"Host host-{i}.example.com\n  IdentityFile {self.root}/id-work\n"
+            for i in range(10)
+        )
+        with patch.object(
+            SshDataReader,
+            "_read_email_from_public_key",
+            autospec=True,
+            return_value="work@example.com",
+        ) as mock_read:
+            _, entries = self.read(content)
+        mock_read.assert_called_once()
+        self.assertTrue(all(entry.email == "work@example.com" for entry in entries))
+
+    def test_identity_file_cache(self):
+        content = f"Host work.example.com\n  IdentityFile {self.root}/id-work\n"
+        cache = self.create_cache()
+        self.read(content, cache)
+        cache.cache_file.save()
+
+        with patch.object(SshDataReader, "_read_email_from_public_key") as mock_read:
+            _, [entry] = self.read(content, self.create_cache())
+            mock_read.assert_not_called()
+        self.assertEqual(entry.email, "work@example.com")
+
+        self.root.joinpath("id-work.pub").write_text(
+            "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAI Work User <other@example.com>\n"
+        )
+        _, [entry] = self.read(content, self.create_cache())
+        self.assertEqual(entry.email, "other@example.com")
+
+    def test_identity_file_warnings(self):
+        self.root.joinpath("id-no-comment.pub").write_text(
+            "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAI\n"
+        )
+        reader, entries = self.read(
+            f"Host missing.example.com\n  IdentityFile {self.root}/id-missing\n"
+            f"Host other.example.com\n  IdentityFile {self.root}/id-no-comment\n"
+        )
+        self.assertEqual([entry.email for entry in entries], ["", ""])
+        self.assertEqual(len(reader.warnings), 2)
+        self.assertIn("id-missing.pub", reader.warnings[0])
+
+
+class TestSshHostMatcher(unittest.TestCase):
+    def test_first_match_wins(self):
+        entries = [
+            SshDataEntry(hostname, f"{i}@example.com", f"~/.ssh/id-{i}")
+            for i, hostname in enumerate(
+                [
+                    "*.internal.example.com !build.internal.example.com",
+                    "git.example.com",
+                    "*.example.com git.example.?om",
+                    "build.internal.example.com",
+                    "*",
+                ]
+            )
+        ]
+        matcher = SshHostMatcher.build(entries)
+        for hostname, index in [
+            ("repo.internal.example.com", 0),
+            ("build.internal.example.com", 2),
+            ("GIT.example.com", 1),
+            ("git.example.dom", 2),
+            ("other.org", 4),
+        ]:
+            self.assertIs(matcher.match(hostname), entries[index], hostname)
+        self.assertIsNone(SshHostMatcher.build(entries[:2]).match("other.org"))
+
+
+if __name__ == "__main__":
+    unittest.main()
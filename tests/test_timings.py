@@ -0,0 +1,134 @@
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import click
+from click.testing import CliRunner
+
+from gitidtool import _LazyGroup
+
+from gitidtool.cache import CacheFile
+from gitidtool.git_data import (
+    GIT_CONFIG_CACHE_SCHEMA_VERSION,
+    GitConfigCache,
+    GitDataEntryFactory,
+    GitDataReader,
+)
+from gitidtool.repo_discovery import RepoDiscovery
+from gitidtool.timings import TIMINGS, Timings
+
+
+class TestTimings(unittest.TestCase):
+    def test_disabled_records_nothing(self):
+        timings = Timings()
+        with timings.phase("parsing"):
+            timings.increment("files opened")
+        self.assertEqual(timings.phases, {})
+        self.assertEqual(timings.counters, {})
+
+    def test_records_phases_and_counters(self):
+        timings = Timings(is_enabled=True)
+        for _ in range(2):
+            with timings.phase("parsing"):
+                timings.increment("files opened")
+        self.assertEqual(list(timings.phases), ["parsing"])
+        self.assertGreaterEqual(timings.phases["parsing"], 0)
+        self.assertEqual(timings.counters, {"files opened": 2})
+
+    def test_merge_and_pop(self):
+        timings = Timings(is_enabled=True)
+        timings.increment("files opened")
+        timings.merge({"parsing": 1.5}, {"files opened": 2, "cache hits": 1})
+        self.assertEqual(
+            timings.pop(),
+            ({"parsing": 1.5}, {"files opened": 3, "cache hits": 1}),
+        )
+        self.assertEqual(timings.pop(), ({}, {}))
+
+    def test_summary(self):
+        timings = Timings(is_enabled=True)
+        timings.merge({"parsing": 0.0125}, {"files opened": 3})
+        summary = timings.get_summary()
+        self.assertRegex(summary, r"parsing +12\.50 ms")
+        self.assertRegex(summary, r"files opened +3")
+
+
+class TestGitConfigCounters(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        # Isolated from the system and user's own config, as base layers
+        patcher = patch.dict(
+            "os.environ",
+            {
+                "GIT_CONFIG_NOSYSTEM": "1",
+                "GIT_CONFIG_GLOBAL": str(self.root.joinpath("gitconfig-global")),
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path = self.root.joinpath("repo", ".git", "config")
+        self.path.parent.mkdir(parents=True)
+        self.path.write_text("[user]\n\tname = Repo User\n")
+        TIMINGS.is_enabled = True
+        self.addCleanup(setattr, TIMINGS, "is_enabled", False)
+        self.addCleanup(TIMINGS.pop)
+        TIMINGS.pop()
+
+    def read(self):
+        cache = GitConfigCache(
+            CacheFile(
+                "git_config.json",
+                GIT_CONFIG_CACHE_SCHEMA_VERSION,
+                self.root.joinpath("cache"),
+            )
+        ).load()
+        GitDataReader(GitDataEntryFactory(), cache).get_git_config_from_file(self.path)
+        cache.save()
+
+    def test_cache_misses_then_hits(self):
+        self.read()
+        self.read()
+        phases, counters = TIMINGS.pop()
+        self.assertIn("git config", phases)
+        self.assertEqual(counters["git config cache misses"], 1)
+        self.assertEqual(counters["git config cache hits"], 1)
+        self.assertEqual(counters["files opened"], 1)
+
+    def test_discovery_phase(self):
+        paths = list(RepoDiscovery(frozenset()).iter_config_paths(self.root))
+        self.assertEqual(paths, [self.path])
+        phases, counters = TIMINGS.pop()
+        self.assertIn("discovery", phases)
+        self.assertEqual(counters["directories visited"], 2)
+
+
+def _work_on_thread():
+    return sum(range(1000))
+
+
+class TestProfile(unittest.TestCase):
+    def test_profiles_worker_threads(self):
+        @click.command()
+        def run():
+            thread = threading.Thread(target=_work_on_thread)
+            thread.start()
+            thread.join()
+
+        group = _LazyGroup(commands={"run": run})
+        with tempfile.TemporaryDirectory() as temp_dir:
+            profile_path = os.path.join(temp_dir, "profile")
+            with patch.dict(os.environ, {"GIT_ID_TOOL_PROFILE": profile_path}):
+                result = CliRunner().invoke(group, ["run"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            functions = {name for _, _, name in pstats.Stats(profile_path).stats}
+        self.assertIn("_work_on_thread", functions)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from gitidtool.check_cmd_result import CheckCmdResultJsonReporter
+from gitidtool.gpg_data import GpgDataEntry
+from gitidtool.identity_index import IdentityIndex
+from gitidtool.ssh_data import SshDataEntry
+from gitidtool.watch import (
+    CheckWatchSession,
+    InotifyFileWatcher,
+    PollingFileWatcher,
+)
+
+
+class TestCheckWatchSession(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        patcher = patch.dict(
+            os.environ,
+            {
+                "GIT_ID_TOOL_CACHE_DIR": str(self.root.joinpath("cache")),
+                "GIT_CONFIG_NOSYSTEM": "1",
+                "GIT_CONFIG_GLOBAL": str(self.root.joinpath("gitconfig-global")),
+                "GNUPGHOME": str(self.root.joinpath("gnupg")),
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ssh_config_path = self.root.joinpath("ssh_config")
+        self.ssh_config_path.write_text("")
+        self.paths = [
+            self.write_config(repo, "user@example.com") for repo in ["a", "b"]
+        ]
+        self.identity_index = self.build_identity_index("user@example.com")
+        self.mtime_ns = 0
+
+    def write_config(self, repo: str, email: str):
+        path = self.root.joinpath(repo, ".git", "config")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            f"[user]\n\tname = User\n\temail = {email}\n\tsigningkey = KEY\n"
+            '[remote "origin"]\n\turl = git@example.com:repo.git\n'
+        )
+        return path
+
+    def build_identity_index(self, ssh_email: str):
+        return IdentityIndex.build(
+            [GpgDataEntry("KEY", "User", "user@example.com")],
+            [SshDataEntry("example.com", ssh_email, "~/.ssh/id")],
+        )
+
+    def start_session(self, read_identity_index=None):
+        session = CheckWatchSession(
+            CheckCmdResultJsonReporter().render_result,
+            read_identity_index or Mock(),
+            PollingFileWatcher(interval=0.01),
+        )
+        self.addCleanup(session.close)
+        outputs = list(
+            session.start(self.paths, self.identity_index, [self.ssh_config_path])
+        )
+        self.assertEqual(len(outputs), 2)
+        return session
+
+    def wait_for_changes(self, session: CheckWatchSession):
+        # Stat keys include the mtime, which may not have moved on for writes
+        # in quick succession
+        self.mtime_ns += 1
+        for path in self.paths:
+            if path.exists():
+                os.utime(path, ns=(self.mtime_ns, self.mtime_ns))
+        return list(session.wait_for_changes())
+
+    def test_repo_change(self):
+        session = self.start_session()
+        self.write_config("a", "other@example.com")
+        changes = self.wait_for_changes(session)
+        self.assertEqual([path for path, _ in changes], [str(self.paths[0])])
+        self.assertIn("other@example.com", changes[0][1])
+        # Rewriting a config with the same values changes no result
+        self.write_config("a", "other@example.com")
+        self.assertEqual(self.wait_for_changes(session), [])
+
+    def test_repo_removed(self):
+        session = self.start_session()
+        self.paths[1].unlink()
+        changes = self.wait_for_changes(session)
+        self.assertEqual(changes, [(str(self.paths[1]), None)])
+
+    def test_identity_change(self):
+        def read_identity_index(read_paths: list[Path]):
+            read_paths.append(self.ssh_config_path)
+            return self.build_identity_index("other@example.com")
+
+        session = self.start_session(read_identity_index)
+        self.ssh_config_path.write_text("Host example.com\n")
+        changes = list(session.wait_for_changes())
+        # Every repo is re-evaluated, without being parsed again
+        self.assertEqual([path for path, _ in changes], [str(p) for p in self.paths])
+
+
+class TestInotifyFileWatcher(unittest.TestCase):
+    def setUp(self):
+        try:
+            self.watcher = InotifyFileWatcher()
+        except OSError:
+            self.skipTest("inotify is not available")
+        self.addCleanup(self.watcher.close)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+
+    def test_wait(self):
+        watched_path = self.root.joinpath("watched")
+        watched_dir = self.root.joinpath("dir")
+        watched_dir.mkdir()
+        self.watcher.watch([str(watched_path), str(watched_dir)])
+        self.assertEqual(self.watcher.wait(0), set())
+        self.root.joinpath("other").write_text("")
+        self.assertEqual(self.watcher.wait(0.1), set())
+        # Created by rename, as git writes configs
+        self.root.joinpath("watched.lock").write_text("")
+        self.root.joinpath("watched.lock").rename(watched_path)
+        watched_dir.joinpath("file").write_text("")
+        self.assertEqual(self.watcher.wait(0.1), {str(watched_path), str(watched_dir)})
+
+
+if __name__ == "__main__":
+    unittest.main()